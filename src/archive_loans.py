@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+
+from config import settings
+from database.database import dispose_engines
+from services.loan_archive import archive_all
+
+
+async def run_archive(after_days, batch_size):
+    try:
+        return await archive_all(after_days, batch_size)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old returned loans into the loan_history archive")
+    parser.add_argument("--after-days", type=float, default=settings.LOAN_ARCHIVE_AFTER_DAYS,
+                        help="archive loans returned more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=settings.LOAN_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(f"Archiving loans returned more than {args.after_days:g} days ago...")
+    moved = asyncio.run(run_archive(args.after_days, args.batch_size))
+    print(f"Archived {moved} loan(s)")
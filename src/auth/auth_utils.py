@@ -1,17 +1,23 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
+import uuid
+
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
-from sqlalchemy.orm import Session
-from database.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import get_db, recent_writers, session_scope
 from models.models import Member
+from auth.principal_cache import principal_cache
+from config import settings
 
 SECRET_KEY = "ENCORA"  
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -19,11 +25,24 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+async def get_current_user(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
+):
+    member = await resolve_member(db, token)
+    if request.method not in SAFE_METHODS:
+        # Marked before the write commits so the caller's next reads see it
+        recent_writers.mark(member.id)
+    return member
+
+async def resolve_member(db, token: str):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -34,7 +53,36 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-        member = db.query(Member).filter(Member.id == user_id).first()
-    except JWTError:
+        token_id = payload.get("jti", "")
+        member = principal_cache.get(user_id, token_id)
+        if member is not None:
+            return member
+        member = await db.scalar(select(Member).where(Member.id == int(user_id)))
+    except (JWTError, ValueError):
+        raise credentials_exception
+    if member is None:
         raise credentials_exception
-    return member
\ No newline at end of file
+    # Detach so the cached instance outlives this request's session
+    db.expunge(member)
+    principal_cache.set(user_id, token_id, member)
+    return member
+
+async def get_streaming_user(token: str = Depends(oauth2_scheme)):
+    """``get_current_user`` for long-lived responses such as event streams.
+
+    Opens and closes its own session up front: a ``get_db`` session (and, in
+    sync mode, its pool slot) would otherwise stay checked out until the
+    stream ends.
+    """
+    async with session_scope(read_only=True) as db:
+        return await resolve_member(db, token)
+
+async def get_optional_user(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    """Resolve the caller when a bearer token is present, ``None`` for anonymous requests."""
+    if token is None:
+        return None
+    return await get_current_user(request=request, db=db, token=token)
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import settings
+
+
+class PrincipalCache:
+    """Bounded LRU of resolved members keyed on ``(sub, jti)`` with a TTL.
+
+    Entries are detached ``Member`` instances. Invalidation is per process, so
+    the TTL bounds how long another worker can serve a stale principal.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._keys_by_sub = {}
+        self._lock = threading.Lock()
+
+    def get(self, sub: str, jti: str):
+        key = (sub, jti)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                member, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return member
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def set(self, sub: str, jti: str, member):
+        key = (sub, jti)
+        with self._lock:
+            self._entries[key] = (member, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._keys_by_sub.setdefault(sub, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, member_id):
+        sub = str(member_id)
+        with self._lock:
+            for key in self._keys_by_sub.pop(sub, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_sub.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _discard(self, key):
+        self._entries.pop(key, None)
+        keys = self._keys_by_sub.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_sub[key[0]]
+
+
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
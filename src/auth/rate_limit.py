@@ -0,0 +1,168 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+from jose import JWTError, jwt
+
+from auth.auth_utils import ALGORITHM, SECRET_KEY
+from config import settings
+from monitoring import metrics
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class Limit:
+    """Bursts of up to ``count`` requests, refilled at ``count`` per ``seconds``."""
+
+    __slots__ = ("capacity", "refill")
+
+    def __init__(self, count: int, seconds: float):
+        self.capacity = float(count)
+        self.refill = count / seconds
+
+
+class MemoryBackend:
+    """Token buckets in process memory, evicted least recently used past ``max_keys``.
+
+    ``take`` never awaits, so on the event loop one bucket's read-modify-write
+    can't interleave with another request's and needs no lock. An evicted
+    bucket starts full on its next request; the oldest entries are mostly
+    ones idle long enough to have refilled anyway.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, limit: Limit) -> float:
+        """Spend one token from ``key``'s bucket; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        state = self._buckets.get(key)
+        if state is None:
+            tokens = limit.capacity
+        else:
+            tokens = min(limit.capacity, state[0] + (now - state[1]) * limit.refill)
+            self._buckets.move_to_end(key)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            wait = 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            wait = (1 - tokens) / limit.refill
+        if state is None:
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class RateLimiter:
+    """Front for the bucket store; swap ``backend`` for anything with the same ``take`` to share limits across workers."""
+
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+
+    async def take(self, key: str, limit: Limit) -> float:
+        return await self.backend.take(key, limit)
+
+
+rate_limiter = RateLimiter(MemoryBackend(settings.RATE_LIMIT_MAX_KEYS), settings.RATE_LIMIT_ENABLED)
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",", 1)[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+# Verified token -> sub. Keying on an unverified sub would let anyone drain
+# another member's bucket, but the signature check costs more than the rest of
+# the limiter, and clients resend the same token until it expires.
+_SUBJECT_CACHE_SIZE = 4096
+_subjects = OrderedDict()
+
+
+def _bearer_subject(request: Request) -> Optional[str]:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    subject = _subjects.get(token)
+    if subject is not None:
+        _subjects.move_to_end(token)
+        return subject
+    try:
+        subject = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+    if subject is not None:
+        _subjects[token] = subject
+        while len(_subjects) > _SUBJECT_CACHE_SIZE:
+            _subjects.popitem(last=False)
+    return subject
+
+
+async def _body_field(request: Request, field: str) -> Optional[str]:
+    # FastAPI has read and cached the body before any dependency runs
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            body = await request.json()
+        else:
+            body = await request.form()
+        value = body.get(field)
+    except (ValueError, AttributeError):
+        return None
+    return value.strip().lower() if isinstance(value, str) else None
+
+
+def rate_limit(rule: str, per_ip=None, per_email=None, per_member=None, email_field: str = "email", methods=None):
+    """Dependency rejecting a request with 429 once any of its buckets is empty.
+
+    Limits are ``(count, seconds)`` pairs from settings; None skips that key.
+    Buckets are per ``rule`` and keyed by client IP, by the ``email_field``
+    of the form or JSON body (lower-cased), and by the verified ``sub`` of the
+    bearer token. A key that can't be read (no token, no email) is skipped.
+    Router and decorator dependencies resolve before a route's own, so this
+    runs before ``get_db`` opens a session or a password is hashed.
+    ``methods`` restricts it to those HTTP methods.
+    """
+    limits = [
+        (kind, Limit(*spec))
+        for kind, spec in (("ip", per_ip), ("email", per_email), ("member", per_member))
+        if spec
+    ]
+
+    async def check(request: Request):
+        if not rate_limiter.enabled or (methods and request.method not in methods):
+            return
+        wait, limited_by = 0.0, None
+        for kind, limit in limits:
+            if kind == "ip":
+                value = client_ip(request)
+            elif kind == "email":
+                value = await _body_field(request, email_field)
+            else:
+                value = _bearer_subject(request)
+            if value is None:
+                continue
+            waited = await rate_limiter.take(f"{rule}:{kind}:{value}", limit)
+            if waited > wait:
+                wait, limited_by = waited, kind
+        if wait:
+            metrics.rate_limited.inc(rule, limited_by)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    return Depends(check)
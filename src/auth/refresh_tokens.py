@@ -0,0 +1,141 @@
+import hashlib
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from config import settings
+from models.models import RefreshToken
+
+
+class RevocationDenylist:
+    """Bounded in-process set of revoked token families.
+
+    Lets a refresh with a revoked token fail before touching the database.
+    The database stays authoritative, so a miss here (another worker revoked
+    it, or the entry was evicted) is still caught by the rotation UPDATE.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._families = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, family_id: str, ttl: float):
+        with self._lock:
+            self._families[family_id] = time.monotonic() + ttl
+            self._families.move_to_end(family_id)
+            while len(self._families) > self.maxsize:
+                self._families.popitem(last=False)
+
+    def __contains__(self, family_id: str):
+        with self._lock:
+            expires_at = self._families.get(family_id)
+            if expires_at is None:
+                return False
+            if expires_at <= time.monotonic():
+                del self._families[family_id]
+                return False
+            return True
+
+
+denylist = RevocationDenylist(settings.REFRESH_DENYLIST_SIZE)
+
+_REFRESH_TTL = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+def _hash_token(token: str) -> str:
+    # Tokens carry 256 bits of randomness, so a fast hash is enough here
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _family_of(token: str):
+    family_id, _, secret = token.partition(".")
+    return family_id if secret else None
+
+
+def issue_refresh_token(db, member_id: int, family_id: str = None) -> str:
+    """Add a new refresh token row to the session and return the opaque token."""
+    family_id = family_id or uuid.uuid4().hex
+    token = f"{family_id}.{secrets.token_urlsafe(32)}"
+    now = datetime.utcnow()
+    db.add(RefreshToken(
+        member_id=member_id,
+        token_hash=_hash_token(token),
+        family_id=family_id,
+        issued_at=now,
+        expires_at=now + _REFRESH_TTL,
+    ))
+    return token
+
+
+async def revoke_family(db, family_id: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at == None)
+        .values(revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    denylist.add(family_id, _REFRESH_TTL.total_seconds())
+
+
+async def rotate_refresh_token(db, token: str):
+    """Spend ``token`` and issue its successor. Returns ``(member_id, new_token)`` or None.
+
+    Spending is a single conditional UPDATE, so a token can only be rotated
+    once. Presenting an already-spent token is treated as theft and revokes
+    the whole family. Commits the session.
+    """
+    family_id = _family_of(token)
+    if family_id is None or family_id in denylist:
+        return None
+
+    now = datetime.utcnow()
+    token_hash = _hash_token(token)
+    member_id = await db.scalar(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.revoked_at == None,
+            RefreshToken.expires_at > now
+        )
+        .values(revoked_at=now)
+        .returning(RefreshToken.member_id)
+        .execution_options(synchronize_session=False)
+    )
+    if member_id is None:
+        reused = await db.scalar(
+            select(RefreshToken.id).where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.revoked_at != None
+            )
+        )
+        if reused is not None:
+            await revoke_family(db, family_id)
+            await db.commit()
+        else:
+            await db.rollback()
+        return None
+
+    new_token = issue_refresh_token(db, member_id, family_id)
+    await db.commit()
+    return member_id, new_token
+
+
+async def revoke_refresh_token(db, token: str):
+    """Log out: revoke every token rotated from the same login."""
+    family_id = _family_of(token)
+    if family_id is None:
+        return False
+    owned = await db.scalar(
+        select(RefreshToken.id).where(RefreshToken.token_hash == _hash_token(token))
+    )
+    if owned is None:
+        return False
+    await revoke_family(db, family_id)
+    await db.commit()
+    return True
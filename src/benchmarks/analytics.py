@@ -0,0 +1,212 @@
+"""Circulation rollups: consistency with raw history, and dashboard read cost.
+
+Seeds a scratch database, archives part of it, then drives loans, returns,
+reservations, cancellations and the hold sweep through the API. The rollups
+the triggers maintained along the way must equal a full rebuild from raw
+history. Each dashboard question is then answered both ways, from the rollups
+and by aggregating loans, loan_history and reservations directly, reporting
+latency, rows read and whether the answers agree. Exits non-zero on any
+mismatch. Run from ``src/``:
+
+    python -m benchmarks.analytics --loans 1000000 --members 50000 --books 20000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import asgi_client, percentiles, use_scratch_database, without_rate_limits
+from benchmarks.seed import add_seed_arguments, member_email
+
+# Dashboard questions as (rollup SQL, raw SQL, rollup table, raw tables). Both
+# take :start and :end as inclusive 'YYYY-MM-DD' days and return the same rows.
+_LOANS_RAW = "(SELECT book_id, member_id, loan_date FROM loans UNION ALL SELECT book_id, member_id, loan_date FROM loan_history)"
+QUESTIONS = {
+    "top_books": (
+        "SELECT book_id, sum(loans) AS n FROM book_daily_stats WHERE day BETWEEN :start AND :end "
+        "GROUP BY book_id ORDER BY n DESC, book_id LIMIT 10",
+        f"SELECT book_id, count(*) AS n FROM {_LOANS_RAW} WHERE book_id IS NOT NULL "
+        "AND date(loan_date) BETWEEN :start AND :end GROUP BY book_id ORDER BY n DESC, book_id LIMIT 10",
+        "book_daily_stats", ("loans", "loan_history"),
+    ),
+    "top_members": (
+        "SELECT member_id, sum(loans) AS n FROM member_daily_stats WHERE day BETWEEN :start AND :end "
+        "GROUP BY member_id ORDER BY n DESC, member_id LIMIT 10",
+        f"SELECT member_id, count(*) AS n FROM {_LOANS_RAW} WHERE member_id IS NOT NULL "
+        "AND date(loan_date) BETWEEN :start AND :end GROUP BY member_id ORDER BY n DESC, member_id LIMIT 10",
+        "member_daily_stats", ("loans", "loan_history"),
+    ),
+    "average_hold_wait": (
+        "SELECT sum(holds), round(sum(wait_seconds) / sum(holds), 3) FROM hold_wait_stats "
+        "WHERE day BETWEEN :start AND :end",
+        "SELECT count(*), round(avg((julianday(notification_date) - julianday(reservation_date)) * 86400.0), 3) "
+        "FROM reservations WHERE notification_date IS NOT NULL AND date(notification_date) BETWEEN :start AND :end",
+        "hold_wait_stats", ("reservations",),
+    ),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_seed_arguments(parser)
+    parser.add_argument("--days", type=int, default=30, help="length of the dashboard period, ending today")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per question and source")
+    parser.add_argument("--writes", type=int, default=50, help="checkouts driven through the API before the check")
+    return parser.parse_args()
+
+
+def snapshot(engine):
+    from database.rollups import ROLLUP_TABLES
+
+    with engine.connect() as conn:
+        # Float sums depend on the order rows were added in
+        return {
+            table: [
+                tuple(round(value, 3) if isinstance(value, float) else value for value in row)
+                for row in conn.exec_driver_sql(f"SELECT * FROM {table} ORDER BY 1, 2")
+            ]
+            for table in ROLLUP_TABLES
+        }
+
+
+async def drive_writes(client, writes):
+    """Loans, returns, queueing, hold promotion, cancellation and expiry, all through the API."""
+    from sqlalchemy import select
+
+    from auth.auth_utils import create_access_token
+    from database.database import SessionLocal, session_scope
+    from models.models import Member
+    from services.reservation_queue import expire_holds
+
+    with SessionLocal() as db:
+        admin_id = db.scalar(select(Member.id).where(Member.is_admin == True).limit(1))
+        members = db.scalars(select(Member.id).where(Member.email.in_([member_email(i) for i in range(4)]))).all()
+
+    def auth(member_id):
+        return {"Authorization": f"Bearer {create_access_token({'sub': str(member_id)})}"}
+
+    admin = auth(admin_id)
+    borrower, waiting, cancelling, late = members
+    # A seeded catalogue may have every copy out, so the checkouts use a title of their own
+    shelf = (await client.post("/books/", json={"title": "Rollup Shelf", "author": "Bench", "quantity": writes + 5},
+                               headers=admin)).json()
+    loans = []
+    for _ in range(writes):
+        response = await client.post("/loans/", json={"book_id": shelf["id"], "member_id": borrower},
+                                     headers=auth(borrower))
+        loans.append(response.json()["id"])
+    batch = await client.post("/loans/batch", json={"member_id": borrower, "book_ids": [shelf["id"]] * 5},
+                              headers=admin)
+    loans += [result["loan_id"] for result in batch.json()["results"] if result["success"]]
+
+    # A title with one copy: three members queue behind the borrower
+    book = (await client.post("/books/", json={"title": "Rollup Check", "author": "Bench", "quantity": 1},
+                              headers=admin)).json()
+    held = (await client.post("/loans/", json={"book_id": book["id"], "member_id": borrower},
+                              headers=auth(borrower))).json()
+    queued = {}
+    for member_id in (waiting, cancelling, late):
+        reservation = await client.post("/reservations/", json={"book_id": book["id"], "member_id": member_id},
+                                        headers=auth(member_id))
+        queued[member_id] = reservation.json()["id"]
+
+    for loan_id in loans[: len(loans) // 2]:
+        await client.put(f"/loans/{loan_id}/return", headers=auth(borrower))
+    await client.post("/loans/batch/return", json={"loan_ids": loans[len(loans) // 2:]}, headers=admin)
+    # Promotes the first in line, who collects; cancelling the next hold promotes the last,
+    # whose hold is then left to expire
+    await client.put(f"/loans/{held['id']}/return", headers=auth(borrower))
+    collected = await client.post("/loans/", json={"book_id": book["id"], "member_id": waiting}, headers=auth(waiting))
+    await client.put(f"/loans/{collected.json()['id']}/return", headers=auth(waiting))
+    await client.put(f"/reservations/{queued[cancelling]}/cancel", headers=auth(cancelling))
+    async with session_scope() as db:
+        await expire_holds(db, now=datetime.utcnow() + timedelta(days=30))
+    return {"loans": len(loans) + 2, "reservations": len(queued)}
+
+
+def time_question(engine, sql, params, repeat):
+    from sqlalchemy import text
+
+    samples, rows = [], None
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = conn.execute(text(sql), params).all()
+            samples.append(time.perf_counter() - started)
+    return [tuple(row) for row in rows], percentiles(samples)
+
+
+async def run(args):
+    from sqlalchemy import text
+
+    from benchmarks.seed import seed
+    from database.database import engine
+    from database.rollups import rebuild
+    from init_db import init_db
+    from services.loan_archive import archive_all
+    import main
+
+    init_db()
+    seeded = seed(engine, members=args.members, books=args.books, loans=args.loans,
+                  reservations=args.reservations, outstanding=args.outstanding,
+                  chunk_size=args.chunk_size, seed=args.seed)
+    seeded["archived_loans"] = await archive_all(after_days=180)
+    try:
+        async with asgi_client(main.app) as client:
+            driven = await drive_writes(client, args.writes)
+    finally:
+        await main.shutdown()
+
+    failures = []
+    incremental = snapshot(engine)
+    started = time.perf_counter()
+    rebuilt_rows = rebuild(engine, batch_size=max(1, args.loans // 7))
+    rebuild_seconds = time.perf_counter() - started
+    rebuilt = snapshot(engine)
+    for table in incremental:
+        if incremental[table] != rebuilt[table]:
+            failures.append(f"{table}: incremental rollup differs from rebuild")
+
+    today = datetime.utcnow().date()
+    params = {"start": str(today - timedelta(days=args.days - 1)), "end": str(today)}
+    questions = {}
+    with engine.connect() as conn:
+        # The raw questions filter on date(...) of a timestamp, which no index serves: they read every row
+        scanned = {
+            table: conn.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar()
+            for table in ("loans", "loan_history", "reservations")
+        }
+        in_period = {
+            table: conn.execute(text(f"SELECT count(*) FROM {table} WHERE day BETWEEN :start AND :end"), params).scalar()
+            for table in rebuilt_rows
+        }
+    for name, (rollup_sql, raw_sql, rollup_table, raw_tables) in QUESTIONS.items():
+        rollup_rows, rollup_latency = time_question(engine, rollup_sql, params, args.repeat)
+        raw_rows, raw_latency = time_question(engine, raw_sql, params, args.repeat)
+        questions[name] = {
+            "rollup": {"latency": rollup_latency, "rows_read": in_period[rollup_table]},
+            "raw": {"latency": raw_latency, "rows_read": sum(scanned[table] for table in raw_tables)},
+            "agree": rollup_rows == raw_rows,
+        }
+        if rollup_rows != raw_rows:
+            failures.append(f"{name}: rollup answer differs from raw history")
+    engine.dispose()
+    return {
+        "seeded": seeded,
+        "driven": driven,
+        "period": params,
+        "rebuild": {"seconds": round(rebuild_seconds, 3), "rows": rebuilt_rows},
+        "questions": questions,
+        "failures": failures,
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    without_rate_limits()
+    use_scratch_database("analytics.db")
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failures"] else 0)
@@ -0,0 +1,91 @@
+"""Race many members for the last copies of one hot title.
+
+Fails (exit status 1) if more loans are granted than copies exist, and reports
+checkout throughput as JSON. Run from ``src/``:
+
+    LIBRARY_DB_MODE=async python -m benchmarks.checkout_concurrency --copies 50 --clients 500
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.common import asgi_client, use_scratch_database, without_rate_limits
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    return parser.parse_args()
+
+
+async def run(args):
+    from sqlalchemy import func, select
+
+    from auth.auth_utils import create_access_token
+    from config import settings
+    from database.database import SessionLocal, dispose_engines
+    from init_db import init_db
+    from auth.passwords import pwd_context
+    from models.models import Book, Loan, Member
+    import main
+
+    init_db()
+    hashed = pwd_context.hash("benchmark")
+    with SessionLocal() as db:
+        db.add(Book(title="Hot Title", author="Bench", quantity=args.copies, available_quantity=args.copies))
+        db.add_all(
+            Member(name=f"Member {i}", email=f"member{i}@bench.local", phone="+1234567890", hashed_password=hashed)
+            for i in range(args.clients)
+        )
+        db.commit()
+        member_ids = db.scalars(select(Member.id).where(Member.is_admin == False)).all()
+        book_id = db.scalar(select(Book.id))
+
+    tokens = {member_id: create_access_token({"sub": str(member_id)}) for member_id in member_ids}
+    statuses = {}
+    gate = asyncio.Semaphore(args.concurrency)
+    async with asgi_client(main.app) as client:
+        async def checkout(member_id):
+            async with gate:
+                response = await client.post(
+                    "/loans/",
+                    json={"book_id": book_id, "member_id": member_id},
+                    headers={"Authorization": f"Bearer {tokens[member_id]}"},
+                )
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(checkout(member_id) for member_id in member_ids))
+        elapsed = time.perf_counter() - started
+    await dispose_engines()
+
+    with SessionLocal() as db:
+        loans = db.scalar(select(func.count(Loan.id)).where(Loan.book_id == book_id))
+        available = db.scalar(select(Book.available_quantity).where(Book.id == book_id))
+
+    granted = statuses.get(200, 0)
+    return {
+        "mode": settings.DB_MODE,
+        "copies": args.copies,
+        "clients": args.clients,
+        "concurrency": args.concurrency,
+        "statuses": statuses,
+        "loans_created": loans,
+        "available_after": available,
+        "oversold": loans > args.copies or available < 0 or granted != loans,
+        "elapsed_s": round(elapsed, 4),
+        "checkouts_per_s": round(args.clients / elapsed, 1),
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    without_rate_limits()
+    use_scratch_database("checkout_bench.db")
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["oversold"] or report["loans_created"] != min(args.copies, args.clients) else 0)
@@ -0,0 +1,115 @@
+import contextlib
+import os
+import tempfile
+
+
+def use_scratch_database(name: str = "bench.db") -> str:
+    """Point the app at a throwaway database; call before importing app modules."""
+    path = os.path.join(tempfile.mkdtemp(prefix="library-bench-"), name)
+    os.environ["LIBRARY_DB_PATH"] = path
+    return path
+
+
+def without_rate_limits():
+    """Turn the API rate limiter off unless the environment says otherwise; call before importing app modules.
+
+    Load benchmarks send every request from one client address, which the
+    per-IP limits would otherwise answer with 429s.
+    """
+    os.environ.setdefault("LIBRARY_RATE_LIMIT_ENABLED", "0")
+
+
+def asgi_client(app):
+    import httpx
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+async def drive(call, concurrency: int, duration: float, expected=(200,)):
+    """Run ``call()`` from ``concurrency`` workers for ``duration`` seconds.
+
+    ``call`` returns a response, or None once it has run out of work. Returns
+    throughput, latency percentiles and a status histogram; statuses outside
+    ``expected`` count as errors.
+    """
+    import asyncio
+    import time
+    from collections import Counter
+
+    samples, statuses = [], Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await call()
+            if response is None:
+                return
+            samples.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(samples),
+        "errors": sum(count for status, count in statuses.items() if status not in expected),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "latency": percentiles(samples),
+    }
+
+
+@contextlib.contextmanager
+def uvicorn_server(port: int, workers: int = 1):
+    """Serve ``main:app`` from a child uvicorn process on localhost for the duration of the block.
+
+    The child inherits the environment, so set ``LIBRARY_*`` variables first.
+    """
+    import subprocess
+    import sys
+    import time
+    import urllib.request
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            try:
+                urllib.request.urlopen(base_url + "/", timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("uvicorn did not start within 30s")
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
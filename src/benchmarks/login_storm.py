@@ -0,0 +1,101 @@
+"""Login p99 and catalog-read latency while a burst of logins is running.
+
+Compare executors by running it once per setting, e.g. from ``src/``:
+
+    LIBRARY_PASSWORD_HASH_EXECUTOR=inline python -m benchmarks.login_storm
+    LIBRARY_PASSWORD_HASH_EXECUTOR=thread python -m benchmarks.login_storm
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import asgi_client, percentiles, use_scratch_database, without_rate_limits
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--books", type=int, default=500)
+    return parser.parse_args()
+
+
+async def run(args):
+    from auth.auth_utils import create_access_token
+    from auth.passwords import pwd_context
+    from config import settings
+    from database.database import SessionLocal
+    from init_db import init_db
+    from models.models import Book, Member
+    import main
+
+    init_db()
+    hashed = pwd_context.hash("benchmark")
+    with SessionLocal() as db:
+        db.add_all(Book(title=f"Title {i}", author=f"Author {i % 97}") for i in range(args.books))
+        db.add_all(
+            Member(name=f"Member {i}", email=f"member{i}@bench.local", phone="+1234567890", hashed_password=hashed)
+            for i in range(args.logins)
+        )
+        db.commit()
+    reader_headers = {"Authorization": f"Bearer {create_access_token({'sub': '1'})}"}
+
+    await main.startup()
+    async with asgi_client(main.app) as client:
+        async def read_catalog(samples, until):
+            while not until.is_set():
+                started = time.perf_counter()
+                response = await client.get("/books/", params={"limit": 50}, headers=reader_headers)
+                response.raise_for_status()
+                samples.append(time.perf_counter() - started)
+
+        async def sample_reads(seconds):
+            samples, done = [], asyncio.Event()
+            readers = [asyncio.create_task(read_catalog(samples, done)) for _ in range(args.readers)]
+            await asyncio.sleep(seconds)
+            done.set()
+            await asyncio.gather(*readers)
+            return samples
+
+        idle_reads = await sample_reads(1.0)
+
+        login_samples, storm_reads, storm_done = [], [], asyncio.Event()
+        gate = asyncio.Semaphore(args.concurrency)
+
+        async def login(i):
+            async with gate:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/token", data={"username": f"member{i}@bench.local", "password": "benchmark"}
+                )
+                response.raise_for_status()
+                login_samples.append(time.perf_counter() - started)
+
+        readers = [asyncio.create_task(read_catalog(storm_reads, storm_done)) for _ in range(args.readers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        storm_done.set()
+        await asyncio.gather(*readers)
+    await main.shutdown()
+
+    return {
+        "db_mode": settings.DB_MODE,
+        "hash_executor": settings.PASSWORD_HASH_EXECUTOR,
+        "hash_workers": settings.PASSWORD_HASH_WORKERS,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "logins": args.logins,
+        "logins_per_s": round(args.logins / elapsed, 1),
+        "login_latency": percentiles(login_samples),
+        "catalog_read_idle": percentiles(idle_reads),
+        "catalog_read_during_storm": percentiles(storm_reads),
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    without_rate_limits()
+    use_scratch_database("login_bench.db")
+    print(json.dumps(asyncio.run(run(args)), indent=2))
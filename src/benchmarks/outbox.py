@@ -0,0 +1,185 @@
+"""Notification outbox: return latency against the notification channel, and delivery guarantees.
+
+Each phase queues a member behind every copy of ``--returns`` single-copy
+titles, then returns the copies one by one through the API while two
+dispatchers drain the outbox through a transport: a plain file, one that
+takes ``--slow-ms`` per batch, and one that fails whole batches and single
+messages at random. Return latency should be the same in every phase.
+
+Once drained, every promotion must have been written to the file exactly
+once, every outbox row must be SENT, and the flaky phase must have needed
+retries. Exits non-zero otherwise. Run from ``src/``:
+
+    python -m benchmarks.outbox --returns 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+from benchmarks.common import asgi_client, percentiles, use_scratch_database, without_rate_limits
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--returns", type=int, default=200, help="returns (and so notifications) per phase")
+    parser.add_argument("--slow-ms", type=float, default=250, help="time the slow transport takes per batch")
+    parser.add_argument("--failure-rate", type=float, default=0.3, help="chance the flaky transport fails a batch or a message")
+    parser.add_argument("--batch-size", type=int, default=20, help="outbox rows claimed per batch")
+    return parser.parse_args()
+
+
+def transports(path, slow_ms, failure_rate):
+    from services.notifications import FileTransport
+
+    class SlowTransport(FileTransport):
+        async def send_batch(self, notifications):
+            await asyncio.sleep(slow_ms / 1000)
+            return await super().send_batch(notifications)
+
+    class FlakyTransport(FileTransport):
+        async def send_batch(self, notifications):
+            if random.random() < failure_rate:
+                raise ConnectionError("simulated outage")
+            lucky = [notification for notification in notifications if random.random() >= failure_rate]
+            await super().send_batch(lucky)
+            return [None if notification in lucky else "simulated rejection" for notification in notifications]
+
+    return {"file": FileTransport(path), "slow": SlowTransport(path), "flaky": FlakyTransport(path)}
+
+
+async def prepare(client, admin, borrower, waiting, count):
+    """Lend out ``count`` single-copy titles with a member queued behind each; returns the loan ids."""
+    books = []
+    for i in range(count):
+        response = await client.post("/books/", json={"title": f"Outbox {time.time_ns()}-{i}", "author": "Bench",
+                                                      "quantity": 1}, headers=admin)
+        books.append(response.json()["id"])
+    loans = []
+    for start in range(0, count, 200):
+        response = await client.post("/loans/batch", json={"member_id": borrower[0], "book_ids": books[start:start + 200]},
+                                     headers=borrower[1])
+        loans += [result["loan_id"] for result in response.json()["results"]]
+    for book_id in books:
+        await client.post("/reservations/", json={"book_id": book_id, "member_id": waiting[0]}, headers=waiting[1])
+    return loans
+
+
+async def phase(client, transport, loans, borrower):
+    from services.outbox import OutboxDispatcher
+
+    dispatchers = [OutboxDispatcher(0.02, transport) for _ in range(2)]
+    for dispatcher in dispatchers:
+        dispatcher.start()
+    samples = []
+    try:
+        for loan_id in loans:
+            started = time.perf_counter()
+            response = await client.put(f"/loans/{loan_id}/return", headers=borrower[1])
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+        started = time.perf_counter()
+        while await pending() and time.perf_counter() - started < 60:
+            await asyncio.sleep(0.05)
+        drain_seconds = time.perf_counter() - started
+    finally:
+        for dispatcher in dispatchers:
+            await dispatcher.stop()
+    return {"return_latency": percentiles(samples), "drain_seconds": round(drain_seconds, 3)}
+
+
+async def pending():
+    from sqlalchemy import func, select
+
+    from database.database import session_scope
+    from models.models import NotificationOutbox, OutboxStatus
+
+    async with session_scope() as db:
+        return await db.scalar(
+            select(func.count()).select_from(NotificationOutbox).where(NotificationOutbox.status == OutboxStatus.PENDING)
+        )
+
+
+def check(engine, path):
+    from collections import Counter
+
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT idempotency_key, status, attempts FROM notification_outbox").all()
+        promotions = conn.exec_driver_sql("SELECT count(*) FROM reservations WHERE notification_date IS NOT NULL").scalar()
+    with open(path) as fh:
+        written = Counter(json.loads(line)["key"] for line in fh)
+    return {
+        "outbox_rows": len(rows),
+        "promotions": promotions,
+        "statuses": dict(Counter(status for _, status, _ in rows)),
+        "attempts": dict(sorted(Counter(attempts for _, _, attempts in rows).items())),
+        "written": sum(written.values()),
+        "duplicates": sum(count - 1 for count in written.values()),
+        "missing": len({key for key, _, _ in rows} - set(written)),
+    }
+
+
+async def run(args):
+    from sqlalchemy import select
+
+    import main
+    from auth.auth_utils import create_access_token
+    from benchmarks.seed import member_email, seed
+    from config import settings
+    from database.database import SessionLocal, engine
+    from init_db import init_db
+    from models.models import Member
+
+    init_db()
+    seed(engine, members=2, books=1, loans=0, reservations=0)
+    with SessionLocal() as db:
+        admin_id = db.scalar(select(Member.id).where(Member.is_admin == True).limit(1))
+        borrower_id, waiting_id = db.scalars(
+            select(Member.id).where(Member.email.in_([member_email(0), member_email(1)])).order_by(Member.id)
+        ).all()
+
+    def auth(member_id):
+        return member_id, {"Authorization": f"Bearer {create_access_token({'sub': str(member_id)})}"}
+
+    admin, borrower, waiting = auth(admin_id)[1], auth(borrower_id), auth(waiting_id)
+    random.seed(7)
+    phases = {}
+    try:
+        async with asgi_client(main.app) as client:
+            for name, transport in transports(settings.NOTIFICATION_FILE, args.slow_ms, args.failure_rate).items():
+                loans = await prepare(client, admin, borrower, waiting, args.returns)
+                phases[name] = await phase(client, transport, loans, borrower)
+    finally:
+        await main.shutdown()
+
+    delivery = check(engine, settings.NOTIFICATION_FILE)
+    engine.dispose()
+    failures = []
+    expected = args.returns * len(phases)
+    if delivery["outbox_rows"] != expected or delivery["promotions"] != expected:
+        failures.append(f"expected {expected} promotions with a notification each")
+    if delivery["statuses"] != {"SENT": expected}:
+        failures.append("not every notification was sent")
+    if delivery["written"] != expected or delivery["duplicates"] or delivery["missing"]:
+        failures.append("notifications missing or written more than once")
+    if max(delivery["attempts"]) < 2:
+        failures.append("the flaky transport never forced a retry")
+    return {"phases": phases, "delivery": delivery, "failures": failures}
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    without_rate_limits()
+    use_scratch_database("outbox.db")
+    # The benchmark runs its own dispatchers, with retries quick enough to drain in seconds
+    os.environ["LIBRARY_OUTBOX_DISPATCH_ENABLED"] = "0"
+    os.environ["LIBRARY_OUTBOX_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["LIBRARY_OUTBOX_BACKOFF_SECONDS"] = "0.02"
+    os.environ["LIBRARY_OUTBOX_BACKOFF_MAX_SECONDS"] = "0.2"
+    os.environ["LIBRARY_OUTBOX_MAX_ATTEMPTS"] = "50"
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failures"] else 0)
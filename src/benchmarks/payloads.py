@@ -0,0 +1,139 @@
+"""Bytes on the wire and server CPU for full, sparse (``fields=``) and compressed list pages.
+
+Fetches one ``--limit`` row page of each large listing in every combination
+of full or sparse rows and identity, gzip or brotli encoding, and reports
+the encoded size, CPU time per request (client and server share the process,
+so the client only reads raw bytes and never decodes) and latency. Also
+checks that each compressed body decodes to the identity one, and that a
+sparse page's SELECT names only the requested columns. Exits non-zero if
+either check fails. Run from ``src/``:
+
+    python -m benchmarks.payloads --limit 1000 --repeat 20
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+
+from benchmarks.common import asgi_client, percentiles, use_scratch_database, without_rate_limits
+from benchmarks.seed import add_seed_arguments
+
+# Listing -> the fields a picker would ask for
+LISTINGS = {
+    "/books/": "id,title",
+    "/members/": "id,name",
+    "/loans/history": "id,book_id,return_date",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_seed_arguments(parser)
+    parser.add_argument("--limit", type=int, default=1000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=20, help="timed requests per variant")
+    return parser.parse_args()
+
+
+def decode(body: bytes, coding: str) -> bytes:
+    if coding == "gzip":
+        return gzip.decompress(body)
+    if coding == "br":
+        import brotli
+        return brotli.decompress(body)
+    return body
+
+
+async def fetch(client, path, params, headers):
+    async with client.stream("GET", path, params=params, headers=headers) as response:
+        response.raise_for_status()
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    return response.headers.get("content-encoding", "identity"), body
+
+
+async def run(args):
+    from sqlalchemy import event, select
+
+    import main
+    from auth.auth_utils import create_access_token
+    from benchmarks.seed import seed
+    from database.database import SessionLocal, async_engine, async_read_engine, engine
+    from init_db import init_db
+    from models.models import Member
+    from routes.compression import brotli
+
+    init_db()
+    seeded = seed(engine, members=args.members, books=args.books, loans=args.loans,
+                  reservations=args.reservations, outstanding=args.outstanding,
+                  chunk_size=args.chunk_size, seed=args.seed)
+    with SessionLocal() as db:
+        admin_id = db.scalar(select(Member.id).where(Member.is_admin == True).limit(1))
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(admin_id)})}"}
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for sync_engine in {async_engine.sync_engine, async_read_engine.sync_engine, engine}:
+        event.listen(sync_engine, "before_cursor_execute", record)
+
+    codings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    report, failures = {}, []
+    try:
+        async with asgi_client(main.app) as client:
+            for path, fields in LISTINGS.items():
+                results = {}
+                for shape in ("full", "sparse"):
+                    params = {"limit": args.limit, **({"fields": fields} if shape == "sparse" else {})}
+                    identity = None
+                    for coding in codings:
+                        request_headers = {**headers, "Accept-Encoding": coding}
+                        statements.clear()
+                        encoding, body = await fetch(client, path, params, request_headers)
+                        # The page query is the one ordered by id; its column list is what was read
+                        page_select = next(s for s in reversed(statements) if "ORDER BY" in s and "LIMIT" in s)
+                        if identity is None:
+                            identity = body
+                        elif decode(body, encoding) != identity:
+                            failures.append(f"{path} {shape} {coding}: decoded body differs from identity")
+                        if encoding != coding:
+                            failures.append(f"{path} {shape}: asked for {coding}, got {encoding}")
+
+                        samples = []
+                        cpu_started = time.process_time()
+                        for _ in range(args.repeat):
+                            started = time.perf_counter()
+                            await fetch(client, path, params, request_headers)
+                            samples.append(time.perf_counter() - started)
+                        cpu = time.process_time() - cpu_started
+                        results[f"{shape}/{coding}"] = {
+                            "bytes": len(body),
+                            "rows": len(json.loads(identity)["items"]),
+                            "cpu_ms": round(cpu / args.repeat * 1000, 2),
+                            "latency": percentiles(samples),
+                            "selected_columns": page_select.split(" FROM ", 1)[0].count(",") + 1,
+                        }
+                full, sparse = results["full/identity"], results["sparse/identity"]
+                # A union lists its columns once per branch, so compare per branch
+                if sparse["selected_columns"] >= full["selected_columns"]:
+                    failures.append(f"{path}: the sparse SELECT reads as many columns as the full one")
+                if sparse["bytes"] >= full["bytes"]:
+                    failures.append(f"{path}: the sparse page is not smaller")
+                report[path] = {"fields": fields, "variants": results}
+    finally:
+        await main.shutdown()
+    engine.dispose()
+    return {"seeded": seeded, "limit": args.limit, "listings": report, "failures": failures}
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    without_rate_limits()
+    use_scratch_database("payloads.db")
+    os.environ["LIBRARY_PAGE_SIZE_MAX"] = str(max(args.limit, 1000))
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failures"] else 0)
@@ -0,0 +1,148 @@
+"""N+1 check: SQL statements per request at two result sizes.
+
+Each list, search and set-based batch endpoint is called for ``--rows`` and
+for twice as many rows; the statement count must not change between the two.
+Both sizes are large enough to take the same branches (a page with some books
+out on loan, a return that frees a queued title), so any difference is per-row. The app runs with ``LIBRARY_QUERY_BUDGET`` set, so a lazy
+load inside a loop also fails outright. Batch checkout is left out: it takes
+copies with one conditional UPDATE per distinct title by design, bounded by
+the request rather than by what it returns. Run from ``src/``:
+
+    python -m benchmarks.query_counts --rows 25
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from benchmarks.common import asgi_client, use_scratch_database
+from benchmarks.seed import WORDS, add_seed_arguments, member_email
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_seed_arguments(parser)
+    parser.add_argument("--rows", type=int, default=25, help="result size of the first call; the second asks for twice as many")
+    parser.add_argument("--budget", type=int, default=25, help="LIBRARY_QUERY_BUDGET for the app under test")
+    return parser.parse_args()
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def attach(self, *engines):
+        from sqlalchemy import event
+
+        for sync_engine in engines:
+            event.listen(sync_engine, "before_cursor_execute", self)
+
+
+def _fixtures(rows):
+    from sqlalchemy import select
+
+    from auth.auth_utils import create_access_token
+    from database.database import SessionLocal
+    from models.models import Loan, Member
+
+    def auth(member_id):
+        return {"Authorization": f"Bearer {create_access_token({'sub': str(member_id)})}"}
+
+    with SessionLocal() as db:
+        admin_id = db.scalar(select(Member.id).where(Member.is_admin == True).limit(1))
+        member_id = db.scalar(select(Member.id).where(Member.email == member_email(1)))
+        open_loans = db.scalars(select(Loan.id).where(Loan.is_returned == False).limit(rows + 1)).all()
+    return {"admin": auth(admin_id), "member": auth(member_id), "open_loans": list(open_loans)}
+
+
+def _size(response):
+    body = response.json()
+    if isinstance(body, list):
+        return len(body)
+    return len(body.get("items") or body.get("results") or []) or body.get("inserted", 0)
+
+
+def build_calls(fixtures):
+    """``name -> call(size)``; each call requests ``size`` rows of result."""
+    admin, member = fixtures["admin"], fixtures["member"]
+    open_loans = fixtures["open_loans"]
+
+    def listing(path, headers, **params):
+        return lambda client, size: client.get(path, params={"limit": size, **params}, headers=headers)
+
+    def batch_return(client, size):
+        loan_ids = [open_loans.pop() for _ in range(size)]
+        return client.post("/loans/batch/return", json={"loan_ids": loan_ids}, headers=admin)
+
+    batches = iter(range(1_000_000))
+
+    def import_books(client, size):
+        # Fresh titles every call, so each run takes the insert path
+        batch = next(batches)
+        lines = "".join(f"Count Check {batch}-{i},Query,1\n" for i in range(size))
+        return client.post("/books/import", content="title,author,quantity\n" + lines,
+                           headers={**admin, "Content-Type": "text/csv"})
+
+    return {
+        "books": listing("/books/", member),
+        "search": listing("/books/search", member, query=WORDS[0]),
+        "members": listing("/members/", admin),
+        "loans_history_member": listing("/loans/history", member),
+        "loans_history_admin": listing("/loans/history", admin),
+        "borrowed_admin": listing("/loans/borrowed", admin),
+        "reservations_admin": listing("/reservations/", admin),
+        "reservations_active_admin": listing("/reservations/active", admin),
+        "analytics_top_books": listing("/analytics/books/top", admin),
+        "analytics_top_members": listing("/analytics/members/top", admin),
+        "batch_return": batch_return,
+        "import": import_books,
+    }
+
+
+async def run(args):
+    from benchmarks.seed import seed
+    from database.database import async_engine, async_read_engine, engine, read_engine
+    from init_db import init_db
+    import main
+
+    init_db()
+    seed(engine, members=args.members, books=args.books, loans=args.loans,
+         reservations=args.reservations, outstanding=args.outstanding,
+         chunk_size=args.chunk_size, seed=args.seed)
+    counter = StatementCounter()
+    counter.attach(*{engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine})
+
+    results, failures = {}, []
+    try:
+        async with asgi_client(main.app) as client:
+            for name, call in build_calls(_fixtures(3 * args.rows)).items():
+                # Warm-up: the first request of a principal also loads it into the principal cache
+                await call(client, 1)
+                measured = {}
+                sizes = (args.rows, 2 * args.rows)
+                for size in sizes:
+                    before = counter.count
+                    response = await call(client, size)
+                    if response.status_code != 200:
+                        failures.append(f"{name}: HTTP {response.status_code} at {size} rows")
+                        break
+                    measured[size] = {"rows": _size(response), "statements": counter.count - before}
+                results[name] = measured
+                if len(measured) == 2 and measured[sizes[0]]["statements"] != measured[sizes[1]]["statements"]:
+                    failures.append(f"{name}: statements grow with result size")
+    finally:
+        await main.shutdown()
+    return {"rows": args.rows, "budget": args.budget, "results": results, "failures": failures}
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    use_scratch_database("query_counts.db")
+    os.environ["LIBRARY_QUERY_BUDGET"] = str(args.budget)
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failures"] else 0)
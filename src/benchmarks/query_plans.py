@@ -0,0 +1,251 @@
+"""EXPLAIN QUERY PLAN audit of every statement the API routes issue.
+
+Seeds a scratch database (so the planner has ANALYZE statistics to work
+with), drives each route once over ASGI while capturing the SQL it sends,
+then explains every distinct statement with the parameters it actually ran
+with. Exits non-zero if a route was not exercised or a plan reads a whole
+table. Unfiltered keyset pages (``ORDER BY id LIMIT`` with no WHERE) are the
+one allowed scan: they stop after a page of rows. Run from ``src/``:
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --loans 200000 --verbose
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+from datetime import datetime
+
+from benchmarks.common import asgi_client, use_scratch_database
+from benchmarks.seed import SEED_PASSWORD, add_seed_arguments, member_email
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE|INSERT\s+INTO\s+\w+\s*(\([^)]*\))?\s*SELECT)", re.I)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_seed_arguments(parser)
+    parser.add_argument("--verbose", action="store_true", help="include every plan in the report")
+    return parser.parse_args()
+
+
+class StatementLog:
+    """Distinct statements (with their first parameters) seen on the app's engines."""
+
+    def __init__(self):
+        self.statements = {}
+        self.active = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if not self.active or not _EXPLAINABLE.match(statement):
+            return
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        self.statements.setdefault(statement, parameters)
+
+    def attach(self, *engines):
+        from sqlalchemy import event
+
+        for sync_engine in engines:
+            event.listen(sync_engine, "before_cursor_execute", self)
+
+
+async def exercise_routes(client, db_fixtures):
+    """Call every route once, in an order that reaches the interesting branches.
+
+    Returns the ``(method, path template)`` pairs that were hit.
+    """
+    admin, member, other = db_fixtures["admin"], db_fixtures["member"], db_fixtures["other"]
+    as_member = member["headers"]
+    hit = set()
+
+    async def call(method, template, path=None, expected=(200,), **kwargs):
+        response = await client.request(method, path or template, **kwargs)
+        if response.status_code not in expected:
+            raise RuntimeError(f"{method} {path or template} -> {response.status_code}: {response.text[:200]}")
+        hit.add((method, template))
+        return response
+
+    await call("GET", "/")
+    await call("GET", "/metrics")
+    tokens = (await call("POST", "/token", data={"username": member["email"], "password": SEED_PASSWORD})).json()
+    tokens = (await call("POST", "/token/refresh", data={"refresh_token": tokens["refresh_token"]})).json()
+    await call("POST", "/token/revoke", data={"refresh_token": tokens["refresh_token"]})
+
+    await call("POST", "/members/", json={
+        "name": "Plan Check", "email": "plan.check@bench.example.com",
+        "phone": "+1234567890", "password": "plan-check-password",
+    })
+    members = (await call("GET", "/members/", params={"limit": 10}, headers=admin)).json()
+    await call("GET", "/members/", params={"cursor": members["next_cursor"], "limit": 10}, headers=admin)
+    await call("GET", "/members/{member_id}", f"/members/{member['id']}", headers=as_member)
+    await call("PUT", "/members/{member_id}", f"/members/{member['id']}", json={"phone": "+1987654321"}, headers=as_member)
+
+    # One copy, so the second member has to queue for it
+    book = (await call("POST", "/books/", json={"title": "Plan Check", "author": "Query", "quantity": 1},
+                       headers=admin)).json()
+    spare = (await call("POST", "/books/", json={"title": "Plan Check Spare", "author": "Query", "quantity": 3},
+                        headers=admin)).json()
+    await call("POST", "/books/import", content="title,author,quantity\nPlan Check,Query,1\nPlan Import,Query,2\n",
+               headers={**admin, "Content-Type": "text/csv"})
+    books = (await call("GET", "/books/", params={"limit": 10}, headers=as_member)).json()
+    await call("GET", "/books/", params={"cursor": books["next_cursor"], "limit": 10}, headers=as_member)
+    await call("GET", "/books/search", params={"query": "plan"}, headers=as_member)
+
+    loan = (await call("POST", "/loans/", json={"book_id": book["id"], "member_id": member["id"]},
+                       headers=as_member)).json()
+    reservation = (await call("POST", "/reservations/", json={"book_id": book["id"], "member_id": other["id"]},
+                              headers=other["headers"])).json()
+    await call("GET", "/reservations/{reservation_id}/position", f"/reservations/{reservation['id']}/position",
+               headers=other["headers"])
+    for headers in (other["headers"], admin):
+        await call("GET", "/reservations/", params={"limit": 10}, headers=headers)
+        await call("GET", "/reservations/active", params={"limit": 10}, headers=headers)
+        await call("GET", "/loans/borrowed", params={"limit": 10}, headers=headers)
+        await call("GET", "/loans/history", params={"limit": 10}, headers=headers)
+    await call("GET", "/loans/borrowed", params={"cursor": 1, "limit": 10}, headers=admin)
+
+    # Returning the only copy promotes the queued reservation to a hold
+    await call("PUT", "/loans/{loan_id}/return", f"/loans/{loan['id']}/return", headers=as_member)
+    batch = (await call("POST", "/loans/batch", json={"member_id": other["id"], "book_ids": [book["id"], spare["id"]]},
+                        headers=other["headers"])).json()
+    loan_ids = [result["loan_id"] for result in batch["results"] if result.get("loan_id")]
+    await call("POST", "/loans/batch/return", json={"loan_ids": loan_ids}, headers=admin)
+
+    queued = (await call("POST", "/reservations/", json={"book_id": db_fixtures["unavailable_book"],
+                                                         "member_id": member["id"]}, headers=as_member)).json()
+    await call("PUT", "/reservations/{reservation_id}/cancel", f"/reservations/{queued['id']}/cancel", headers=as_member)
+    await call("DELETE", "/books/{book_id}", f"/books/{spare['id']}", headers=admin)
+
+    period = {"start": "2000-01-01"}
+    await call("GET", "/analytics/books/top", params=period, headers=admin)
+    await call("GET", "/analytics/members/top", params=period, headers=admin)
+    await call("GET", "/analytics/daily", params=period, headers=admin)
+    await call("GET", "/analytics/holds/wait", params=period, headers=admin)
+    return hit
+
+
+def _fixtures():
+    from sqlalchemy import select
+
+    from auth.auth_utils import create_access_token
+    from database.database import SessionLocal
+    from models.models import Book, Member
+
+    def auth(member_id):
+        return {"Authorization": f"Bearer {create_access_token({'sub': str(member_id)})}"}
+
+    with SessionLocal() as db:
+        admin_id = db.scalar(select(Member.id).where(Member.is_admin == True).limit(1))
+        member_id = db.scalar(select(Member.id).where(Member.email == member_email(1)))
+        other_id = db.scalar(select(Member.id).where(Member.email == member_email(2)))
+        unavailable = db.scalar(select(Book.id).where(Book.available_quantity == 0).limit(1))
+    return {
+        "admin": auth(admin_id),
+        "member": {"id": member_id, "email": member_email(1), "headers": auth(member_id)},
+        "other": {"id": other_id, "headers": auth(other_id)},
+        "unavailable_book": unavailable,
+    }
+
+
+# Below this many rows the planner rightly prefers a scan (resource_versions holds one row per table)
+_SMALL_TABLE_ROWS = 100
+
+
+def _large_tables(conn):
+    from database.database import Base
+
+    return {
+        name for name in Base.metadata.tables
+        if conn.exec_driver_sql(f"SELECT count(*) FROM {name}").scalar() >= _SMALL_TABLE_ROWS
+    }
+
+
+def full_scans(plan, statement, tables):
+    """Plan rows that read a whole table, minus unfiltered LIMIT pages."""
+    if " LIMIT " in statement and " WHERE " not in statement:
+        return []
+    scans = []
+    for detail in plan:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in tables:
+            scans.append(detail)
+    return scans
+
+
+def explain(engine, log, verbose):
+    report = {"statements": len(log.statements), "full_scans": [], "plans": []}
+    with engine.connect() as conn:
+        tables = _large_tables(conn)
+        for statement, parameters in log.statements.items():
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            plan = [row[-1] for row in rows]
+            flat = " ".join(statement.split())
+            scans = full_scans(plan, f" {flat} ", tables)
+            if scans:
+                report["full_scans"].append({"sql": flat, "scans": scans, "plan": plan})
+            elif verbose:
+                report["plans"].append({"sql": flat, "plan": plan})
+    return report
+
+
+async def run(args):
+    from fastapi.routing import APIRoute
+
+    from benchmarks.seed import seed
+    from database.database import async_engine, async_read_engine, engine, read_engine, session_scope
+    from init_db import init_db
+    from services.loan_archive import archive_all
+    from services.outbox import outbox_dispatcher
+    from services.reservation_events import current_holds, hold_relay, reservation_events
+    from services.reservation_queue import expire_holds
+    import main
+
+    init_db()
+    counts = seed(engine, members=args.members, books=args.books, loans=args.loans,
+                  reservations=args.reservations, outstanding=args.outstanding,
+                  chunk_size=args.chunk_size, seed=args.seed)
+    # Older returns go to the archive first, so /loans/history plans run against both tables
+    counts["archived_loans"] = await archive_all(after_days=365)
+
+    fixtures = _fixtures()
+    log = StatementLog()
+    log.attach(engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine)
+    log.active = True
+    try:
+        async with asgi_client(main.app) as client:
+            hit = await exercise_routes(client, fixtures)
+        # The hold sweep runs from the scheduler rather than a route, but it is just as hot
+        async with session_scope() as db:
+            await expire_holds(db)
+            # The event stream never ends over ASGI, so its queries are run directly
+            await current_holds(db, fixtures["member"]["id"])
+        await archive_all(after_days=180)
+        # Delivers what the routes and the sweep queued, so claim, render and record are explained too
+        await outbox_dispatcher.run_once()
+        # The relay only queries while a stream is open
+        subscription = reservation_events.subscribe(fixtures["member"]["id"])
+        await hold_relay.run_once(datetime.utcnow())
+        reservation_events.unsubscribe(subscription)
+    finally:
+        log.active = False
+        await main.shutdown()
+
+    routes = {
+        (method, route.path) for route in main.app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    } - {("GET", "/reservations/events")}
+    report = explain(engine, log, args.verbose)
+    report["seeded"] = counts
+    report["unexercised_routes"] = sorted(f"{method} {path}" for method, path in routes - hit)
+    engine.dispose()
+    return report
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    use_scratch_database("query_plans.db")
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, default=str))
+    sys.exit(1 if report["full_scans"] or report["unexercised_routes"] else 0)
@@ -0,0 +1,155 @@
+"""Rate limiter overhead per request, its memory bound, and a credential-stuffing burst.
+
+Times the in-memory bucket store on its own, then the whole dependency for
+each kind of key (client IP, JSON body email, bearer token subject) against
+the same request with the limiter switched off. Then fills the store past
+``--max-keys`` to check eviction holds it there, and fires a burst of bad
+logins at one account through the app: everything past the per-email burst
+must come back 429 without reaching bcrypt. Run from ``src/``:
+
+    python -m benchmarks.rate_limit --calls 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from benchmarks.common import asgi_client, percentiles, use_scratch_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100000, help="timed calls per measurement")
+    parser.add_argument("--max-keys", type=int, default=10000, help="bucket store bound for the eviction check")
+    parser.add_argument("--logins", type=int, default=60, help="bad logins in the burst")
+    return parser.parse_args()
+
+
+def _request(headers, body=b""):
+    from starlette.requests import Request
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/", "query_string": b"", "client": ("203.0.113.7", 5000),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    }
+    return Request(scope, receive)
+
+
+async def _per_call(calls, call):
+    started = time.perf_counter()
+    for _ in range(calls):
+        await call()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+async def overhead(calls):
+    """Microseconds per request added by each kind of key."""
+    from auth.auth_utils import create_access_token
+    from auth.rate_limit import Limit, MemoryBackend, rate_limit, rate_limiter
+
+    # Limits high enough that every call is admitted, so the cost is the bookkeeping
+    unlimited = (10 ** 12, 1)
+    token = create_access_token({"sub": "42"})
+    body = json.dumps({"email": "someone@example.com", "name": "Someone"}).encode()
+    cases = {
+        "ip": (rate_limit("bench", per_ip=unlimited), {}, b""),
+        "ip_email": (rate_limit("bench", per_ip=unlimited, per_email=unlimited),
+                     {"Content-Type": "application/json"}, body),
+        "ip_member": (rate_limit("bench", per_ip=unlimited, per_member=unlimited),
+                      {"Authorization": f"Bearer {token}"}, b""),
+    }
+
+    backend = MemoryBackend(max_keys=10 ** 6)
+    limit = Limit(*unlimited)
+    report = {"backend_take_us": round(await _per_call(calls, lambda: backend.take("ip:203.0.113.7", limit)), 3)}
+    for name, (dependency, headers, payload) in cases.items():
+        check = dependency.dependency
+
+        async def call():
+            await check(_request(headers, payload))
+
+        rate_limiter.enabled = False
+        baseline = await _per_call(calls, call)
+        rate_limiter.enabled = True
+        limited = await _per_call(calls, call)
+        report[name] = {"overhead_us": round(limited - baseline, 3), "request_us": round(baseline, 3)}
+    return report
+
+
+async def eviction(max_keys, calls):
+    from auth.rate_limit import Limit, MemoryBackend
+
+    backend = MemoryBackend(max_keys)
+    limit = Limit(5, 60)
+    for i in range(calls):
+        await backend.take(f"ip:{i}", limit)
+    return {"distinct_keys": calls, "max_keys": max_keys, "buckets_held": len(backend)}
+
+
+async def login_burst(logins):
+    import main
+    from benchmarks.seed import SEED_PASSWORD, member_email, seed
+    from config import settings
+    from database.database import engine
+    from init_db import init_db
+
+    init_db()
+    seed(engine, members=2, books=1, loans=0, reservations=0)
+    burst = settings.RATE_LIMIT_LOGIN_PER_EMAIL[0]
+
+    verifies = 0
+    verify = main.verify_password
+
+    async def counting_verify(password, hashed):
+        nonlocal verifies
+        verifies += 1
+        return await verify(password, hashed)
+
+    main.verify_password = counting_verify
+    statuses, latency, other = {}, {}, None
+    try:
+        async with asgi_client(main.app) as client:
+            for attempt in range(logins):
+                if attempt == burst + 1:
+                    # The target account is cut off; another one from the same address still gets in
+                    other = (await client.post(
+                        "/token", data={"username": member_email(1), "password": SEED_PASSWORD}
+                    )).status_code
+                started = time.perf_counter()
+                response = await client.post("/token", data={"username": member_email(0), "password": f"guess-{attempt}"})
+                elapsed = time.perf_counter() - started
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                latency.setdefault(response.status_code, []).append(elapsed)
+    finally:
+        main.verify_password = verify
+        await main.shutdown()
+    return {
+        "login_limit_per_email": settings.RATE_LIMIT_LOGIN_PER_EMAIL,
+        "login_limit_per_ip": settings.RATE_LIMIT_LOGIN_PER_IP,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "bcrypt_verifies": verifies,
+        "latency": {str(code): percentiles(samples) for code, samples in sorted(latency.items())},
+        "other_account_status": other,
+        "ok": statuses.get(429, 0) == max(0, logins - burst) and verifies == min(burst, logins) + (other is not None),
+    }
+
+
+async def run(args):
+    report = {"overhead": await overhead(args.calls), "eviction": await eviction(args.max_keys, args.calls)}
+    report["eviction"]["ok"] = report["eviction"]["buckets_held"] <= args.max_keys
+    report["login_burst"] = await login_burst(args.logins)
+    return report
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    use_scratch_database("rate_limit.db")
+    os.environ["LIBRARY_RATE_LIMIT_ENABLED"] = "1"
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["eviction"]["ok"] and report["login_burst"]["ok"] else 1)
@@ -0,0 +1,206 @@
+"""Throughput and p50/p95/p99 latency for the main API paths on a seeded database.
+
+Each scenario runs for ``--duration`` seconds with ``--concurrency`` clients,
+either in-process over ASGI or against a local uvicorn. The JSON report
+carries the commit and settings so runs can be compared. Run from ``src/``:
+
+    python -m benchmarks.scenarios --loans 1000000 --members 50000 --books 20000
+    python -m benchmarks.scenarios --database /tmp/bench.db --transport uvicorn --scenarios search,list_loans
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+
+from benchmarks.common import asgi_client, drive, use_scratch_database, uvicorn_server, without_rate_limits
+from benchmarks.seed import SEED_PASSWORD, WORDS, add_seed_arguments
+
+# Reads first, then writes, so the write scenarios don't skew the read numbers
+SCENARIOS = (
+    "list_books", "list_members", "list_loans", "list_borrowed", "list_reservations",
+    "search", "checkout", "return", "token",
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_seed_arguments(parser)
+    parser.add_argument("--database", help="reuse an already seeded database instead of seeding a scratch one")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--transport", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--principals", type=int, default=500, help="distinct members issuing requests")
+    parser.add_argument("--output", help="also write the report to this file")
+    return parser.parse_args()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _load_fixtures(args):
+    """Sample members to act as and outstanding loans to return from the database."""
+    from sqlalchemy import func, select
+
+    from auth.auth_utils import create_access_token
+    from database.database import SessionLocal
+    from models.models import Book, Loan, Member
+
+    with SessionLocal() as db:
+        admin_id = db.scalar(select(Member.id).where(Member.is_admin == True).limit(1))
+        principals = db.execute(
+            select(Member.id, Member.email).where(Member.is_admin == False)
+            .order_by(func.random()).limit(args.principals)
+        ).all()
+        max_book = db.scalar(select(func.max(Book.id))) or 1
+        open_loans = db.scalars(select(Loan.id).where(Loan.is_returned == False)).all()
+
+    def auth(member_id):
+        return {"Authorization": f"Bearer {create_access_token({'sub': str(member_id)})}"}
+
+    random.shuffle(open_loans)
+    return {
+        "admin": auth(admin_id),
+        "members": [(member_id, email, auth(member_id)) for member_id, email in principals],
+        "max_book": max_book,
+        "open_loans": open_loans,
+    }
+
+
+def build_scenarios(client, fixtures, page_size):
+    """Map scenario name to ``(request coroutine factory, expected statuses)``."""
+    members, admin = fixtures["members"], fixtures["admin"]
+    open_loans = fixtures["open_loans"]
+    page = {"limit": page_size}
+
+    def member():
+        return random.choice(members)
+
+    async def token():
+        _, email, _ = member()
+        return await client.post("/token", data={"username": email, "password": SEED_PASSWORD})
+
+    async def search():
+        query = random.choice(WORDS)[:random.randint(3, 6)]
+        return await client.get("/books/search", params={"query": query}, headers=member()[2])
+
+    async def checkout():
+        member_id, _, headers = member()
+        book_id = random.randint(1, fixtures["max_book"])
+        return await client.post("/loans/", json={"book_id": book_id, "member_id": member_id}, headers=headers)
+
+    async def return_loan():
+        if not open_loans:
+            return None
+        return await client.put(f"/loans/{open_loans.pop()}/return", headers=admin)
+
+    async def list_books():
+        return await client.get("/books/", params=page, headers=member()[2])
+
+    async def list_members():
+        return await client.get("/members/", params=page, headers=admin)
+
+    async def list_loans():
+        return await client.get("/loans/history", params=page, headers=member()[2])
+
+    async def list_borrowed():
+        return await client.get("/loans/borrowed", params=page, headers=member()[2])
+
+    async def list_reservations():
+        return await client.get("/reservations/", params=page, headers=member()[2])
+
+    return {
+        "token": (token, (200,)),
+        "search": (search, (200,)),
+        # Random titles are often out on loan; a clean 400 is a valid outcome
+        "checkout": (checkout, (200, 400)),
+        "return": (return_loan, (200,)),
+        "list_books": (list_books, (200,)),
+        "list_members": (list_members, (200,)),
+        "list_loans": (list_loans, (200,)),
+        "list_borrowed": (list_borrowed, (200,)),
+        "list_reservations": (list_reservations, (200,)),
+    }
+
+
+async def run_scenarios(client, args, fixtures):
+    scenarios = build_scenarios(client, fixtures, args.page_size)
+    results = {}
+    for name in args.scenarios.split(","):
+        call, expected = scenarios[name.strip()]
+        results[name] = await drive(call, args.concurrency, args.duration, expected)
+    return results
+
+
+async def run(args):
+    from config import settings
+    from database.database import dispose_engines, engine
+
+    seeded = None
+    if not args.database:
+        from benchmarks.seed import seed
+        from init_db import init_db
+
+        init_db()
+        started = time.perf_counter()
+        seeded = seed(
+            engine, args.members, args.books, args.loans, args.reservations,
+            outstanding=args.outstanding, chunk_size=args.chunk_size, seed=args.seed,
+        )
+        seeded["seconds"] = round(time.perf_counter() - started, 2)
+    fixtures = _load_fixtures(args)
+
+    if args.transport == "uvicorn":
+        # The server has its own engines; release ours so they don't hold connections
+        await dispose_engines()
+        import httpx
+
+        with uvicorn_server(args.port) as base_url:
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+                results = await run_scenarios(client, args, fixtures)
+    else:
+        import main
+
+        await main.startup()
+        try:
+            async with asgi_client(main.app) as client:
+                results = await run_scenarios(client, args, fixtures)
+        finally:
+            await main.shutdown()
+
+    return {
+        "commit": _git_commit(),
+        "transport": args.transport,
+        "db_mode": settings.DB_MODE,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "page_size": args.page_size,
+        "seeded": seeded,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    without_rate_limits()
+    if args.database:
+        os.environ["LIBRARY_DB_PATH"] = os.path.abspath(args.database)
+    else:
+        use_scratch_database("scenarios.db")
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(report + "\n")
+    print(report)
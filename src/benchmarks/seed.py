@@ -0,0 +1,197 @@
+"""Fill a fresh database with synthetic members, books, loans and reservations.
+
+Rows go in through chunked Core executemany inserts, so a million loans take
+seconds rather than the minutes an ORM flush would. Output is deterministic
+for a given ``--seed``. Run from ``src/``:
+
+    LIBRARY_DB_PATH=/tmp/bench.db python -m benchmarks.seed --members 50000 --books 20000 --loans 1000000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+SEED_PASSWORD = "benchmark"
+
+WORDS = (
+    "river", "shadow", "garden", "empire", "winter", "silent", "glass", "storm", "harbor",
+    "ember", "crown", "atlas", "orchard", "lantern", "ocean", "copper", "forest", "signal",
+    "mirror", "desert", "falcon", "meadow", "archive", "comet", "violet", "thunder",
+)
+_SURNAMES = (
+    "Adams", "Baker", "Chen", "Diaz", "Evans", "Fischer", "Garcia", "Hughes", "Ito", "Jones",
+    "Kim", "Lopez", "Moreau", "Novak", "Okafor", "Patel", "Quinn", "Rossi", "Silva", "Tanaka",
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_seed_arguments(parser)
+    return parser.parse_args()
+
+
+def add_seed_arguments(parser):
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--loans", type=int, default=20000)
+    parser.add_argument("--reservations", type=int, default=2000)
+    parser.add_argument("--outstanding", type=float, default=0.1,
+                        help="fraction of loans still out (capped by copies on the shelf)")
+    parser.add_argument("--chunk-size", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def member_email(i: int) -> str:
+    return f"member{i}@bench.example.com"
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bulk_insert(engine, table, rows, chunk_size):
+    count = 0
+    for chunk in _chunks(rows, chunk_size):
+        with engine.begin() as conn:
+            conn.execute(insert(table), chunk)
+        count += len(chunk)
+    return count
+
+
+def seed(engine, members, books, loans, reservations, outstanding=0.1, chunk_size=20000, seed=42):
+    """Populate an initialised database (``init_db()`` has run) and return row counts.
+
+    Member ids start after the admin; every seeded member logs in with
+    ``SEED_PASSWORD`` via :func:`member_email`. Availability is kept
+    consistent with the outstanding loans, and WAITING reservations are only
+    placed on books with no copies left, as the API would.
+    """
+    from auth.passwords import pwd_context
+    from models.models import Book, Loan, Member, Reservation, ReservationStatus
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    hashed = pwd_context.hash(SEED_PASSWORD)
+
+    with engine.connect() as conn:
+        first_member = conn.scalar(text("SELECT coalesce(max(id), 0) FROM members")) + 1
+    member_ids = range(first_member, first_member + members)
+
+    _bulk_insert(engine, Member.__table__, (
+        {
+            "id": member_id,
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(_SURNAMES)}",
+            "email": member_email(i),
+            "phone": f"+1555{i:07d}",
+            "hashed_password": hashed,
+            "is_admin": False,
+        }
+        for i, member_id in enumerate(member_ids)
+    ), chunk_size)
+
+    quantities = [rng.randint(1, 5) for _ in range(books)]
+    available = list(quantities)
+
+    # Outstanding loans draw down shelf copies; the rest are returned history
+    out_loans = []
+    for _ in range(int(loans * outstanding)):
+        index = rng.randrange(books)
+        if available[index]:
+            available[index] -= 1
+            out_loans.append(index + 1)
+
+    _bulk_insert(engine, Book.__table__, (
+        {
+            "id": index + 1,
+            "title": " ".join(rng.sample(WORDS, 3)).title(),
+            "author": f"{rng.choice(WORDS).title()} {rng.choice(_SURNAMES)}",
+            "quantity": quantities[index],
+            "available_quantity": available[index],
+        }
+        for index in range(books)
+    ), chunk_size)
+
+    def loan_rows():
+        for position in range(loans):
+            member_id = rng.choice(member_ids)
+            loan_date = now - timedelta(days=rng.uniform(0, 730))
+            if position < len(out_loans):
+                book_id, is_returned = out_loans[position], False
+                loan_date = now - timedelta(days=rng.uniform(0, 13))
+                return_date = loan_date + timedelta(days=14)
+            else:
+                book_id, is_returned = rng.randint(1, books), True
+                return_date = loan_date + timedelta(days=rng.uniform(1, 21))
+            yield {
+                "book_id": book_id,
+                "member_id": member_id,
+                "loan_date": loan_date,
+                "return_date": return_date,
+                "is_returned": is_returned,
+                "created_by": member_id,
+            }
+
+    _bulk_insert(engine, Loan.__table__, loan_rows(), chunk_size)
+
+    exhausted = [index + 1 for index, copies in enumerate(available) if copies == 0]
+    closed = (ReservationStatus.COLLECTED, ReservationStatus.CANCELLED, ReservationStatus.EXPIRED)
+
+    def reservation_rows():
+        for _ in range(reservations):
+            member_id = rng.choice(member_ids)
+            reserved_at = now - timedelta(days=rng.uniform(0, 365))
+            if exhausted and rng.random() < 0.5:
+                book_id, status = rng.choice(exhausted), ReservationStatus.WAITING
+            else:
+                book_id, status = rng.randint(1, books), rng.choice(closed)
+            # Closed reservations were given a copy after a wait of a couple of days on average
+            notified = None
+            if status != ReservationStatus.WAITING:
+                notified = min(now, reserved_at + timedelta(hours=rng.expovariate(1 / 48)))
+            yield {
+                "book_id": book_id,
+                "member_id": member_id,
+                "reservation_date": reserved_at,
+                "status": status,
+                "is_active": status == ReservationStatus.WAITING,
+                "notification_date": notified,
+                "created_by": member_id,
+            }
+
+    _bulk_insert(engine, Reservation.__table__, reservation_rows(), chunk_size)
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    return {
+        "members": members,
+        "books": books,
+        "loans": loans,
+        "outstanding_loans": len(out_loans),
+        "reservations": reservations,
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    from database.database import engine
+    from init_db import init_db
+
+    started = time.perf_counter()
+    init_db()
+    counts = seed(
+        engine, args.members, args.books, args.loans, args.reservations,
+        outstanding=args.outstanding, chunk_size=args.chunk_size, seed=args.seed,
+    )
+    engine.dispose()
+    print(json.dumps({**counts, "seconds": round(time.perf_counter() - started, 2)}, indent=2))
@@ -0,0 +1,94 @@
+"""Serialization cost of a 10k-row loan page: ORM + jsonable_encoder versus column rows + orjson.
+
+``legacy`` reproduces the old path (full ``Loan`` entities through FastAPI's
+reflective encoder and ``json.dumps``); ``typed`` is what the routers do now
+(column tuples validated against the response model, rendered by orjson).
+``endpoint`` times ``GET /loans/history`` end to end. Run from ``src/``:
+
+    python -m benchmarks.serialization --rows 10000 --repeat 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from benchmarks.common import asgi_client, use_scratch_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    return parser.parse_args()
+
+
+def _timed(fn, repeat):
+    samples, size = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(fn())
+        samples.append(time.perf_counter() - started)
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 2),
+        "min_ms": round(min(samples) * 1000, 2),
+        "bytes": size,
+    }
+
+
+async def run(args):
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    from sqlalchemy import select
+
+    from auth.auth_utils import create_access_token
+    from benchmarks.seed import seed
+    from database.database import SessionLocal, engine
+    from init_db import init_db
+    from models.models import Loan
+    from routes.loans import LoanResponse
+    from routes.pagination import Page, select_columns
+    import main
+
+    init_db()
+    seed(engine, members=100, books=1000, loans=args.rows, reservations=0, outstanding=0)
+    page_model = Page[LoanResponse]
+
+    def legacy():
+        with SessionLocal() as db:
+            loans = db.scalars(select(Loan).order_by(Loan.id).limit(args.rows)).all()
+            return json.dumps(jsonable_encoder({"items": loans, "next_cursor": None})).encode()
+
+    def typed():
+        with SessionLocal() as db:
+            rows = db.execute(select_columns(Loan, LoanResponse).order_by(Loan.id).limit(args.rows)).all()
+            page = page_model.model_validate({"items": [row._asdict() for row in rows], "next_cursor": None})
+            return orjson.dumps(page.model_dump(mode="json"))
+
+    results = {"legacy": _timed(legacy, args.repeat), "typed": _timed(typed, args.repeat)}
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': '1'})}"}
+    async with asgi_client(main.app) as client:
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            response = await client.get("/loans/history", params={"limit": args.rows}, headers=headers)
+            response.raise_for_status()
+            samples.append(time.perf_counter() - started)
+    await main.shutdown()
+    results["endpoint"] = {
+        "median_ms": round(statistics.median(samples) * 1000, 2),
+        "min_ms": round(min(samples) * 1000, 2),
+        "bytes": len(response.content),
+    }
+    results["speedup"] = round(results["legacy"]["median_ms"] / results["typed"]["median_ms"], 2)
+    return {"rows": args.rows, "repeat": args.repeat, "results": results}
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    use_scratch_database("serialization_bench.db")
+    # Let the endpoint hand back the whole set as one page
+    os.environ["LIBRARY_PAGE_SIZE_MAX"] = str(max(args.rows, 1000))
+    print(json.dumps(asyncio.run(run(args)), indent=2))
@@ -0,0 +1,186 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_rate(name: str, default: str):
+    """``"<count>/<seconds>"`` as a ``(count, seconds)`` pair; empty or ``"0"`` disables the limit."""
+    value = os.getenv(name, default).strip()
+    if not value or value == "0":
+        return None
+    count, _, seconds = value.partition("/")
+    return int(count), float(seconds or 1)
+
+
+DATABASE_PATH = os.getenv("LIBRARY_DB_PATH", os.path.join(BASE_DIR, "library.db"))
+# Full SQLAlchemy URLs take precedence over the path. Async URLs default to the
+# aiosqlite form of their sync counterpart.
+DATABASE_URL = os.getenv("LIBRARY_DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
+ASYNC_DATABASE_URL = os.getenv("LIBRARY_ASYNC_DATABASE_URL")
+
+# "async" serves requests through aiosqlite, "sync" runs the classic sqlite3
+# session in the threadpool. Both expose the same awaitable session API so the
+# routers are identical and the two can be benchmarked under the same load.
+DB_MODE = os.getenv("LIBRARY_DB_MODE", "async").lower()
+
+# Authenticated principals resolved by get_current_user are cached per token
+# so catalog reads do not pay a members lookup on every request.
+PRINCIPAL_CACHE_SIZE = env_int("LIBRARY_PRINCIPAL_CACHE_SIZE", 1024)
+PRINCIPAL_CACHE_TTL_SECONDS = env_float("LIBRARY_PRINCIPAL_CACHE_TTL_SECONDS", 60.0)
+
+# Keyset pagination for list endpoints and chunking for their NDJSON streams
+PAGE_SIZE_DEFAULT = env_int("LIBRARY_PAGE_SIZE_DEFAULT", 100)
+PAGE_SIZE_MAX = env_int("LIBRARY_PAGE_SIZE_MAX", 1000)
+STREAM_CHUNK_SIZE = env_int("LIBRARY_STREAM_CHUNK_SIZE", 500)
+
+# Response compression, negotiated per request: brotli when the package is
+# installed, else gzip. Complete bodies under MIN_SIZE bytes go out as is;
+# streamed bodies are always compressed.
+COMPRESSION_ENABLED = env_bool("LIBRARY_COMPRESSION_ENABLED", True)
+COMPRESSION_MIN_SIZE = env_int("LIBRARY_COMPRESSION_MIN_SIZE", 1024)
+COMPRESSION_GZIP_LEVEL = env_int("LIBRARY_COMPRESSION_GZIP_LEVEL", 6)
+COMPRESSION_BROTLI_QUALITY = env_int("LIBRARY_COMPRESSION_BROTLI_QUALITY", 4)
+
+# Bulk catalog import: rows per transaction and how many row errors to report
+BULK_IMPORT_CHUNK_SIZE = env_int("LIBRARY_BULK_IMPORT_CHUNK_SIZE", 1000)
+BULK_IMPORT_MAX_ERRORS = env_int("LIBRARY_BULK_IMPORT_MAX_ERRORS", 1000)
+
+# SQLite connection tuning applied to every pooled connection. WAL lets readers
+# proceed while a checkout holds the write lock; busy_timeout makes writers
+# queue for the lock instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.getenv("LIBRARY_SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("LIBRARY_SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = env_int("LIBRARY_SQLITE_BUSY_TIMEOUT_MS", 5000)
+DB_POOL_SIZE = env_int("LIBRARY_DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("LIBRARY_DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = env_float("LIBRARY_DB_POOL_TIMEOUT", 30.0)
+
+# GET routes read through a second pool so long scans don't queue behind
+# checkouts. Without a replica URL, SQLite readers open the primary file
+# read-only (mode=ro) and see every committed WAL frame. For READ_YOUR_WRITES
+# seconds after a member writes, their reads stay on the primary so a lagging
+# replica can't hide their own change.
+READ_DATABASE_ENABLED = env_bool("LIBRARY_READ_DATABASE_ENABLED", True)
+READ_DATABASE_URL = os.getenv("LIBRARY_READ_DATABASE_URL")
+ASYNC_READ_DATABASE_URL = os.getenv("LIBRARY_ASYNC_READ_DATABASE_URL")
+READ_POOL_SIZE = env_int("LIBRARY_READ_POOL_SIZE", DB_POOL_SIZE)
+READ_MAX_OVERFLOW = env_int("LIBRARY_READ_MAX_OVERFLOW", DB_MAX_OVERFLOW)
+READ_YOUR_WRITES_SECONDS = env_float("LIBRARY_READ_YOUR_WRITES_SECONDS", 5.0)
+READ_YOUR_WRITES_TRACKED = env_int("LIBRARY_READ_YOUR_WRITES_TRACKED", 10000)
+
+# Reservation holds: an AVAILABLE hold not collected within the window expires
+# and the next WAITING member is promoted by the background scheduler.
+HOLD_EXPIRY_ENABLED = env_bool("LIBRARY_HOLD_EXPIRY_ENABLED", True)
+HOLD_EXPIRY_HOURS = env_float("LIBRARY_HOLD_EXPIRY_HOURS", 72.0)
+HOLD_EXPIRY_INTERVAL_SECONDS = env_float("LIBRARY_HOLD_EXPIRY_INTERVAL_SECONDS", 60.0)
+HOLD_EXPIRY_BATCH_SIZE = env_int("LIBRARY_HOLD_EXPIRY_BATCH_SIZE", 500)
+
+# Loan archival: returned loans older than ARCHIVE_AFTER_DAYS move from loans to
+# loan_history, BATCH_SIZE rows per transaction, so the hot table stays near the
+# number of loans actually out.
+LOAN_ARCHIVE_ENABLED = env_bool("LIBRARY_LOAN_ARCHIVE_ENABLED", True)
+LOAN_ARCHIVE_AFTER_DAYS = env_float("LIBRARY_LOAN_ARCHIVE_AFTER_DAYS", 90.0)
+LOAN_ARCHIVE_INTERVAL_SECONDS = env_float("LIBRARY_LOAN_ARCHIVE_INTERVAL_SECONDS", 3600.0)
+LOAN_ARCHIVE_BATCH_SIZE = env_int("LIBRARY_LOAN_ARCHIVE_BATCH_SIZE", 1000)
+
+# Circulation analytics: rollups are kept current by triggers; a rebuild
+# (rebuild_analytics.py) recomputes them from raw history BATCH_SIZE ids of a
+# table per statement. Dashboard ranges default to the last DEFAULT_DAYS days.
+ANALYTICS_REBUILD_BATCH_SIZE = env_int("LIBRARY_ANALYTICS_REBUILD_BATCH_SIZE", 50000)
+ANALYTICS_DEFAULT_DAYS = env_int("LIBRARY_ANALYTICS_DEFAULT_DAYS", 30)
+
+# Notification outbox: rows written in the transaction that sets a hold aside
+# or expires it, delivered afterwards by a dispatcher on each worker. A batch is
+# leased for LEASE_SECONDS so workers don't send the same rows at once; a
+# failed send is retried after BACKOFF_SECONDS doubling per attempt (capped,
+# with jitter) and given up after MAX_ATTEMPTS. Sent rows are kept for
+# RETENTION_DAYS. TRANSPORT is "file" (JSON lines at NOTIFICATION_FILE) or
+# "smtp" (e.g. a local debugging server such as MailHog on port 1025).
+# The file defaults to sitting next to the database.
+OUTBOX_DISPATCH_ENABLED = env_bool("LIBRARY_OUTBOX_DISPATCH_ENABLED", True)
+OUTBOX_DISPATCH_INTERVAL_SECONDS = env_float("LIBRARY_OUTBOX_DISPATCH_INTERVAL_SECONDS", 1.0)
+OUTBOX_BATCH_SIZE = env_int("LIBRARY_OUTBOX_BATCH_SIZE", 100)
+OUTBOX_LEASE_SECONDS = env_float("LIBRARY_OUTBOX_LEASE_SECONDS", 60.0)
+OUTBOX_MAX_ATTEMPTS = env_int("LIBRARY_OUTBOX_MAX_ATTEMPTS", 8)
+OUTBOX_BACKOFF_SECONDS = env_float("LIBRARY_OUTBOX_BACKOFF_SECONDS", 5.0)
+OUTBOX_BACKOFF_MAX_SECONDS = env_float("LIBRARY_OUTBOX_BACKOFF_MAX_SECONDS", 3600.0)
+OUTBOX_RETENTION_DAYS = env_float("LIBRARY_OUTBOX_RETENTION_DAYS", 7.0)
+NOTIFICATION_TRANSPORT = os.getenv("LIBRARY_NOTIFICATION_TRANSPORT", "file").lower()
+NOTIFICATION_FILE = os.getenv(
+    "LIBRARY_NOTIFICATION_FILE", os.path.join(os.path.dirname(DATABASE_PATH), "notifications.jsonl")
+)
+NOTIFICATION_SENDER = os.getenv("LIBRARY_NOTIFICATION_SENDER", "library@localhost")
+SMTP_HOST = os.getenv("LIBRARY_SMTP_HOST", "localhost")
+SMTP_PORT = env_int("LIBRARY_SMTP_PORT", 1025)
+SMTP_TIMEOUT_SECONDS = env_float("LIBRARY_SMTP_TIMEOUT_SECONDS", 10.0)
+
+# Reservation event streams (GET /reservations/events). Each stream buffers at
+# most QUEUE_SIZE undelivered events before it is dropped and has to resume
+# from the last REPLAY_SIZE events. The relay polls once per interval per
+# worker, while streams are open, for hold changes made by other workers.
+EVENT_STREAM_HEARTBEAT_SECONDS = env_float("LIBRARY_EVENT_STREAM_HEARTBEAT_SECONDS", 15.0)
+EVENT_STREAM_RETRY_MS = env_int("LIBRARY_EVENT_STREAM_RETRY_MS", 3000)
+EVENT_STREAM_QUEUE_SIZE = env_int("LIBRARY_EVENT_STREAM_QUEUE_SIZE", 100)
+EVENT_STREAM_REPLAY_SIZE = env_int("LIBRARY_EVENT_STREAM_REPLAY_SIZE", 10000)
+EVENT_STREAM_DEDUPE_SIZE = env_int("LIBRARY_EVENT_STREAM_DEDUPE_SIZE", 10000)
+EVENT_STREAM_RELAY_INTERVAL_SECONDS = env_float("LIBRARY_EVENT_STREAM_RELAY_INTERVAL_SECONDS", 2.0)
+EVENT_STREAM_RELAY_LOOKBACK_SECONDS = env_float("LIBRARY_EVENT_STREAM_RELAY_LOOKBACK_SECONDS", 30.0)
+
+# Password hashing runs off the event loop. "thread" uses a thread pool (bcrypt
+# releases the GIL), "process" a process pool, "inline" hashes on the loop and
+# only exists for benchmarking against the old behaviour.
+PASSWORD_HASH_EXECUTOR = os.getenv("LIBRARY_PASSWORD_HASH_EXECUTOR", "thread").lower()
+PASSWORD_HASH_WORKERS = env_int("LIBRARY_PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))
+BCRYPT_ROUNDS = env_int("LIBRARY_BCRYPT_ROUNDS", 12)
+
+# Token-bucket rate limits, checked before a route opens a session or hashes a
+# password. Each is "<count>/<seconds>": bursts of up to count requests,
+# refilled at count per seconds. Login and signup are limited per client IP
+# and per target email, authenticated writes per member and per IP. Buckets
+# live in process memory, at most MAX_KEYS of them. Behind a reverse proxy,
+# TRUST_FORWARDED keys clients on the first X-Forwarded-For address.
+RATE_LIMIT_ENABLED = env_bool("LIBRARY_RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_MAX_KEYS = env_int("LIBRARY_RATE_LIMIT_MAX_KEYS", 100000)
+RATE_LIMIT_TRUST_FORWARDED = env_bool("LIBRARY_RATE_LIMIT_TRUST_FORWARDED", False)
+RATE_LIMIT_LOGIN_PER_IP = env_rate("LIBRARY_RATE_LIMIT_LOGIN_PER_IP", "20/60")
+RATE_LIMIT_LOGIN_PER_EMAIL = env_rate("LIBRARY_RATE_LIMIT_LOGIN_PER_EMAIL", "5/60")
+RATE_LIMIT_SIGNUP_PER_IP = env_rate("LIBRARY_RATE_LIMIT_SIGNUP_PER_IP", "5/60")
+RATE_LIMIT_SIGNUP_PER_EMAIL = env_rate("LIBRARY_RATE_LIMIT_SIGNUP_PER_EMAIL", "3/3600")
+RATE_LIMIT_REFRESH_PER_IP = env_rate("LIBRARY_RATE_LIMIT_REFRESH_PER_IP", "60/60")
+RATE_LIMIT_WRITE_PER_MEMBER = env_rate("LIBRARY_RATE_LIMIT_WRITE_PER_MEMBER", "120/60")
+RATE_LIMIT_WRITE_PER_IP = env_rate("LIBRARY_RATE_LIMIT_WRITE_PER_IP", "600/60")
+
+# Refresh tokens let clients renew access tokens without re-sending credentials
+ACCESS_TOKEN_EXPIRE_MINUTES = env_int("LIBRARY_ACCESS_TOKEN_EXPIRE_MINUTES", 30)
+REFRESH_TOKEN_EXPIRE_DAYS = env_int("LIBRARY_REFRESH_TOKEN_EXPIRE_DAYS", 30)
+REFRESH_DENYLIST_SIZE = env_int("LIBRARY_REFRESH_DENYLIST_SIZE", 10000)
+
+# Observability: SQL echo is for local debugging only; statements slower than
+# the threshold are logged with the route that issued them.
+SQL_ECHO = env_bool("LIBRARY_SQL_ECHO", False)
+SLOW_QUERY_MS = env_float("LIBRARY_SLOW_QUERY_MS", 200.0)
+METRICS_ENABLED = env_bool("LIBRARY_METRICS_ENABLED", True)
+# Test runs only: a request issuing more SQL statements than this fails with a
+# 500 at the offending statement, so an N+1 surfaces as an error. 0 disables.
+QUERY_BUDGET = env_int("LIBRARY_QUERY_BUDGET", 0)
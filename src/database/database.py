@@ -1,22 +1,275 @@
-from sqlalchemy import create_engine
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import CursorResult, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.ext.declarative import declarative_base
-import os
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+
+
+def _async_url(url):
+    url = make_url(url)
+    return url.set(drivername="sqlite+aiosqlite") if url.get_backend_name() == "sqlite" else url
+
+
+def _read_only_url(url):
+    # sqlite3 URI filename: same file, opened read-only on a separate connection
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        return url
+    return url.set(database=f"file:{url.database}", query={**url.query, "mode": "ro", "uri": "true"})
+
 
-# Get the absolute path to the database file
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'library.db')}"
+DATABASE_URL = make_url(settings.DATABASE_URL)
+ASYNC_DATABASE_URL = make_url(settings.ASYNC_DATABASE_URL or _async_url(DATABASE_URL))
+READ_DATABASE_URL = make_url(settings.READ_DATABASE_URL or _read_only_url(DATABASE_URL))
+ASYNC_READ_DATABASE_URL = make_url(settings.ASYNC_READ_DATABASE_URL or _async_url(READ_DATABASE_URL))
 
-# Create engine with echo=True to see SQL queries
-engine = create_engine(DATABASE_URL, echo=True)
+POOL_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+)
+
+engine = create_engine(
+    DATABASE_URL, echo=settings.SQL_ECHO, poolclass=QueuePool, **POOL_OPTIONS
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, echo=settings.SQL_ECHO, poolclass=AsyncAdaptedQueuePool, **POOL_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+)
+
+if settings.READ_DATABASE_ENABLED:
+    READ_POOL_OPTIONS = dict(
+        pool_size=settings.READ_POOL_SIZE,
+        max_overflow=settings.READ_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    read_engine = create_engine(
+        READ_DATABASE_URL, echo=settings.SQL_ECHO, poolclass=QueuePool, **READ_POOL_OPTIONS
+    )
+    async_read_engine = create_async_engine(
+        ASYNC_READ_DATABASE_URL, echo=settings.SQL_ECHO, poolclass=AsyncAdaptedQueuePool, **READ_POOL_OPTIONS
+    )
+else:
+    # Reads share the primary pool; get_read_db hands out the request's own session
+    read_engine, async_read_engine = engine, async_engine
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+)
+
 Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def _configure_sqlite_reader(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    # Refuse writes even when the read URL points at a writable replica file
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+event.listen(engine, "connect", _configure_sqlite)
+event.listen(async_engine.sync_engine, "connect", _configure_sqlite)
+if read_engine is not engine:
+    for _reader in (read_engine, async_read_engine.sync_engine):
+        if _reader.dialect.name == "sqlite":
+            event.listen(_reader, "connect", _configure_sqlite_reader)
+
+
+class ThreadedSession:
+    """Awaitable facade over a sync ``Session``.
+
+    Mirrors the subset of the ``AsyncSession`` API the routers use, running each
+    blocking call in the threadpool so the event loop is never held by sqlite3.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def expunge(self, instance):
+        self.sync_session.expunge(instance)
+
+    async def execute(self, statement, *args, **kwargs):
+        def _execute():
+            result = self.sync_session.execute(statement, *args, **kwargs)
+            if isinstance(result, CursorResult) and not result.returns_rows:
+                # Read rowcount (memoized) and release the cursor here: a sqlite3 cursor
+                # finalized on the event loop thread races whoever holds the connection next
+                result.rowcount
+                result.close()
+                return result
+            # Buffer rows on the worker thread so iterating never touches the cursor.
+            return result.freeze()()
+
+        return await run_in_threadpool(_execute)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        result = await self.execute(statement, *args, **kwargs)
+        return result.scalars()
+
+    async def stream(self, statement, *args, **kwargs):
+        result = await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+        return ThreadedStreamResult(result)
+
+    async def stream_scalars(self, statement, *args, **kwargs):
+        result = await run_in_threadpool(self.sync_session.scalars, statement, *args, **kwargs)
+        return ThreadedStreamResult(result)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+class ThreadedStreamResult:
+    """Server-side cursor over a sync result, fetched chunk by chunk in the threadpool."""
+
+    def __init__(self, result):
+        self._result = result
+
+    def keys(self):
+        return self._result.keys()
+
+    async def partitions(self, size):
+        try:
+            while True:
+                rows = await run_in_threadpool(self._result.fetchmany, size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await run_in_threadpool(self._result.close)
+
+
+ThreadedSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
+ThreadedReadSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=read_engine
+)
+
+
+# A threaded session blocks its worker thread while waiting for a pooled
+# connection. Capping open sessions at the pool's capacity keeps every worker
+# free to finish the sessions that already hold connections.
+_threaded_session_slots = asyncio.Semaphore(settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+_threaded_read_slots = asyncio.Semaphore(settings.READ_POOL_SIZE + settings.READ_MAX_OVERFLOW)
+
+
+@asynccontextmanager
+async def session_scope(read_only: bool = False):
+    """Open a session on the primary, or on the read pool when ``read_only`` and one is configured."""
+    read_only = read_only and read_engine is not engine
+    if settings.DB_MODE == "sync":
+        slots = _threaded_read_slots if read_only else _threaded_session_slots
+        factory = ThreadedReadSessionLocal if read_only else ThreadedSessionLocal
+        async with slots:
+            db = ThreadedSession(factory())
+            try:
+                yield db
+            finally:
+                await db.close()
+        return
+    db = AsyncReadSessionLocal() if read_only else AsyncSessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
+
+
+async def dispose_engines():
+    # Pooled aiosqlite connections run on non-daemon threads; close them so processes can exit
+    for async_pool in {async_engine, async_read_engine}:
+        await async_pool.dispose()
+    for sync_pool in {engine, read_engine}:
+        sync_pool.dispose()
+
+
+class RecentWriters:
+    """Members who wrote within the last ``window`` seconds, bounded to ``maxsize`` entries.
+
+    Tracked per process: it only needs to cover the gap until a write reaches
+    the read pool, and with the default read-only SQLite pool there is none.
+    """
+
+    def __init__(self, window: float, maxsize: int):
+        self.window = window
+        self.maxsize = maxsize
+        self._deadlines = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, member_id: int):
+        with self._lock:
+            self._deadlines[member_id] = time.monotonic() + self.window
+            self._deadlines.move_to_end(member_id)
+            while len(self._deadlines) > self.maxsize:
+                self._deadlines.popitem(last=False)
+
+    def wrote_recently(self, member_id: int) -> bool:
+        with self._lock:
+            deadline = self._deadlines.get(member_id)
+            if deadline is None:
+                return False
+            if deadline <= time.monotonic():
+                del self._deadlines[member_id]
+                return False
+            return True
+
+
+recent_writers = RecentWriters(settings.READ_YOUR_WRITES_SECONDS, settings.READ_YOUR_WRITES_TRACKED)
+
+
+# Dependency to get DB session
+async def get_db():
+    async with session_scope() as db:
+        yield db
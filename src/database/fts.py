@@ -0,0 +1,100 @@
+import logging
+import re
+
+from sqlalchemy import column, table, text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# External-content FTS5 index over books(title, author). Prefix indexes on 2 and
+# 3 characters keep "dun*"-style type-ahead queries off the full term list.
+books_fts = table("books_fts", column("rowid"), column("rank"))
+
+_CREATE_TABLE = """
+CREATE VIRTUAL TABLE books_fts USING fts5(
+    title, author,
+    content='books', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+)
+"""
+
+# The update trigger only fires for indexed columns so checkouts and returns,
+# which touch available_quantity, never rewrite the index.
+_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author)
+        VALUES ('delete', old.id, old.title, old.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author)
+        VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Set by detect_fts() at startup; search falls back to ILIKE when the sqlite build lacks FTS5.
+fts_enabled = False
+
+
+def install_fts(conn):
+    """Create the FTS5 table and sync triggers if missing, backfilling a new index.
+
+    Runs as a migration step. A sqlite build without FTS5 only logs a warning:
+    the step still counts as applied and search keeps using LIKE.
+    """
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'")
+    ).first()
+    savepoint = conn.begin_nested()
+    try:
+        if not exists:
+            conn.execute(text(_CREATE_TABLE))
+            conn.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+        for trigger in _TRIGGERS:
+            conn.execute(text(trigger))
+    except OperationalError as exc:
+        savepoint.rollback()
+        logger.warning("FTS5 unavailable, book search falls back to LIKE: %s", exc)
+        return False
+    savepoint.commit()
+    return True
+
+
+def detect_fts(engine):
+    """Point search at the FTS5 index when the migrations managed to create it."""
+    global fts_enabled
+    with engine.connect() as conn:
+        fts_enabled = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'")
+        ).first() is not None
+    return fts_enabled
+
+
+def drop_fts(engine):
+    with engine.begin() as conn:
+        for name in ("books_fts_ai", "books_fts_ad", "books_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text("DROP TABLE IF EXISTS books_fts"))
+
+
+def match_expression(query: str):
+    """Turn free text into an FTS5 query where every token must match as a prefix.
+
+    Tokens are quoted so user input can never inject FTS5 operators.
+    """
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
@@ -0,0 +1,240 @@
+import logging
+from collections import defaultdict
+
+from sqlalchemy import select, update
+
+from config import settings
+from database.fts import install_fts
+from database.rollups import install_rollup_triggers, rebuild_rollups
+from database.versions import install_versioning
+from models.models import (
+    Book, BookDailyStats, HoldWaitStats, LoanHistory, MemberDailyStats, NotificationOutbox, RefreshToken,
+    Reservation, ReservationStatus, ResourceVersion, SchemaMigration,
+)
+
+logger = logging.getLogger(__name__)
+
+# Numbered, append-only schema steps. Each runs once per database, recorded in
+# schema_migrations. Steps only add things, or fix up existing rows once, and
+# are written to be safe on a database that already has them (older
+# deployments created every table from the models at startup), so a step never
+# depends on whether its tables came from an earlier step or an older deployment.
+MIGRATIONS = []
+
+
+def migration(version: int, name: str):
+    def register(step):
+        MIGRATIONS.append((version, name, step))
+        return step
+    return register
+
+
+def _execute(conn, *statements):
+    for statement in statements:
+        conn.exec_driver_sql(statement)
+
+
+# The schema the application shipped with, frozen: later model changes belong
+# in new steps, never here.
+_BASELINE = (
+    """
+    CREATE TABLE IF NOT EXISTS books (
+        id INTEGER NOT NULL,
+        title VARCHAR,
+        author VARCHAR,
+        quantity INTEGER,
+        available_quantity INTEGER,
+        PRIMARY KEY (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_books_id ON books (id)",
+    "CREATE INDEX IF NOT EXISTS ix_books_title ON books (title)",
+    "CREATE INDEX IF NOT EXISTS ix_books_author ON books (author)",
+    """
+    CREATE TABLE IF NOT EXISTS members (
+        id INTEGER NOT NULL,
+        name VARCHAR,
+        email VARCHAR,
+        phone VARCHAR(15),
+        hashed_password VARCHAR,
+        is_admin BOOLEAN,
+        PRIMARY KEY (id)
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_members_email ON members (email)",
+    "CREATE INDEX IF NOT EXISTS ix_members_name ON members (name)",
+    "CREATE INDEX IF NOT EXISTS ix_members_id ON members (id)",
+    """
+    CREATE TABLE IF NOT EXISTS loans (
+        id INTEGER NOT NULL,
+        book_id INTEGER,
+        member_id INTEGER,
+        loan_date DATETIME,
+        return_date DATETIME NOT NULL,
+        is_returned BOOLEAN,
+        created_by INTEGER,
+        PRIMARY KEY (id),
+        FOREIGN KEY(book_id) REFERENCES books (id),
+        FOREIGN KEY(member_id) REFERENCES members (id),
+        FOREIGN KEY(created_by) REFERENCES members (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_loans_id ON loans (id)",
+    """
+    CREATE TABLE IF NOT EXISTS reservations (
+        id INTEGER NOT NULL,
+        book_id INTEGER,
+        member_id INTEGER,
+        reservation_date DATETIME,
+        is_active BOOLEAN,
+        status VARCHAR(9),
+        notification_date DATETIME,
+        created_by INTEGER,
+        PRIMARY KEY (id),
+        FOREIGN KEY(book_id) REFERENCES books (id),
+        FOREIGN KEY(member_id) REFERENCES members (id),
+        FOREIGN KEY(created_by) REFERENCES members (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_reservations_id ON reservations (id)",
+)
+
+
+@migration(1, "baseline schema")
+def _baseline(conn):
+    _execute(conn, *_BASELINE)
+
+
+@migration(2, "reservation queue indexes")
+def _reservation_queue_indexes(conn):
+    _execute(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_reservations_queue "
+        "ON reservations (book_id, status, is_active, reservation_date, id)",
+        "CREATE INDEX IF NOT EXISTS ix_reservations_hold_expiry "
+        "ON reservations (status, notification_date)",
+    )
+
+
+@migration(3, "loan and reservation lookup indexes")
+def _lookup_indexes(conn):
+    _execute(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_loans_member_open ON loans (member_id, is_returned)",
+        "CREATE INDEX IF NOT EXISTS ix_loans_open ON loans (is_returned)",
+        "CREATE INDEX IF NOT EXISTS ix_loans_book_open ON loans (book_id, is_returned, return_date)",
+        "CREATE INDEX IF NOT EXISTS ix_reservations_member_active "
+        "ON reservations (member_id, is_active, book_id)",
+        "CREATE INDEX IF NOT EXISTS ix_reservations_active ON reservations (is_active)",
+        "ANALYZE",
+    )
+
+
+@migration(4, "loan history archive table")
+def _loan_history(conn):
+    LoanHistory.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(5, "circulation rollups")
+def _circulation_rollups(conn):
+    for model in (BookDailyStats, MemberDailyStats, HoldWaitStats):
+        model.__table__.create(bind=conn, checkfirst=True)
+    # Triggers and backfill commit together, so no write is missed or counted twice
+    install_rollup_triggers(conn)
+    rebuild_rollups(conn, settings.ANALYTICS_REBUILD_BATCH_SIZE)
+
+
+@migration(6, "notification outbox")
+def _notification_outbox(conn):
+    NotificationOutbox.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(7, "refresh tokens table")
+def _refresh_tokens(conn):
+    RefreshToken.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(8, "resource version counters")
+def _resource_versions(conn):
+    ResourceVersion.__table__.create(bind=conn, checkfirst=True)
+    install_versioning(conn)
+
+
+@migration(9, "book search index")
+def _book_search_index(conn):
+    install_fts(conn)
+
+
+@migration(10, "set aside copies for open holds")
+def _hold_copies(conn):
+    # Holds used to leave their copy in available_quantity. Take one off the
+    # shelf per open hold, oldest first; a hold whose copy was already lent to
+    # someone else goes back to the head of the queue to wait for the next one.
+    holds = defaultdict(list)
+    for reservation_id, book_id in conn.execute(
+        select(Reservation.id, Reservation.book_id)
+        .where(Reservation.status == ReservationStatus.AVAILABLE, Reservation.is_active == True)
+        .order_by(Reservation.notification_date, Reservation.id)
+    ):
+        holds[book_id].append(reservation_id)
+    if not holds:
+        return
+    available = dict(conn.execute(select(Book.id, Book.available_quantity).where(Book.id.in_(list(holds)))).all())
+    uncovered = []
+    for book_id, reservation_ids in holds.items():
+        covered = min(len(reservation_ids), max(available.get(book_id) or 0, 0))
+        uncovered.extend(reservation_ids[covered:])
+        if covered:
+            conn.execute(
+                update(Book).where(Book.id == book_id)
+                .values(available_quantity=Book.available_quantity - covered)
+            )
+    if uncovered:
+        conn.execute(
+            update(Reservation).where(Reservation.id.in_(uncovered))
+            .values(status=ReservationStatus.WAITING, notification_date=None)
+        )
+
+
+@migration(11, "outbox creation time index")
+def _outbox_created_index(conn):
+    _execute(conn, "CREATE INDEX IF NOT EXISTS ix_outbox_created ON notification_outbox (created_at)")
+
+
+def applied_versions(conn):
+    SchemaMigration.__table__.create(bind=conn, checkfirst=True)
+    return set(conn.scalars(select(SchemaMigration.version)))
+
+
+def migrate(engine):
+    """Apply every pending step in order; returns the versions applied.
+
+    The run holds SQLite's write lock from the first read of schema_migrations
+    to the commit, so workers starting together apply each step exactly once
+    and a failed step leaves no partial schema behind (SQLite DDL is transactional).
+    """
+    applied = []
+    with engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            done = applied_versions(conn)
+            for version, name, step in sorted(MIGRATIONS, key=lambda entry: entry[0]):
+                if version in done:
+                    continue
+                logger.info("Applying migration %d: %s", version, name)
+                step(conn)
+                conn.execute(SchemaMigration.__table__.insert().values(version=version, name=name))
+                applied.append(version)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return applied
+
+
+def status(engine):
+    """``[(version, name, applied)]`` for every known step."""
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+        conn.commit()
+    return [(version, name, version in done) for version, name, _ in sorted(MIGRATIONS, key=lambda entry: entry[0])]
@@ -0,0 +1,141 @@
+from sqlalchemy import text
+
+# Circulation rollups: daily loan and return counters per book and per member,
+# and a daily histogram of how long reservations waited for a copy. Triggers
+# add each row's contribution in the transaction that writes it, however it
+# was issued, so the counters always equal an aggregate over loans,
+# loan_history and reservations; rebuild_rollups() recomputes them from those
+# tables. Archiving moves loans with INSERT on loan_history and DELETE on
+# loans, neither of which fires a trigger, so archived loans keep counting.
+
+# Upper bounds of the hold wait buckets; waits past the last land in one more
+# bucket. Existing rows keep their old bucket if these change: rebuild after.
+HOLD_WAIT_BUCKETS_HOURS = (1, 4, 12, 24, 48, 72, 168, 336)
+
+_WAIT_SECONDS = "(julianday({row}.notification_date) - julianday({row}.reservation_date)) * 86400.0"
+
+
+def _wait_bucket():
+    cases = " ".join(
+        f"WHEN {_WAIT_SECONDS} <= {hours * 3600} THEN {index}"
+        for index, hours in enumerate(HOLD_WAIT_BUCKETS_HOURS)
+    )
+    return f"CASE {cases} ELSE {len(HOLD_WAIT_BUCKETS_HOURS)} END"
+
+
+class _Rollup:
+    """One contribution of a source row to a rollup table.
+
+    ``keys`` and ``counters`` map columns to SQL expressions over ``{row}``:
+    NEW inside a trigger, the scanned table in a rebuild. Counters add up.
+    """
+
+    def __init__(self, table, keys, counters, where):
+        self.table = table
+        self.keys = keys
+        self.counters = counters
+        self.where = where
+
+    def _upsert(self, values, tail):
+        columns = ", ".join([*self.keys, *self.counters])
+        updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in self.counters)
+        return (
+            f"INSERT INTO {self.table} ({columns}) SELECT {values} {tail} "
+            f"ON CONFLICT ({', '.join(self.keys)}) DO UPDATE SET {updates}"
+        )
+
+    def for_trigger(self):
+        values = ", ".join([*self.keys.values(), *self.counters.values()])
+        return self._upsert(values.format(row="NEW"), "WHERE " + self.where.format(row="NEW")) + ";"
+
+    def for_rebuild(self, source):
+        keys = [expr.format(row=source) for expr in self.keys.values()]
+        sums = [f"sum({expr.format(row=source)})" for expr in self.counters.values()]
+        groups = ", ".join(str(position) for position in range(1, len(keys) + 1))
+        return self._upsert(
+            ", ".join(keys + sums),
+            f"FROM {source} WHERE {source}.id > :low AND {source}.id <= :high "
+            f"AND {self.where.format(row=source)} GROUP BY {groups}",
+        )
+
+
+_LOANED = (
+    _Rollup("book_daily_stats", {"day": "date({row}.loan_date)", "book_id": "{row}.book_id"},
+            {"loans": "1"}, "{row}.book_id IS NOT NULL"),
+    _Rollup("member_daily_stats", {"day": "date({row}.loan_date)", "member_id": "{row}.member_id"},
+            {"loans": "1"}, "{row}.member_id IS NOT NULL"),
+)
+_RETURNED = (
+    _Rollup("book_daily_stats", {"day": "date({row}.return_date)", "book_id": "{row}.book_id"},
+            {"returns": "1"}, "{row}.is_returned AND {row}.book_id IS NOT NULL"),
+    _Rollup("member_daily_stats", {"day": "date({row}.return_date)", "member_id": "{row}.member_id"},
+            {"returns": "1"}, "{row}.is_returned AND {row}.member_id IS NOT NULL"),
+)
+# notification_date is set once, when a WAITING reservation is given a copy
+_HELD = (
+    _Rollup("hold_wait_stats", {"day": "date({row}.notification_date)", "bucket": _wait_bucket()},
+            {"holds": "1", "wait_seconds": _WAIT_SECONDS}, "{row}.notification_date IS NOT NULL"),
+)
+
+ROLLUP_TABLES = ("book_daily_stats", "member_daily_stats", "hold_wait_stats")
+
+# (source table, rollups); loan_history rows were counted while still in loans
+_SOURCES = (
+    ("loans", _LOANED + _RETURNED),
+    ("loan_history", _LOANED + _RETURNED),
+    ("reservations", _HELD),
+)
+
+_TRIGGERS = (
+    ("loans_rollup_ai", "AFTER INSERT ON loans", _LOANED + _RETURNED),
+    # Books deleted later null loans.book_id without touching is_returned, so this stays quiet
+    ("loans_rollup_au", "AFTER UPDATE OF is_returned ON loans WHEN NEW.is_returned AND NOT OLD.is_returned",
+     _RETURNED),
+    ("reservations_rollup_ai", "AFTER INSERT ON reservations", _HELD),
+    ("reservations_rollup_au",
+     "AFTER UPDATE OF notification_date ON reservations WHEN OLD.notification_date IS NULL", _HELD),
+)
+
+
+def install_rollup_triggers(conn):
+    """(Re)create the triggers, e.g. after changing HOLD_WAIT_BUCKETS_HOURS."""
+    for name, when, rollups in _TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        body = "\n    ".join(rollup.for_trigger() for rollup in rollups)
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} {when} BEGIN\n    {body}\nEND")
+
+
+def rebuild_rollups(conn, batch_size: int):
+    """Recompute every rollup from raw history inside the caller's transaction.
+
+    Each statement aggregates one id range of a source table in SQL and folds
+    the groups into the rollup with an upsert, so memory and temp space stay
+    bounded by the batch whatever the table size. Returns rows per rollup table.
+    """
+    for table in ROLLUP_TABLES:
+        conn.exec_driver_sql(f"DELETE FROM {table}")
+    for source, rollups in _SOURCES:
+        statements = [text(rollup.for_rebuild(source)) for rollup in rollups]
+        last = conn.exec_driver_sql(f"SELECT coalesce(max(id), 0) FROM {source}").scalar()
+        for low in range(0, last, batch_size):
+            for statement in statements:
+                conn.execute(statement, {"low": low, "high": low + batch_size})
+    return {table: conn.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar() for table in ROLLUP_TABLES}
+
+
+def rebuild(engine, batch_size: int):
+    """:func:`rebuild_rollups` as one transaction under SQLite's write lock.
+
+    Writers wait for the rebuild rather than racing it: a return committed
+    between two batches would otherwise be counted by its trigger and again
+    by the batch that scans its loan.
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            counts = rebuild_rollups(conn, batch_size)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return counts
@@ -0,0 +1,42 @@
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth.auth_utils import oauth2_scheme, resolve_member
+from database.database import engine, read_engine, recent_writers, session_scope
+from models.models import Member
+
+
+async def _read_session():
+    async with session_scope(read_only=True) as db:
+        yield db
+
+
+async def get_read_user(
+    db: AsyncSession = Depends(_read_session),
+    token: str = Depends(oauth2_scheme)
+):
+    """``get_current_user`` for read-only routes, resolving the caller on the read session.
+
+    Read routes never write, so there is no recent-writer mark to set, and
+    the request never touches the primary pool just to authenticate.
+    """
+    return await resolve_member(db, token)
+
+
+async def get_read_db(
+    read_db: AsyncSession = Depends(_read_session),
+    current_user: Member = Depends(get_read_user)
+):
+    """Session for read-only routes, drawn from the read pool.
+
+    Without a separate read pool that session is already on the primary. A
+    caller who wrote recently (read-your-writes) gets a primary session
+    instead, opened only then.
+    """
+    if read_engine is engine or not recent_writers.wrote_recently(current_user.id):
+        yield read_db
+        return
+    # Give the read connection back rather than hold both for the whole request
+    await read_db.close()
+    async with session_scope() as db:
+        yield db
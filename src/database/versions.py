@@ -0,0 +1,36 @@
+from sqlalchemy import select, text
+
+from models.models import ResourceVersion
+
+# Every write to these tables bumps its counter from a trigger, so the bump
+# commits atomically with the change however it was issued (ORM flush, Core
+# executemany, bulk import, the hold expiry sweep) and is shared by all workers.
+VERSIONED_TABLES = ("books", "members", "loans", "loan_history", "reservations")
+
+_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table} BEGIN
+    UPDATE resource_versions SET version = version + 1 WHERE name = '{table}';
+END
+"""
+
+_EVENTS = (("INSERT", "ai"), ("UPDATE", "au"), ("DELETE", "ad"))
+
+
+def install_versioning(conn):
+    """Seed a counter row per versioned table and create the bump triggers if missing."""
+    for table in VERSIONED_TABLES:
+        conn.execute(
+            text("INSERT OR IGNORE INTO resource_versions (name, version) VALUES (:name, 0)"),
+            {"name": table},
+        )
+        for event, suffix in _EVENTS:
+            conn.execute(text(_TRIGGER.format(table=table, event=event, suffix=suffix)))
+
+
+async def current_versions(db, tables):
+    """``{table: version}`` for ``tables``, read in one primary-key lookup."""
+    rows = await db.execute(
+        select(ResourceVersion.name, ResourceVersion.version)
+        .where(ResourceVersion.name.in_(tables))
+    )
+    return dict(rows.all())
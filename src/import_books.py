@@ -0,0 +1,33 @@
+import argparse
+import asyncio
+import json
+
+from database.database import dispose_engines, session_scope
+from services.catalog_import import import_books
+
+
+async def _read_lines(path):
+    with open(path, encoding="utf-8", newline="") as handle:
+        for line in handle:
+            yield line.rstrip("\r\n")
+
+
+async def run_import(path, fmt, chunk_size):
+    try:
+        async with session_scope() as db:
+            return await import_books(db, _read_lines(path), fmt, chunk_size)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load books from a CSV or NDJSON file")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    print(f"Importing {args.path} as {fmt}...")
+    report = asyncio.run(run_import(args.path, fmt, args.chunk_size))
+    print(json.dumps(report, indent=2))
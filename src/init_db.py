@@ -1,19 +1,19 @@
 from database.database import engine, SessionLocal, Base
+from database.fts import drop_fts
+from database.migrations import migrate
 from models.models import Member, Book, Loan, Reservation
-import bcrypt
+from auth.passwords import pwd_context
 
 def init_db():
+    drop_fts(engine)
     Base.metadata.drop_all(bind=engine)
     print("Creating database tables...")
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    migrate(engine)
     
     db = SessionLocal()
     try:
-        # Create admin user with bcrypt directly
-        password = "admin123".encode('utf-8')
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(password, salt).decode('utf-8')
+        # Create admin user; a one-off CLI can hash on the calling thread
+        hashed_password = pwd_context.hash("admin123")
         
         admin = Member(
             name="Admin User",
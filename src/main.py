@@ -1,43 +1,117 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Form, HTTPException, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from auth.auth_utils import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from datetime import timedelta
-from sqlalchemy.orm import Session
-from database.database import get_db, engine
-from models import models
-from routes import books, members, loans, reservations
-from models.models import Member, pwd_context
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import get_db, engine, dispose_engines
+from database.fts import detect_fts
+from database.migrations import migrate
+from config import settings
+from services.loan_archive import loan_archiver
+from services.outbox import outbox_dispatcher
+from services.reservation_events import hold_relay, reservation_events
+from services.reservation_queue import hold_expiry_scheduler
+from routes import analytics, books, members, loans, reservations
+from routes.compression import CompressionMiddleware
+from routes.schemas import Message
+from models.models import Member
+from auth.passwords import shutdown_executor, verify_password
+from auth.rate_limit import WRITE_METHODS, rate_limit
+from auth.refresh_tokens import issue_refresh_token, revoke_refresh_token, rotate_refresh_token
+from monitoring.instrumentation import MetricsMiddleware
+from monitoring.metrics import registry
 
-models.Base.metadata.create_all(bind=engine)
+migrate(engine)
+detect_fts(engine)
 
-app = FastAPI(title="Library Management System")
+app = FastAPI(title="Library Management System", default_response_class=ORJSONResponse)
+# Added first so it runs inside the metrics middleware, which then times compression too
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+# The middleware also tracks the per-request statement count the query budget checks
+if settings.METRICS_ENABLED or settings.QUERY_BUDGET:
+    app.add_middleware(MetricsMiddleware)
+
+# Every authenticated write is limited per member and per client IP
+write_limit = rate_limit(
+    "write", per_ip=settings.RATE_LIMIT_WRITE_PER_IP, per_member=settings.RATE_LIMIT_WRITE_PER_MEMBER,
+    methods=WRITE_METHODS,
+)
+app.include_router(books.router, prefix="/books", tags=["books"], dependencies=[write_limit])
+app.include_router(members.router, prefix="/members", tags=["members"], dependencies=[write_limit])
+app.include_router(loans.router, prefix="/loans", tags=["loans"], dependencies=[write_limit])
+app.include_router(reservations.router, prefix="/reservations", tags=["reservations"], dependencies=[write_limit])
+app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+
+@app.on_event("startup")
+async def startup():
+    if settings.HOLD_EXPIRY_ENABLED:
+        hold_expiry_scheduler.start()
+    if settings.LOAN_ARCHIVE_ENABLED:
+        loan_archiver.start()
+    if settings.OUTBOX_DISPATCH_ENABLED:
+        outbox_dispatcher.start()
+    hold_relay.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Open event streams would otherwise hold graceful shutdown until clients disconnect
+    reservation_events.close()
+    await hold_relay.stop()
+    await loan_archiver.stop()
+    await outbox_dispatcher.stop()
+    await hold_expiry_scheduler.stop()
+    shutdown_executor()
+    await dispose_engines()
 
-app.include_router(books.router, prefix="/books", tags=["books"])
-app.include_router(members.router, prefix="/members", tags=["members"])
-app.include_router(loans.router, prefix="/loans", tags=["loans"])
-app.include_router(reservations.router, prefix="/reservations", tags=["reservations"])
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str
+    expires_in: int
+    refresh_token: str
 
-@app.get("/")
+@app.get("/", response_model=Message)
 def read_root():
     return {"message": "Welcome to Library Management System"}
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def read_metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
-def authenticate_user(db: Session, email: str, password: str):
-    member = db.query(Member).filter(Member.email == email).first()
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    member = await db.scalar(select(Member).where(Member.email == email))
     if not member:
         return False
-    if not verify_password(password, member.hashed_password):
+    valid, new_hash = await verify_password(password, member.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        # Transparently move the stored hash to the current bcrypt cost
+        member.hashed_password = new_hash
+        await db.commit()
     return member
 
-@app.post("/token")
+# Token routes are checked per client IP, login also per account, ahead of the bcrypt verify
+refresh_limit = rate_limit("refresh", per_ip=settings.RATE_LIMIT_REFRESH_PER_IP)
+
+@app.post("/token", response_model=TokenResponse, dependencies=[rate_limit(
+    "login", per_ip=settings.RATE_LIMIT_LOGIN_PER_IP, per_email=settings.RATE_LIMIT_LOGIN_PER_EMAIL,
+    email_field="username",
+)])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    member = authenticate_user(db, form_data.username, form_data.password)
+    member = await authenticate_user(db, form_data.username, form_data.password)
     if not member:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,8 +119,47 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    refresh_token = issue_refresh_token(db, member.id)
+    await db.commit()
+    return _token_response(member.id, refresh_token)
+
+@app.post("/token/refresh", response_model=TokenResponse, dependencies=[refresh_limit])
+async def refresh_access_token(
+    refresh_token: str = Form(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Exchange a refresh token for a new access token and a rotated refresh token.
+
+    No password check happens here, so renewing a session costs one indexed
+    UPDATE instead of a bcrypt verify.
+    """
+    rotated = await rotate_refresh_token(db, refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    member_id, new_refresh_token = rotated
+    return _token_response(member_id, new_refresh_token)
+
+@app.post("/token/revoke", response_model=Message, dependencies=[refresh_limit])
+async def revoke_token(
+    refresh_token: str = Form(...),
+    db: AsyncSession = Depends(get_db)
+):
+    await revoke_refresh_token(db, refresh_token)
+    # Always 200 so the endpoint can't be used to probe for valid tokens
+    return {"message": "Refresh token revoked"}
+
+def _token_response(member_id: int, refresh_token: str):
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(member.id)}, expires_delta=access_token_expires
+        data={"sub": str(member_id)}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": int(access_token_expires.total_seconds()),
+        "refresh_token": refresh_token,
+    }
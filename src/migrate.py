@@ -0,0 +1,18 @@
+import argparse
+
+from database.database import engine
+from database.migrations import migrate, status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--status", action="store_true", help="List migrations without applying them")
+    args = parser.parse_args()
+
+    if args.status:
+        for version, name, applied in status(engine):
+            print(f"{version:4d}  {'applied' if applied else 'pending'}  {name}")
+    else:
+        applied = migrate(engine)
+        print(f"Applied {len(applied)} migration(s): {applied}" if applied else "Schema is up to date")
+    engine.dispose()
@@ -1,13 +1,13 @@
 import enum 
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Boolean, Enum, Float, Index, JSON
 from sqlalchemy.orm import relationship
-from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
-from passlib.context import CryptContext
 
+from database.database import Base
 
-Base = declarative_base()
+# Relationships are declared lazy="raise": touching one that wasn't loaded with
+# selectinload/joinedload is an error rather than a hidden per-row query.
 
 class Book(Base):
     __tablename__ = "books"
@@ -17,10 +17,8 @@ class Book(Base):
     author = Column(String, index=True)
     quantity = Column(Integer, default=1)
     available_quantity = Column(Integer, default=1)
-    loans = relationship("Loan", back_populates="book")
-    reservations = relationship("Reservation", back_populates="book")
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    loans = relationship("Loan", back_populates="book", lazy="raise")
+    reservations = relationship("Reservation", back_populates="book", lazy="raise")
 
 class Member(Base):
     __tablename__ = "members"
@@ -31,11 +29,18 @@ class Member(Base):
     phone = Column(String(15))
     hashed_password = Column(String)
     is_admin = Column(Boolean, default=False)
-    loans = relationship("Loan", back_populates="member", foreign_keys="[Loan.member_id]")
-    reservations = relationship("Reservation", back_populates="member", foreign_keys="[Reservation.member_id]")
+    loans = relationship("Loan", back_populates="member", foreign_keys="[Loan.member_id]", lazy="raise")
+    reservations = relationship("Reservation", back_populates="member", foreign_keys="[Reservation.member_id]", lazy="raise")
 
 class Loan(Base):
     __tablename__ = "loans"
+    __table_args__ = (
+        # Open/all loans per member, and the admin view of every open loan
+        Index("ix_loans_member_open", "member_id", "is_returned"),
+        Index("ix_loans_open", "is_returned"),
+        # Open loans per book ordered by due date: availability dates and delete checks
+        Index("ix_loans_book_open", "book_id", "is_returned", "return_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id"))
@@ -44,17 +49,42 @@ class Loan(Base):
     return_date = Column(DateTime, nullable=False)
     is_returned = Column(Boolean, default=False)
     created_by = Column(Integer, ForeignKey("members.id"))  # Track who created the loan
-    book = relationship("Book", back_populates="loans")
-    member = relationship("Member", back_populates="loans", foreign_keys=[member_id])
+    book = relationship("Book", back_populates="loans", lazy="raise")
+    member = relationship("Member", back_populates="loans", foreign_keys=[member_id], lazy="raise")
+
+class LoanHistory(Base):
+    """Returned loans moved out of ``loans`` by services/loan_archive.py, ids unchanged."""
+    __tablename__ = "loan_history"
+    __table_args__ = (
+        Index("ix_loan_history_member", "member_id"),
+        Index("ix_loan_history_book", "book_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id"))
+    member_id = Column(Integer, ForeignKey("members.id"))
+    loan_date = Column(DateTime)
+    return_date = Column(DateTime, nullable=False)
+    is_returned = Column(Boolean, default=True)
+    created_by = Column(Integer, ForeignKey("members.id"))
 
 class ReservationStatus(enum.Enum):
     WAITING = "WAITING"
     AVAILABLE = "AVAILABLE"
     COLLECTED = "COLLECTED"
     CANCELLED = "CANCELLED"
+    EXPIRED = "EXPIRED"
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        # Queue order per book: serves next-in-line, hold expiry and queue position lookups
+        Index("ix_reservations_queue", "book_id", "status", "is_active", "reservation_date", "id"),
+        Index("ix_reservations_hold_expiry", "status", "notification_date"),
+        # A member's reservations: listings, duplicate and hold checks
+        Index("ix_reservations_member_active", "member_id", "is_active", "book_id"),
+        Index("ix_reservations_active", "is_active"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id"))
@@ -64,5 +94,94 @@ class Reservation(Base):
     status = Column(Enum(ReservationStatus), default=ReservationStatus.WAITING)
     notification_date = Column(DateTime, nullable=True)
     created_by = Column(Integer, ForeignKey("members.id"))
-    book = relationship("Book", back_populates="reservations")
-    member = relationship("Member", back_populates="reservations", foreign_keys=[member_id])
\ No newline at end of file
+    book = relationship("Book", back_populates="reservations", lazy="raise")
+    member = relationship("Member", back_populates="reservations", foreign_keys=[member_id], lazy="raise")
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    member_id = Column(Integer, ForeignKey("members.id"), index=True)
+    # SHA-256 of the opaque token; the token itself is never stored
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    # All tokens rotated from one login share a family so reuse can revoke them together
+    family_id = Column(String(32), index=True, nullable=False)
+    issued_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+
+class ResourceVersion(Base):
+    __tablename__ = "resource_versions"
+
+    # Change counter per table, bumped by triggers (see database/versions.py) and used for ETags
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    # One row per applied step of database/migrations.py
+    version = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+class OutboxStatus(enum.Enum):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+class NotificationOutbox(Base):
+    """Member notifications, written in the transaction of the change they announce.
+
+    services/outbox.py delivers them after the commit, so requests never wait
+    on the notification channel.
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # Due messages for the dispatcher, and sent ones for the retention sweep
+        Index("ix_outbox_due", "status", "next_attempt_at"),
+        Index("ix_outbox_sent", "status", "sent_at"),
+        # Recent hold changes for the event stream relay in services/reservation_events.py
+        Index("ix_outbox_created", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # One row per event: a change replayed in another transaction can't queue it twice,
+    # and transports pass it on so a retried send is recognisable downstream
+    idempotency_key = Column(String, unique=True, nullable=False)
+    kind = Column(String, nullable=False)
+    member_id = Column(Integer, ForeignKey("members.id"), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+# Circulation rollups, kept in step with loans and reservations by triggers
+# (see database/rollups.py) and read by the /analytics routes.
+class BookDailyStats(Base):
+    __tablename__ = "book_daily_stats"
+
+    day = Column(Date, primary_key=True)
+    book_id = Column(Integer, primary_key=True)
+    loans = Column(Integer, nullable=False, server_default="0")
+    returns = Column(Integer, nullable=False, server_default="0")
+
+class MemberDailyStats(Base):
+    __tablename__ = "member_daily_stats"
+
+    day = Column(Date, primary_key=True)
+    member_id = Column(Integer, primary_key=True)
+    loans = Column(Integer, nullable=False, server_default="0")
+    returns = Column(Integer, nullable=False, server_default="0")
+
+class HoldWaitStats(Base):
+    __tablename__ = "hold_wait_stats"
+
+    # Holds set aside per day, by bucket of HOLD_WAIT_BUCKETS_HOURS in database/rollups.py
+    day = Column(Date, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    holds = Column(Integer, nullable=False, server_default="0")
+    wait_seconds = Column(Float, nullable=False, server_default="0")
@@ -0,0 +1,153 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from auth.principal_cache import principal_cache
+from auth.rate_limit import rate_limiter
+from config import settings
+from database.database import async_engine, async_read_engine, engine, read_engine
+from monitoring import metrics
+from services.reservation_events import reservation_events
+
+logger = logging.getLogger(__name__)
+
+_SLOW_QUERY_SECONDS = settings.SLOW_QUERY_MS / 1000
+_QUERY_BUDGET = settings.QUERY_BUDGET
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request issued more statements than ``LIBRARY_QUERY_BUDGET`` allows."""
+
+
+class RequestStats:
+    __slots__ = ("route", "queries", "db_seconds")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Set by the middleware; statements run outside a request (scheduler, CLI) see None.
+# Threadpool calls from ThreadedSession copy the context, so sync mode is counted too.
+current_request: ContextVar = ContextVar("current_request", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _QUERY_BUDGET:
+        stats = current_request.get()
+        if stats is not None and stats.queries >= _QUERY_BUDGET:
+            raise QueryBudgetExceeded(
+                f"{stats.route} exceeded {_QUERY_BUDGET} statements at: {' '.join(statement.split())}"
+            )
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    metrics.db_statements.inc()
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if elapsed >= _SLOW_QUERY_SECONDS:
+        metrics.db_slow_statements.inc()
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s",
+            elapsed * 1000, stats.route if stats else "<background>", " ".join(statement.split())
+        )
+
+
+def instrument_engine(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_label(scope):
+    # The matched route template keeps label cardinality bounded (/loans/{loan_id}/return)
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and per-request SQL cost.
+
+    Latency is measured to the first response byte so streamed bodies don't
+    skew it by however long the client takes to read them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["path"])
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        response = {"status": 500, "latency": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["latency"] = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            method = scope["method"]
+            route = _route_label(scope)
+            latency = response["latency"]
+            if latency is None:
+                latency = time.perf_counter() - start
+            metrics.http_requests.inc(method, route, str(response["status"]))
+            metrics.http_latency.observe(latency, method, route)
+            metrics.db_time.observe(stats.db_seconds, method, route)
+            metrics.db_queries.observe(stats.queries, method, route)
+
+
+def _engines():
+    engines = {"sync": engine, "async": async_engine.sync_engine}
+    if read_engine is not engine:
+        engines.update(sync_read=read_engine, async_read=async_read_engine.sync_engine)
+    return engines
+
+
+def _pool_stats():
+    values = {}
+    for name, sync_engine in _engines().items():
+        pool = sync_engine.pool
+        values[(name, "checked_out")] = pool.checkedout()
+        values[(name, "checked_in")] = pool.checkedin()
+        values[(name, "overflow")] = pool.overflow()
+        values[(name, "size")] = pool.size()
+    return values
+
+
+def _principal_cache_stats():
+    return {(key,): value for key, value in principal_cache.stats().items()}
+
+
+metrics.registry.register(metrics.Gauge(
+    "db_pool_connections", "Connection pool state per engine.", ("engine", "state"), _pool_stats
+))
+metrics.registry.register(metrics.Gauge(
+    "principal_cache", "Principal cache size and lookup counters.", ("stat",), _principal_cache_stats
+))
+metrics.registry.register(metrics.Gauge(
+    "rate_limit_buckets", "Token buckets held by the rate limiter in this process.", (),
+    lambda: {(): len(rate_limiter.backend)}
+))
+metrics.registry.register(metrics.Gauge(
+    "reservation_event_streams", "Open reservation event streams in this process.", (),
+    lambda: {(): reservation_events.subscriber_count()}
+))
+
+for _engine in _engines().values():
+    instrument_engine(_engine)
@@ -0,0 +1,22 @@
+import argparse
+
+from config import settings
+from database.database import engine
+from database.rollups import install_rollup_triggers, rebuild
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the circulation analytics rollups from raw history")
+    parser.add_argument("--batch-size", type=int, default=settings.ANALYTICS_REBUILD_BATCH_SIZE,
+                        help="source ids aggregated per statement")
+    parser.add_argument("--reinstall-triggers", action="store_true",
+                        help="recreate the rollup triggers first, e.g. after changing the hold wait buckets")
+    args = parser.parse_args()
+
+    if args.reinstall_triggers:
+        with engine.begin() as conn:
+            install_rollup_triggers(conn)
+    print("Rebuilding circulation rollups...")
+    for table, rows in rebuild(engine, args.batch_size).items():
+        print(f"{table}: {rows} row(s)")
+    engine.dispose()
@@ -0,0 +1,165 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.rollups import HOLD_WAIT_BUCKETS_HOURS
+from database.routing import get_read_db, get_read_user
+from models.models import Book, BookDailyStats, HoldWaitStats, Member, MemberDailyStats
+
+router = APIRouter()
+
+
+class DateRange:
+    """Inclusive ``start``/``end`` days (UTC), defaulting to the last ANALYTICS_DEFAULT_DAYS."""
+
+    def __init__(
+        self,
+        start: Optional[date] = Query(None, description="First day, inclusive"),
+        end: Optional[date] = Query(None, description="Last day, inclusive; defaults to today"),
+    ):
+        self.end = end or datetime.utcnow().date()
+        self.start = start or self.end - timedelta(days=settings.ANALYTICS_DEFAULT_DAYS - 1)
+        if self.start > self.end:
+            raise HTTPException(status_code=400, detail="start must not be after end")
+
+
+class TopBook(BaseModel):
+    book_id: int
+    title: Optional[str] = None
+    author: Optional[str] = None
+    loans: int
+    returns: int
+
+class TopMember(BaseModel):
+    member_id: int
+    name: Optional[str] = None
+    email: Optional[str] = None
+    loans: int
+    returns: int
+
+class DailyCirculation(BaseModel):
+    day: date
+    loans: int
+    returns: int
+
+class HoldWaitBucket(BaseModel):
+    le_hours: Optional[float] = None  # None for the overflow bucket
+    holds: int
+
+class HoldWaitSummary(BaseModel):
+    start: date
+    end: date
+    holds: int
+    average_wait_hours: Optional[float] = None
+    buckets: List[HoldWaitBucket]
+
+class Report(BaseModel):
+    start: date
+    end: date
+
+class TopBooksReport(Report):
+    items: List[TopBook]
+
+class TopMembersReport(Report):
+    items: List[TopMember]
+
+class DailyReport(Report):
+    items: List[DailyCirculation]
+
+
+async def admin_only(current_user: Member = Depends(get_read_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can view analytics")
+
+
+def _ranked(stats, key, period: DateRange, limit: int):
+    """Top ``limit`` keys of a daily rollup by loans over the period, read from its (day, key) primary key."""
+    loans = func.sum(stats.loans).label("loans")
+    return (
+        select(key.label("id"), loans, func.sum(stats.returns).label("returns"))
+        .where(stats.day.between(period.start, period.end))
+        .group_by(key)
+        .order_by(loans.desc(), key)
+        .limit(limit)
+        .subquery()
+    )
+
+
+@router.get("/books/top", response_model=TopBooksReport, dependencies=[Depends(admin_only)])
+async def top_books(
+    period: DateRange = Depends(),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Most borrowed titles over the period."""
+    ranked = _ranked(BookDailyStats, BookDailyStats.book_id, period, limit)
+    rows = await db.execute(
+        select(ranked.c.id.label("book_id"), Book.title, Book.author, ranked.c.loans, ranked.c.returns)
+        .outerjoin(Book, Book.id == ranked.c.id)
+        .order_by(ranked.c.loans.desc(), ranked.c.id)
+    )
+    return {"start": period.start, "end": period.end, "items": [row._asdict() for row in rows]}
+
+
+@router.get("/members/top", response_model=TopMembersReport, dependencies=[Depends(admin_only)])
+async def top_members(
+    period: DateRange = Depends(),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Members with the most loans over the period."""
+    ranked = _ranked(MemberDailyStats, MemberDailyStats.member_id, period, limit)
+    rows = await db.execute(
+        select(ranked.c.id.label("member_id"), Member.name, Member.email, ranked.c.loans, ranked.c.returns)
+        .outerjoin(Member, Member.id == ranked.c.id)
+        .order_by(ranked.c.loans.desc(), ranked.c.id)
+    )
+    return {"start": period.start, "end": period.end, "items": [row._asdict() for row in rows]}
+
+
+@router.get("/daily", response_model=DailyReport, dependencies=[Depends(admin_only)])
+async def daily_circulation(
+    period: DateRange = Depends(),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Loans and returns per day; days without either are left out."""
+    rows = await db.execute(
+        select(
+            MemberDailyStats.day,
+            func.sum(MemberDailyStats.loans).label("loans"),
+            func.sum(MemberDailyStats.returns).label("returns"),
+        )
+        .where(MemberDailyStats.day.between(period.start, period.end))
+        .group_by(MemberDailyStats.day)
+        .order_by(MemberDailyStats.day)
+    )
+    return {"start": period.start, "end": period.end, "items": [row._asdict() for row in rows]}
+
+
+@router.get("/holds/wait", response_model=HoldWaitSummary, dependencies=[Depends(admin_only)])
+async def hold_wait(
+    period: DateRange = Depends(),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """How long reservations set aside over the period had waited for a copy."""
+    rows = (await db.execute(
+        select(HoldWaitStats.bucket, func.sum(HoldWaitStats.holds), func.sum(HoldWaitStats.wait_seconds))
+        .where(HoldWaitStats.day.between(period.start, period.end))
+        .group_by(HoldWaitStats.bucket)
+    )).all()
+    counts = {bucket: holds for bucket, holds, _ in rows}
+    holds = sum(counts.values())
+    wait_seconds = sum(seconds for _, _, seconds in rows)
+    bounds = [*HOLD_WAIT_BUCKETS_HOURS, None]
+    return {
+        "start": period.start,
+        "end": period.end,
+        "holds": holds,
+        "average_wait_hours": wait_seconds / holds / 3600 if holds else None,
+        "buckets": [{"le_hours": bound, "holds": counts.get(index, 0)} for index, bound in enumerate(bounds)],
+    }
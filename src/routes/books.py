@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from database.database import get_db
-from models.models import Book, Member
+from database.routing import get_read_db, get_read_user
+from database import fts
+from models.models import Book, BookDailyStats, Loan, LoanHistory, Member, Reservation
 from pydantic import BaseModel
 from auth.auth_utils import get_current_user
-from sqlalchemy import func
+from routes.conditional import etag
+from routes.pagination import Page, PageParams, paginate, select_columns
+from routes.schemas import Message
+from services.catalog_import import import_books, iter_lines
+from sqlalchemy import delete, exists, func, select, text, update
 from datetime import datetime
-from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional, Union
 
 router = APIRouter()
 
@@ -16,10 +21,33 @@ class BookCreate(BaseModel):
     author: str
     quantity: int = 1
 
-@router.post("/")
-def add_book(
+class BookResponse(BaseModel):
+    id: int
+    title: str
+    author: str
+    quantity: int
+    available_quantity: int
+
+    class Config:
+        from_attributes = True
+
+class BookSearchResponse(BookResponse):
+    next_available_date: Optional[Union[datetime, str]] = None
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReportResponse(BaseModel):
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[ImportRowError]
+
+@router.post("/", response_model=BookResponse)
+async def add_book(
     book: BookCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Member = Depends(get_current_user)
 ):
     
@@ -28,84 +56,109 @@ def add_book(
     db_book = Book(**book.dict())
     db_book.available_quantity = book.quantity
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    await db.refresh(db_book)
     return db_book
 
-@router.get("/")
-def get_books(
-    db: Session = Depends(get_db),
+@router.post("/import", response_model=ImportReportResponse)
+async def bulk_import_books(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
     current_user: Member = Depends(get_current_user)
 ):
-    return db.query(Book).all()
-
-
-class BookResponse(BaseModel):
-    id: int
-    title: str
-    author: str
-    quantity: int
-    available_quantity: int
-    next_available_date: Optional[datetime] = None
+    """Stream a CSV (title,author,quantity header) or NDJSON catalog into the books table."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can import books")
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "json" in content_type else "csv"
+    return await import_books(db, iter_lines(request.stream()), format)
 
-    class Config:
-        from_attributes = True
+@router.get("/", response_model=Page[BookResponse], dependencies=[etag("books")])
+async def get_books(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Member = Depends(get_read_user)
+):
+    return await paginate(db, select_columns(Book, BookResponse), Book.id, page)
 
-@router.get("/search")
-def search_books(
+@router.get("/search", response_model=List[BookSearchResponse], dependencies=[etag("books", "loans")])
+async def search_books(
     query: str, 
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_user)
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Member = Depends(get_read_user)
 ):
-    books = db.query(Book).filter(
-        (Book.title.ilike(f"%{query}%")) |
-        (Book.author.ilike(f"%{query}%"))
-    ).all()
+    match = fts.match_expression(query) if fts.fts_enabled else None
+    if match is not None:
+        # Ranked, tokenised prefix match through the FTS5 index
+        stmt = (
+            select_columns(Book, BookResponse)
+            .join(fts.books_fts, fts.books_fts.c.rowid == Book.id)
+            .where(text("books_fts MATCH :match").bindparams(match=match))
+            .order_by(fts.books_fts.c.rank)
+        )
+    else:
+        stmt = select_columns(Book, BookResponse).where(
+            (Book.title.ilike(f"%{query}%")) |
+            (Book.author.ilike(f"%{query}%"))
+        ).order_by(Book.id)
+    books = (await db.execute(stmt.limit(limit).offset(offset))).all()
+
+    # Earliest due date for every unavailable book on the page, in one grouped query
+    unavailable_ids = [book.id for book in books if book.available_quantity == 0]
+    next_returns = {}
+    if unavailable_ids:
+        next_returns = dict((await db.execute(
+            select(Loan.book_id, func.min(Loan.return_date))
+            .where(Loan.book_id.in_(unavailable_ids))
+            .where(Loan.is_returned == False)
+            .group_by(Loan.book_id)
+        )).all())
 
     response = []
     for book in books:
-        next_return = None
-        if book.available_quantity == 0:  # Only check loans if no copies available
-            next_return = db.query(func.min(Loan.return_date))\
-                .filter(Loan.book_id == book.id)\
-                .filter(Loan.is_returned == False)\
-                .scalar()
-
-        book_response = BookResponse(
-            id=book.id,
-            title=book.title,
-            author=book.author,
-            quantity=book.quantity,
-            available_quantity=book.available_quantity,
-            next_available_date=next_return if next_return else "Available now" if book.available_quantity > 0 else None
-        )
-        response.append(book_response)
+        next_return = next_returns.get(book.id)
+        response.append({
+            **book._asdict(),
+            "next_available_date": next_return if next_return else "Available now" if book.available_quantity > 0 else None
+        })
 
     return response
 
-@router.delete("/{book_id}")
-def delete_book(
+@router.delete("/{book_id}", response_model=Message)
+async def delete_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Member = Depends(get_current_user)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Only admins can delete books")
     
     # Check if book exists
-    book = db.query(Book).filter(Book.id == book_id).first()
-    if not book:
+    title = await db.scalar(select(Book.title).where(Book.id == book_id))
+    if title is None:
         raise HTTPException(status_code=404, detail="Book not found")
     
     # Check if book has active loans
-    if any(not loan.is_returned for loan in book.loans):
+    if await db.scalar(select(exists().where(Loan.book_id == book_id, Loan.is_returned == False))):
         raise HTTPException(status_code=400, detail="Cannot delete book with active loans")
     
     # Check if book has active reservations
-    if any(reservation.is_active for reservation in book.reservations):
+    if await db.scalar(select(exists().where(Reservation.book_id == book_id, Reservation.is_active == True))):
         raise HTTPException(status_code=400, detail="Cannot delete book with active reservations")
     
-    # Delete the book
-    db.delete(book)
-    db.commit()
-    return {"message": f"Book '{book.title}' deleted successfully"}
\ No newline at end of file
+    # Past loans and reservations keep their rows but lose the link, in one UPDATE
+    # each instead of the ORM loading every row the book ever had to null it
+    for model in (Loan, LoanHistory, Reservation):
+        await db.execute(
+            update(model).where(model.book_id == book_id).values(book_id=None)
+            .execution_options(synchronize_session=False)
+        )
+    # Rebuilt rollups skip unlinked loans, so the book's counters go with it
+    await db.execute(delete(BookDailyStats).where(BookDailyStats.book_id == book_id))
+    await db.execute(delete(Book).where(Book.id == book_id))
+    await db.commit()
+    return {"message": f"Book '{title}' deleted successfully"}
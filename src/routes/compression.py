@@ -0,0 +1,124 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+# Media types worth compressing. Event streams are left alone: a compressor
+# holding back bytes would delay events.
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+
+def negotiate(accept_encoding: str, available) -> Optional[str]:
+    """The coding from ``available`` (in order of preference) the client rates highest, or None."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        weight = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        # wbits 31: deflate with a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing response bodies with the best coding the client accepts.
+
+    Brotli is preferred when the ``brotli`` package is installed, gzip
+    otherwise. A complete body is only compressed from ``minimum_size`` bytes
+    up, where the saving outweighs the CPU; a streamed body always is, with
+    each chunk flushed so NDJSON rows reach the client as they are read.
+    Responses that already carry a Content-Encoding pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders = {"gzip": lambda: _Gzip(gzip_level)}
+        if brotli is not None:
+            self.encoders = {"br": lambda: _Brotli(brotli_quality), **self.encoders}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encoders)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder = None
+
+        async def send_wrapper(message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compressing pays
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                media_type = headers.get("content-type", "").partition(";")[0].strip()
+                if (
+                    media_type in COMPRESSIBLE_TYPES
+                    and "content-encoding" not in headers
+                    and (more_body or len(body) >= self.minimum_size)
+                ):
+                    encoder = self.encoders[coding]()
+                    headers["Content-Encoding"] = coding
+                    headers.add_vary_header("Accept-Encoding")
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    if not more_body:
+                        body = encoder.compress(body, final=True)
+                        headers["Content-Length"] = str(len(body))
+                        encoder = None
+                        await send(start)
+                        start = None
+                        await send({"type": "http.response.body", "body": body})
+                        return
+                await send(start)
+                start = None
+            if encoder is not None:
+                body = encoder.compress(body, final=not more_body)
+                message = {"type": "http.response.body", "body": body, "more_body": more_body}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,46 @@
+import hashlib
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.routing import get_read_db, get_read_user
+from database.versions import current_versions
+from models.models import Member
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def etag(*tables: str):
+    """Dependency for GET routes whose payload only changes when ``tables`` are written.
+
+    The tag hashes the tables' version counters together with the caller and
+    the full URL, since list payloads differ per member and per page. A match
+    on ``If-None-Match`` short-circuits with 304 before the route queries or
+    serializes anything; otherwise the tag is set on the response.
+    """
+
+    async def check(
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: Member = Depends(get_read_user)
+    ):
+        versions = await current_versions(db, tables)
+        state = ";".join(f"{table}={versions.get(table, 0)}" for table in tables)
+        digest = hashlib.blake2b(
+            f"{state}|{current_user.id}|{current_user.is_admin}|{request.url.path}?{request.url.query}".encode(),
+            digest_size=12,
+        ).hexdigest()
+        tag = f'W/"{digest}"'
+        headers = {"ETag": tag, "Cache-Control": "private, no-cache"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, tag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return Depends(check)
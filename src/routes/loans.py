@@ -1,98 +1,295 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from collections import Counter
+from typing import List, Optional
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from database.database import get_db
-from models.models import Loan, Book, Member
-from pydantic import BaseModel
+from database.routing import get_read_db, get_read_user
+from models.models import Loan, LoanHistory, Book, Member
+from pydantic import BaseModel, Field
 from auth.auth_utils import get_current_user
+from routes.conditional import etag
+from routes.pagination import Page, PageParams, paginate, paginate_union, select_columns
+from services.reservation_events import announce_available
+from services.reservation_queue import collect_holds, release_copies
+from datetime import datetime, timedelta
 
 router = APIRouter()
 
+LOAN_PERIOD = timedelta(days=14)
+
+books_table = Book.__table__
+
+# Check and decrement in one statement so concurrent checkouts can never oversell
+_take_available = (
+    update(books_table)
+    .where(
+        books_table.c.id == bindparam("book_id"),
+        books_table.c.available_quantity >= bindparam("count")
+    )
+    .values(available_quantity=books_table.c.available_quantity - bindparam("count"))
+)
+
 class LoanCreate(BaseModel):
     book_id: int
     member_id: int
 
-@router.post("/")
-def create_loan(
-    loan: LoanCreate, 
-    db: Session = Depends(get_db),
+class BatchCheckout(BaseModel):
+    member_id: int
+    book_ids: List[int] = Field(min_length=1, max_length=200)
+
+class BatchReturn(BaseModel):
+    loan_ids: List[int] = Field(min_length=1, max_length=200)
+
+class LoanResponse(BaseModel):
+    id: int
+    # None once the book is deleted: past rows are kept but unlinked
+    book_id: Optional[int] = None
+    member_id: int
+    loan_date: datetime
+    return_date: datetime
+    is_returned: bool
+    created_by: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class CheckoutResult(BaseModel):
+    book_id: int
+    success: bool
+    error: Optional[str] = None
+    loan_id: Optional[int] = None
+    return_date: Optional[datetime] = None
+
+class BatchCheckoutResponse(BaseModel):
+    results: List[CheckoutResult]
+
+class ReturnResult(BaseModel):
+    loan_id: int
+    success: bool
+    error: Optional[str] = None
+    book_id: Optional[int] = None
+
+class BatchReturnResponse(BaseModel):
+    results: List[ReturnResult]
+
+@router.post("/", response_model=LoanResponse)
+async def create_loan(
+    loan: LoanCreate,
+    db: AsyncSession = Depends(get_db),
     current_user: Member = Depends(get_current_user)
 ):
     # Ensure member can only create loans for themselves
-    if str(loan.member_id) != current_user.id:
+    if loan.member_id != current_user.id:
         raise HTTPException(
             status_code=403,
             detail="You can only create loans for yourself"
         )
-    
-    book = db.query(Book).filter(Book.id == loan.book_id).first()
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    if book.available_quantity <= 0:
-        raise HTTPException(status_code=400, detail="Book not available")
-    loan.return_date = datetime.utcnow() + timedelta(days=14)
-    db_loan = Loan(**loan.dict())
-    book.available_quantity -= 1
+
+    # A member collecting their hold takes the copy set aside for it
+    if not await collect_holds(db, loan.member_id, [loan.book_id]):
+        taken = await _take_copies(db, loan.book_id, 1)
+        if not taken:
+            await db.rollback()
+            if taken is None:
+                raise HTTPException(status_code=404, detail="Book not found")
+            raise HTTPException(status_code=400, detail="Book not available")
+    db_loan = Loan(
+        **loan.dict(),
+        return_date=datetime.utcnow() + LOAN_PERIOD,
+        created_by=current_user.id
+    )
     db.add(db_loan)
-    db.commit()
-    db.refresh(db_loan)
+    await db.commit()
+    await db.refresh(db_loan)
     return db_loan
 
-@router.put("/{loan_id}/return")
-def return_book(
-    loan_id: int, 
-    db: Session = Depends(get_db),
+async def _take_copies(db, book_id: int, count: int):
+    """Take up to ``count`` copies of a book; returns the number taken, or None if it doesn't exist.
+
+    The conditional UPDATE takes SQLite's write lock, so the fallback read for a
+    partial grant cannot race another checkout.
+    """
+    result = await db.execute(_take_available, {"book_id": book_id, "count": count})
+    if result.rowcount:
+        return count
+    available = await db.scalar(select(Book.available_quantity).where(Book.id == book_id))
+    if available is None:
+        return None
+    if available > 0:
+        await db.execute(_take_available, {"book_id": book_id, "count": available})
+        return available
+    return 0
+
+@router.post("/batch", response_model=BatchCheckoutResponse, response_model_exclude_none=True)
+async def batch_checkout(
+    batch: BatchCheckout,
+    db: AsyncSession = Depends(get_db),
     current_user: Member = Depends(get_current_user)
 ):
-    loan = db.query(Loan).filter(Loan.id == loan_id).first()
-    if not loan:
-        raise HTTPException(status_code=404, detail="Loan not found")
-    
-    if loan.is_returned:
-        raise HTTPException(status_code=400, detail="Book already returned")
+    """Check out several books for one member in a single transaction."""
+    if batch.member_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(
+            status_code=403,
+            detail="You can only create loans for yourself"
+        )
+
+    # Held copies are already set aside for the member; the rest come off the shelf
+    held = Counter(await collect_holds(db, batch.member_id, set(batch.book_ids)))
+    taken = {}
+    for book_id, count in Counter(batch.book_ids).items():
+        taken[book_id] = held[book_id]
+        if count > held[book_id]:
+            shelf = await _take_copies(db, book_id, count - held[book_id])
+            taken[book_id] = None if shelf is None else taken[book_id] + shelf
+
+    now = datetime.utcnow()
+    results = []
+    loans = []
+    for book_id in batch.book_ids:
+        if taken[book_id] is None:
+            results.append({"book_id": book_id, "success": False, "error": "Book not found"})
+        elif taken[book_id] <= 0:
+            results.append({"book_id": book_id, "success": False, "error": "Book not available"})
+        else:
+            taken[book_id] -= 1
+            loan = Loan(
+                book_id=book_id,
+                member_id=batch.member_id,
+                loan_date=now,
+                return_date=now + LOAN_PERIOD,
+                created_by=current_user.id
+            )
+            loans.append(loan)
+            results.append({"book_id": book_id, "success": True, "loan": loan})
+
+    if loans:
+        db.add_all(loans)
+        await db.commit()
+    else:
+        await db.rollback()
 
-    # Return the book
-    loan.return_date = datetime.utcnow()
-    loan.is_returned = True
-    loan.book.available_quantity += 1
-    
-    # Check for waiting reservations
-    waiting_reservation = db.query(Reservation).filter(
-        Reservation.book_id == loan.book_id,
-        Reservation.status == ReservationStatus.WAITING,
-        Reservation.is_active == True
-    ).order_by(Reservation.reservation_date).first()
-
-    if waiting_reservation:
-        waiting_reservation.status = ReservationStatus.AVAILABLE
-        waiting_reservation.notification_date = datetime.utcnow()
-    
-    db.commit()
-    db.refresh(loan)
-    return loan
-
-@router.get("/borrowed")
-def get_borrowed_books(
-    db: Session = Depends(get_db),
+    for result in results:
+        loan = result.pop("loan", None)
+        if loan is not None:
+            result.update(loan_id=loan.id, return_date=loan.return_date)
+    return {"results": results}
+
+@router.post("/batch/return", response_model=BatchReturnResponse, response_model_exclude_none=True)
+async def batch_return(
+    batch: BatchReturn,
+    db: AsyncSession = Depends(get_db),
     current_user: Member = Depends(get_current_user)
+):
+    """Return several loans in a single transaction, promoting reservations once per book.
+
+    Members can only return their own loans; admins can return any.
+    """
+    now = datetime.utcnow()
+    returnable = update(Loan).where(Loan.id.in_(set(batch.loan_ids)), Loan.is_returned == False)
+    if not current_user.is_admin:
+        returnable = returnable.where(Loan.member_id == current_user.id)
+    returned_loans = dict((await db.execute(
+        returnable
+        .values(is_returned=True, return_date=now)
+        .returning(Loan.id, Loan.book_id)
+        .execution_options(synchronize_session=False)
+    )).all())
+    unreturned = set(batch.loan_ids) - set(returned_loans)
+    # Owner of every other loan that exists, archived ones included
+    known = dict((await db.execute(
+        select(Loan.id, Loan.member_id).where(Loan.id.in_(unreturned))
+        .union_all(select(LoanHistory.id, LoanHistory.member_id).where(LoanHistory.id.in_(unreturned)))
+    )).all()) if unreturned else {}
+
+    results = []
+    returned = Counter()
+    seen = set()
+    for loan_id in batch.loan_ids:
+        if loan_id in returned_loans and loan_id not in seen:
+            seen.add(loan_id)
+            returned[returned_loans[loan_id]] += 1
+            results.append({"loan_id": loan_id, "success": True, "book_id": returned_loans[loan_id]})
+        elif loan_id in returned_loans:
+            results.append({"loan_id": loan_id, "success": False, "error": "Book already returned"})
+        elif loan_id in known and not current_user.is_admin and known[loan_id] != current_user.id:
+            results.append({"loan_id": loan_id, "success": False, "error": "Not authorized"})
+        elif loan_id in known:
+            results.append({"loan_id": loan_id, "success": False, "error": "Book already returned"})
+        else:
+            results.append({"loan_id": loan_id, "success": False, "error": "Loan not found"})
+
+    if returned:
+        promoted = await release_copies(db, returned, now)
+        await db.commit()
+        announce_available(promoted, now)
+    else:
+        await db.rollback()
+    return {"results": results}
+
+@router.put("/{loan_id}/return", response_model=LoanResponse)
+async def return_book(
+    loan_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Member = Depends(get_current_user)
+):
+    # Flip the loan only if it is still out, so a double return can't restock twice.
+    # Members can only return their own loans; admins can return any.
+    now = datetime.utcnow()
+    returnable = update(Loan).where(Loan.id == loan_id, Loan.is_returned == False)
+    if not current_user.is_admin:
+        returnable = returnable.where(Loan.member_id == current_user.id)
+    book_id = await db.scalar(
+        returnable
+        .values(is_returned=True, return_date=now)
+        .returning(Loan.book_id)
+        .execution_options(synchronize_session=False)
+    )
+    if book_id is None:
+        await db.rollback()
+        # Archived loans were returned long ago
+        owner = (await db.execute(
+            select(Loan.member_id).where(Loan.id == loan_id)
+            .union_all(select(LoanHistory.member_id).where(LoanHistory.id == loan_id))
+        )).first()
+        if owner is None:
+            raise HTTPException(status_code=404, detail="Loan not found")
+        if not current_user.is_admin and owner.member_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to return this loan")
+        raise HTTPException(status_code=400, detail="Book already returned")
+
+    promoted = await release_copies(db, Counter({book_id: 1}), now)
+    await db.commit()
+    announce_available(promoted, now)
+    return await db.scalar(select(Loan).where(Loan.id == loan_id))
+
+@router.get("/borrowed", response_model=Page[LoanResponse], dependencies=[etag("loans")])
+async def get_borrowed_books(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Member = Depends(get_read_user)
 ):
     # Admin can see all active loans, regular users see only their loans
+    loans = select_columns(Loan, LoanResponse)
     if current_user.is_admin:
-        return db.query(Loan).filter(Loan.is_returned == False).all()
-    
-    return db.query(Loan).filter(
+        return await paginate(db, loans.where(Loan.is_returned == False), Loan.id, page)
+
+    return await paginate(db, loans.where(
         Loan.member_id == current_user.id,
         Loan.is_returned == False
-    ).all()
+    ), Loan.id, page)
 
 
-@router.get("/history")
-def get_loans_history(
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_user)
+@router.get("/history", response_model=Page[LoanResponse], dependencies=[etag("loans", "loan_history")])
+async def get_loans_history(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Member = Depends(get_read_user)
 ):
-    if current_user.is_admin:
-        return db.query(Loan).all()
-    
-    return db.query(Loan).filter(
-        Loan.member_id == current_user.id
-    ).all()
\ No newline at end of file
+    """Current and archived loans, merged in id order."""
+    loans = select_columns(Loan, LoanResponse)
+    archived = select_columns(LoanHistory, LoanResponse)
+    if not current_user.is_admin:
+        loans = loans.where(Loan.member_id == current_user.id)
+        archived = archived.where(LoanHistory.member_id == current_user.id)
+    return await paginate_union(db, [loans, archived], page)
@@ -1,11 +1,20 @@
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from database.database import get_db
-from models.models import Member, pwd_context
-from pydantic import BaseModel, EmailStr, constr
-from auth.auth_utils import get_current_user
+from database.routing import get_read_db, get_read_user
+from models.models import Member
+from auth.passwords import hash_password
+from pydantic import BaseModel, EmailStr, constr, field_validator
+from auth.auth_utils import get_current_user, get_optional_user
+from auth.principal_cache import principal_cache
+from auth.rate_limit import rate_limit
+from config import settings
+from routes.conditional import etag
+from routes.pagination import Page, PageParams, paginate, select_columns
 
 router = APIRouter()
 
@@ -32,13 +41,17 @@ class MemberCreate(BaseModel):
         }
     }
 
-@router.post("/")
-def create_member(
+# Unauthenticated and pays a bcrypt hash, so signups are limited per IP and per email
+@router.post("/", response_model=str, dependencies=[rate_limit(
+    "signup", per_ip=settings.RATE_LIMIT_SIGNUP_PER_IP, per_email=settings.RATE_LIMIT_SIGNUP_PER_EMAIL,
+)])
+async def create_member(
     member: MemberCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[Member] = Depends(get_optional_user)
 ):
     # Check if user exists with same email
-    existing_member = db.query(Member).filter(Member.email == member.email).first()
+    existing_member = await db.scalar(select(Member).where(Member.email == member.email))
     if existing_member:
         raise HTTPException(status_code=400, detail="Email already registered")
 
@@ -46,20 +59,20 @@ def create_member(
     if member.is_admin:
         if not current_user:
             raise HTTPException(status_code=403, detail="Not authorized to create admin users")
-        requesting_user = db.query(Member).filter(Member.id == current_user).first()
-        if not requesting_user or not requesting_user.is_admin:
+        if not current_user.is_admin:
             raise HTTPException(status_code=403, detail="Only admins can create other admin users")
 
     db_member = Member(
         name=member.name,
         email=member.email,
         phone=member.phone,
-        hashed_password=pwd_context.hash(member.password),
+        hashed_password=await hash_password(member.password),
         is_admin=member.is_admin
     )
     db.add(db_member)
-    db.commit()
-    db.refresh(db_member)
+    await db.commit()
+    await db.refresh(db_member)
+    principal_cache.invalidate(db_member.id)
     return f"User {db_member.name} created successfully"
 
 
@@ -73,29 +86,27 @@ class MemberResponse(BaseModel):
     class Config:
         from_attributes = True
 
-@router.get("/")
-def get_members(
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_user)
+@router.get("/", response_model=Page[MemberResponse], dependencies=[etag("members")])
+async def get_members(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Member = Depends(get_read_user)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=404, detail="Only admin can view members")
 
-    if current_user.is_admin:
-        members = db.query(Member).all()
-        return [MemberResponse.model_validate(member) for member in members]
-    return [MemberResponse.model_validate(current_user)]
+    return await paginate(db, select_columns(Member, MemberResponse), Member.id, page)
 
 
-@router.get("/{member_id}")
-def get_member(
+@router.get("/{member_id}", response_model=MemberResponse, dependencies=[etag("members")])
+async def get_member(
     member_id: int,
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Member = Depends(get_read_user)
 ):
 
-    if current_user.is_admin or str(member_id) == current_user.id:
-        member = db.query(Member).filter(Member.id == member_id).first()
+    if current_user.is_admin or member_id == current_user.id:
+        member = await db.scalar(select(Member).where(Member.id == member_id))
         if member is None:
             raise HTTPException(status_code=404, detail="Member not found")
         return MemberResponse.model_validate(member)
@@ -103,3 +114,41 @@ def get_member(
         status_code=403,
         detail="Not authorized to access this member's data"
     )
+
+
+class MemberUpdate(BaseModel):
+    name: Optional[constr(min_length=2, max_length=50, strip_whitespace=True)] = None
+    phone: Optional[constr(pattern=r'^\+?1?\d{9,15}$', strip_whitespace=True)] = None
+    is_admin: Optional[bool] = None
+
+    # Fields are optional to leave out, not to clear: none of them may be null
+    @field_validator("name", "phone", "is_admin", mode="before")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
+@router.put("/{member_id}", response_model=MemberResponse)
+async def update_member(
+    member_id: int,
+    changes: MemberUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Member = Depends(get_current_user)
+):
+    if not current_user.is_admin and member_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to modify this member")
+    if "is_admin" in changes.model_fields_set and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can change admin status")
+
+    member = await db.scalar(select(Member).where(Member.id == member_id))
+    if member is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+
+    for field, value in changes.model_dump(exclude_unset=True).items():
+        setattr(member, field, value)
+    await db.commit()
+    await db.refresh(member)
+    # Cached principals for this member would otherwise keep the old role
+    principal_cache.invalidate(member_id)
+    return MemberResponse.model_validate(member)
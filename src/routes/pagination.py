@@ -0,0 +1,130 @@
+from typing import Generic, List, Optional, TypeVar
+
+import orjson
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import select, union_all
+
+from config import settings
+from database.database import session_scope
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[int] = None
+
+
+class PageParams:
+    """Query parameters shared by every list endpoint.
+
+    ``cursor`` is the last id of the previous page; rows come back in ascending
+    id order. ``stream=true`` switches to NDJSON read through a server-side cursor.
+    ``fields=id,title`` narrows each row to those fields (``id`` is always kept).
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        cursor: Optional[int] = Query(None, ge=0, description="Return rows with id greater than this"),
+        limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+        stream: bool = Query(False, description="Stream every matching row as NDJSON"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return; id is always included"),
+    ):
+        self.response = response
+        self.cursor = cursor
+        self.limit = limit
+        self.stream = stream
+        self.fields = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+
+
+def select_columns(model, schema):
+    """SELECT just the table columns ``schema`` exposes, as plain rows rather than ORM entities.
+
+    Skipping the identity map and attribute instrumentation is most of the cost
+    of a large page.
+    """
+    table = model.__table__
+    return select(*(table.c[name] for name in schema.model_fields if name in table.c))
+
+
+def project(stmt, page: PageParams, key: str = "id"):
+    """Narrow a column ``stmt`` to the fields the caller asked for, so the rest are never read.
+
+    Only columns ``stmt`` already selects can be asked for, which keeps a
+    route's choice of exposed columns (no password hashes). ``key`` stays in
+    for the next cursor.
+    """
+    if page.fields is None:
+        return stmt
+    available = {column.key: column for column in stmt.selected_columns}
+    unknown = [name for name in page.fields if name not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}; available: {', '.join(available)}"
+        )
+    wanted = {key, *page.fields}
+    return stmt.with_only_columns(*(column for name, column in available.items() if name in wanted))
+
+
+def _page_response(page: PageParams, body):
+    # A sparse page no longer matches the route's response_model, so it is
+    # serialized as is, keeping headers other dependencies set (ETag)
+    if page.fields is None:
+        return body
+    return ORJSONResponse(body, headers=dict(page.response.headers))
+
+
+async def paginate(db, stmt, id_column, page: PageParams):
+    """Run a column ``stmt`` as one keyset page of dicts, or stream it when the caller asked for NDJSON."""
+    stmt = project(stmt, page, id_column.key)
+    if page.cursor is not None:
+        stmt = stmt.where(id_column > page.cursor)
+    stmt = stmt.order_by(id_column)
+    if page.stream:
+        return stream_ndjson(stmt)
+
+    return _page_response(page, await _keyset_page(db, stmt.limit(page.limit + 1), id_column.key, page.limit))
+
+
+async def paginate_union(db, branches, page: PageParams):
+    """``paginate`` over the UNION ALL of column selects that share an ``id`` column.
+
+    The cursor and page limit go inside each branch, so every table seeks on
+    its own key and contributes at most one page before the merge.
+    """
+    branches = [project(branch, page) for branch in branches]
+    if page.cursor is not None:
+        branches = [branch.where(branch.selected_columns.id > page.cursor) for branch in branches]
+    if not page.stream:
+        branches = [branch.order_by(branch.selected_columns.id).limit(page.limit + 1) for branch in branches]
+    merged = union_all(*(select(*branch.subquery().c) for branch in branches)).subquery()
+    stmt = select(*merged.c).order_by(merged.c.id)
+    if page.stream:
+        return stream_ndjson(stmt)
+    return _page_response(page, await _keyset_page(db, stmt.limit(page.limit + 1), "id", page.limit))
+
+
+async def _keyset_page(db, stmt, key: str, limit: int):
+    rows = (await db.execute(stmt)).all()
+    items = [row._asdict() for row in rows[:limit]]
+    next_cursor = items[-1][key] if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def stream_ndjson(stmt):
+    chunk_size = settings.STREAM_CHUNK_SIZE
+
+    async def generate():
+        # The stream outlives the request's dependencies, so it owns its session
+        async with session_scope(read_only=True) as db:
+            result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+            # Column keys are SQLAlchemy str subclasses, which orjson refuses as dict keys
+            keys = [str(key) for key in result.keys()]
+            async for rows in result.partitions(chunk_size):
+                yield b"".join(orjson.dumps(dict(zip(keys, row))) + b"\n" for row in rows)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
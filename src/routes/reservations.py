@@ -1,9 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database.database import get_db
-from models.models import Reservation, Book, Member
+import asyncio
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+from database.database import get_db, session_scope
+from database.routing import get_read_db, get_read_user
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from models.models import Reservation, ReservationStatus, Book, Member
 from pydantic import BaseModel
-from auth.auth_utils import get_current_user
+from auth.auth_utils import get_current_user, get_streaming_user
+from routes.conditional import etag
+from routes.pagination import Page, PageParams, paginate, select_columns
+from services.reservation_events import announce_available, current_holds, reservation_events
+from services.reservation_queue import queue_position, release_copies
 
 router = APIRouter()
 
@@ -11,76 +25,179 @@ class ReservationCreate(BaseModel):
     book_id: int
     member_id: int
 
-@router.post("/")
-def create_reservation(
-    reservation: ReservationCreate, 
-    db: Session = Depends(get_db),
+class ReservationResponse(BaseModel):
+    id: int
+    # None once the book is deleted: past rows are kept but unlinked
+    book_id: Optional[int] = None
+    member_id: int
+    reservation_date: datetime
+    is_active: bool
+    status: ReservationStatus
+    notification_date: Optional[datetime] = None
+    created_by: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class QueuePositionResponse(BaseModel):
+    reservation_id: int
+    book_id: int
+    status: ReservationStatus
+    position: Optional[int] = None
+
+@router.post("/", response_model=ReservationResponse)
+async def create_reservation(
+    reservation: ReservationCreate,
+    db: AsyncSession = Depends(get_db),
     current_user: Member = Depends(get_current_user)
 ):
     # Ensure member can only create reservations for themselves
-    if str(reservation.member_id) != current_user.id:
+    if reservation.member_id != current_user.id:
         raise HTTPException(
             status_code=403,
             detail="You can only create reservations for yourself"
         )
 
-    book = db.query(Book).filter(Book.id == reservation.book_id).first()
+    book = await db.scalar(select(Book).where(Book.id == reservation.book_id))
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    existing_reservation = db.query(Reservation).filter(
+    existing_reservation = await db.scalar(select(Reservation).where(
         Reservation.book_id == reservation.book_id,
         Reservation.member_id == reservation.member_id,
         Reservation.is_active == True
-    ).first()
-    
+    ).limit(1))
+
     if existing_reservation:
         raise HTTPException(status_code=400, detail="Book already reserved by you")
 
-    db_reservation = Reservation(**reservation.dict())
+    db_reservation = Reservation(**reservation.dict(), created_by=current_user.id)
     db.add(db_reservation)
-    db.commit()
-    db.refresh(db_reservation)
+    await db.commit()
+    await db.refresh(db_reservation)
     return db_reservation
 
-@router.get("/")
-def get_reservations(
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_user)
+@router.get("/", response_model=Page[ReservationResponse], dependencies=[etag("reservations")])
+async def get_reservations(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Member = Depends(get_read_user)
 ):
+    reservations = select_columns(Reservation, ReservationResponse)
     # Admin can see all active reservations
     if current_user.is_admin:
-        return db.query(Reservation).all()
-    
+        return await paginate(db, reservations, Reservation.id, page)
+
     # Regular users see only their reservations
-    return db.query(Reservation).filter(
+    return await paginate(db, reservations.where(
         Reservation.member_id == current_user.id
-    ).all()
+    ), Reservation.id, page)
 
-@router.get("/active")
-def get_active_reservations(
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_user)
+@router.get("/active", response_model=Page[ReservationResponse], dependencies=[etag("reservations")])
+async def get_active_reservations(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Member = Depends(get_read_user)
 ):
+    reservations = select_columns(Reservation, ReservationResponse)
     if current_user.is_admin:
-        return db.query(Reservation).filter(Reservation.is_active == True).all()
-    
-    return db.query(Reservation).filter(
+        return await paginate(db, reservations.where(Reservation.is_active == True), Reservation.id, page)
+
+    return await paginate(db, reservations.where(
         Reservation.member_id == current_user.id,
         Reservation.is_active == True
-    ).all()
+    ), Reservation.id, page)
+
+
+def _sse_frame(name: str, data, event_id: Optional[str] = None) -> bytes:
+    frame = b"id: " + event_id.encode() + b"\n" if event_id else b""
+    return frame + b"event: " + name.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
 
+async def _event_stream(subscription, backlog):
+    try:
+        yield f"retry: {settings.EVENT_STREAM_RETRY_MS}\n\n".encode() + b"".join(backlog)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.EVENT_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from timing the connection out, ignored by clients
+                yield b": keep-alive\n\n"
+                continue
+            if event is None:
+                break
+            yield _sse_frame(event.name, event.data, event.id)
+            if subscription.closed and subscription.queue.empty():
+                # Dropped for falling behind; the client reconnects with Last-Event-ID
+                break
+    finally:
+        reservation_events.unsubscribe(subscription)
 
-@router.put("/{reservation_id}/cancel")
-def cancel_reservation(
-    reservation_id: int, 
-    db: Session = Depends(get_db),
+@router.get("/events", response_class=StreamingResponse)
+async def stream_reservation_events(
+    last_event_id: Optional[str] = Header(None),
+    current_user: Member = Depends(get_streaming_user)
+):
+    """Server-sent events for the caller's holds, in place of polling ``/active``.
+
+    ``available`` fires when a reserved copy is set aside, ``expired`` when an
+    uncollected hold lapses. A reconnect carrying ``Last-Event-ID`` replays
+    what it missed; otherwise the stream opens with the member's current holds
+    as ``available`` events. Either way a ``ready`` event follows the backlog.
+    """
+    subscription = reservation_events.subscribe(current_user.id)
+    head = reservation_events.head_id()
+    missed = reservation_events.replay(current_user.id, last_event_id) if last_event_id else None
+    if missed is not None:
+        backlog = [_sse_frame(event.name, event.data, event.id) for event in missed]
+    else:
+        try:
+            async with session_scope(read_only=True) as db:
+                holds = await current_holds(db, current_user.id)
+        except BaseException:
+            reservation_events.unsubscribe(subscription)
+            raise
+        # A hold promoted during this query can also arrive live; clients key holds by reservation_id
+        backlog = [_sse_frame("available", hold) for hold in holds]
+    backlog.append(_sse_frame("ready", {"backlog": len(backlog)}, head))
+    return StreamingResponse(
+        _event_stream(subscription, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get(
+    "/{reservation_id}/position", response_model=QueuePositionResponse, dependencies=[etag("reservations")]
+)
+async def get_queue_position(
+    reservation_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Member = Depends(get_read_user)
+):
+    reservation = await db.scalar(select(Reservation).where(Reservation.id == reservation_id))
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    if not current_user.is_admin and reservation.member_id != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="Not authorized to view this reservation"
+        )
+    return {
+        "reservation_id": reservation.id,
+        "book_id": reservation.book_id,
+        "status": reservation.status,
+        "position": await queue_position(db, reservation)
+    }
+
+@router.put("/{reservation_id}/cancel", response_model=ReservationResponse)
+async def cancel_reservation(
+    reservation_id: int,
+    db: AsyncSession = Depends(get_db),
     current_user: Member = Depends(get_current_user)
 ):
-    reservation = db.query(Reservation).filter(Reservation.id == reservation_id).first()
+    reservation = await db.scalar(select(Reservation).where(Reservation.id == reservation_id))
     if not reservation:
         raise HTTPException(status_code=404, detail="Reservation not found")
-    
+
     # Allow both admin and reservation owner to cancel
     if not current_user.is_admin and reservation.member_id != current_user.id:
         raise HTTPException(
@@ -91,7 +208,15 @@ def cancel_reservation(
     if not reservation.is_active:
         raise HTTPException(status_code=400, detail="Reservation already cancelled")
 
+    was_holding = reservation.status == ReservationStatus.AVAILABLE
     reservation.is_active = False
-    db.commit()
-    db.refresh(reservation)
-    return reservation
\ No newline at end of file
+    reservation.status = ReservationStatus.CANCELLED
+    promoted, now = [], datetime.utcnow()
+    if was_holding:
+        # The held copy goes to the next member in the queue, or back on the shelf
+        await db.flush()
+        promoted = await release_copies(db, Counter({reservation.book_id: 1}), now)
+    await db.commit()
+    announce_available(promoted, now)
+    await db.refresh(reservation)
+    return reservation
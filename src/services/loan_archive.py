@@ -0,0 +1,77 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from config import settings
+from database.database import session_scope
+from models.models import Loan, LoanHistory
+from services.periodic import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVED_COLUMNS = [column.name for column in LoanHistory.__table__.c]
+
+
+async def archive_returned_loans(db, before: datetime, batch_size: int = None):
+    """Move one batch of loans returned before ``before`` into loan_history; returns rows moved.
+
+    Copy and delete commit together, so a loan is always in exactly one of
+    the two tables, and a second archiver racing on the same batch finds the
+    rows already gone. The newest loan is never moved: SQLite hands out
+    max(id) + 1 for new rows, and keeping it in place stops a new loan from
+    reusing an archived id.
+    """
+    batch_size = batch_size or settings.LOAN_ARCHIVE_BATCH_SIZE
+    ids = (await db.scalars(
+        select(Loan.id).where(
+            Loan.is_returned == True,
+            Loan.return_date < before,
+            Loan.id < select(func.max(Loan.id)).scalar_subquery(),
+        ).order_by(Loan.id).limit(batch_size)
+    )).all()
+    if not ids:
+        return 0
+
+    loans = Loan.__table__
+    await db.execute(
+        insert(LoanHistory).from_select(
+            _ARCHIVED_COLUMNS,
+            select(*(loans.c[name] for name in _ARCHIVED_COLUMNS)).where(loans.c.id.in_(ids)),
+        )
+    )
+    moved = (await db.execute(
+        delete(Loan).where(Loan.id.in_(ids)).execution_options(synchronize_session=False)
+    )).rowcount
+    await db.commit()
+    return moved
+
+
+async def archive_all(after_days: float = None, batch_size: int = None):
+    """Archive every loan returned more than ``after_days`` ago, one batch per transaction."""
+    after_days = settings.LOAN_ARCHIVE_AFTER_DAYS if after_days is None else after_days
+    batch_size = batch_size or settings.LOAN_ARCHIVE_BATCH_SIZE
+    before = datetime.utcnow() - timedelta(days=after_days)
+    total = 0
+    async with session_scope() as db:
+        while True:
+            moved = await archive_returned_loans(db, before, batch_size)
+            total += moved
+            if moved < batch_size:
+                break
+    return total
+
+
+class LoanArchiver(PeriodicJob):
+    """Periodically moves old returned loans to loan_history."""
+
+    name = "Loan archival"
+
+    async def run_once(self):
+        total = await archive_all()
+        if total:
+            logger.info("Archived %d returned loans", total)
+        return total
+
+
+loan_archiver = LoanArchiver(settings.LOAN_ARCHIVE_INTERVAL_SECONDS)
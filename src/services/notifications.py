@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import smtplib
+from email.message import EmailMessage
+
+from config import settings
+
+
+class Notification:
+    __slots__ = ("key", "kind", "recipient", "subject", "body")
+
+    def __init__(self, key: str, kind: str, recipient: str, subject: str, body: str):
+        self.key = key
+        self.kind = kind
+        self.recipient = recipient
+        self.subject = subject
+        self.body = body
+
+
+# A transport is any object with ``async send_batch(notifications)`` returning
+# one error string (or None once delivered) per notification, in order.
+# Raising fails the whole batch. Delivery is at least once: a batch whose
+# outcome could not be recorded is sent again with the same keys, so a
+# transport should drop or mark keys it has already delivered.
+
+class FileTransport:
+    """Appends notifications to a JSON-lines file: the development and test stand-in for real delivery.
+
+    Keys already in the file are skipped, so a resent batch adds nothing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._delivered = None
+
+    async def send_batch(self, notifications):
+        return await asyncio.to_thread(self._append, notifications)
+
+    def _append(self, notifications):
+        if self._delivered is None:
+            self._delivered = set()
+            if os.path.exists(self.path):
+                with open(self.path) as fh:
+                    self._delivered.update(json.loads(line)["key"] for line in fh if line.strip())
+        lines = []
+        for notification in notifications:
+            if notification.key in self._delivered:
+                continue
+            self._delivered.add(notification.key)
+            lines.append(json.dumps({
+                "key": notification.key,
+                "kind": notification.kind,
+                "to": notification.recipient,
+                "subject": notification.subject,
+                "body": notification.body,
+            }) + "\n")
+        with open(self.path, "a") as fh:
+            fh.writelines(lines)
+        return [None] * len(notifications)
+
+
+class SmtpTransport:
+    """Sends a batch as email over one SMTP connection, from a worker thread.
+
+    The idempotency key becomes the Message-ID, which lets mail systems
+    collapse a resent message. Point it at a local debugging server (MailHog,
+    ``python -m aiosmtpd -n``) to see messages without delivering them.
+    """
+
+    def __init__(self, host: str, port: int, sender: str, timeout: float):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+    async def send_batch(self, notifications):
+        return await asyncio.to_thread(self._send, notifications)
+
+    def _send(self, notifications):
+        errors = []
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            for notification in notifications:
+                message = EmailMessage()
+                message["From"] = self.sender
+                message["To"] = notification.recipient
+                message["Subject"] = notification.subject
+                message["Message-ID"] = f"<{notification.key}@{self.sender.rpartition('@')[2] or 'library'}>"
+                message.set_content(notification.body)
+                try:
+                    smtp.send_message(message)
+                    errors.append(None)
+                except smtplib.SMTPException as exc:
+                    # The connection is still usable after a rejected recipient or message
+                    errors.append(f"{type(exc).__name__}: {exc}")
+        return errors
+
+
+def build_transport():
+    if settings.NOTIFICATION_TRANSPORT == "file":
+        return FileTransport(settings.NOTIFICATION_FILE)
+    if settings.NOTIFICATION_TRANSPORT == "smtp":
+        return SmtpTransport(
+            settings.SMTP_HOST, settings.SMTP_PORT, settings.NOTIFICATION_SENDER, settings.SMTP_TIMEOUT_SECONDS
+        )
+    raise ValueError(f"Unknown LIBRARY_NOTIFICATION_TRANSPORT {settings.NOTIFICATION_TRANSPORT!r}")
@@ -0,0 +1,248 @@
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from config import settings
+from database.database import session_scope
+from models.models import Book, Member, NotificationOutbox, OutboxStatus
+from monitoring import metrics
+from services.notifications import Notification, build_transport
+from services.periodic import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+HOLD_AVAILABLE = "hold_available"
+HOLD_EXPIRED = "hold_expired"
+
+# Subject and body per kind, formatted with the payload plus the member's name and the book's title
+MESSAGES = {
+    HOLD_AVAILABLE: (
+        "Your reserved book is ready",
+        "Hi {name},\n\n{title} is being held for you until {hold_expires_at} UTC.\n",
+    ),
+    HOLD_EXPIRED: (
+        "Your hold has expired",
+        "Hi {name},\n\nYour hold on {title} expired before it was collected.\n",
+    ),
+}
+
+outbox = NotificationOutbox.__table__
+
+_record_attempt = (
+    update(outbox)
+    .where(outbox.c.id == bindparam("row_id"))
+    .values(
+        status=bindparam("new_status"),
+        attempts=bindparam("new_attempts"),
+        next_attempt_at=bindparam("retry_at"),
+        sent_at=bindparam("delivered_at"),
+        last_error=bindparam("error"),
+    )
+)
+
+
+async def enqueue(db, kind: str, events, now: datetime = None):
+    """Queue one notification per ``(event_id, member_id, payload)`` in ``db``'s open transaction.
+
+    The row commits or rolls back with the change it announces. Its key is
+    ``kind-event_id``; an event queued twice keeps the first row. Payloads
+    are stored as JSON, so datetimes go in as ISO strings.
+    """
+    now = now or datetime.utcnow()
+    rows = [
+        {
+            "idempotency_key": f"{kind}-{event_id}",
+            "kind": kind,
+            "member_id": member_id,
+            "payload": {
+                key: value.isoformat(sep=" ", timespec="seconds") if isinstance(value, datetime) else value
+                for key, value in payload.items()
+            },
+            "status": OutboxStatus.PENDING,
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now,
+        }
+        for event_id, member_id, payload in events
+    ]
+    if rows:
+        await db.execute(insert(outbox).on_conflict_do_nothing(index_elements=["idempotency_key"]), rows)
+
+
+async def enqueue_holds_available(db, promoted, now: datetime):
+    """Queue a notification per hold from :func:`promote_waiting`."""
+    expires_at = now + timedelta(hours=settings.HOLD_EXPIRY_HOURS)
+    await enqueue(db, HOLD_AVAILABLE, [
+        (reservation_id, member_id, {"reservation_id": reservation_id, "book_id": book_id, "hold_expires_at": expires_at})
+        for reservation_id, member_id, book_id in promoted
+    ], now)
+
+
+async def enqueue_holds_expired(db, expired, now: datetime):
+    """Queue a notification per hold closed by the expiry sweep."""
+    await enqueue(db, HOLD_EXPIRED, [
+        (reservation_id, member_id, {"reservation_id": reservation_id, "book_id": book_id})
+        for reservation_id, member_id, book_id in expired
+    ], now)
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retry number ``attempts``: doubling from OUTBOX_BACKOFF_SECONDS, capped, with jitter."""
+    delay = min(settings.OUTBOX_BACKOFF_MAX_SECONDS, settings.OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    # Spread retries after an outage so they don't all land on the same tick
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def claim_batch(db, now: datetime, batch_size: int):
+    """Lease up to ``batch_size`` due rows to this dispatcher and commit; returns them.
+
+    Pushing ``next_attempt_at`` out by OUTBOX_LEASE_SECONDS hides the rows
+    from other dispatchers while this one sends them. The UPDATE re-checks
+    that each row is still due, so of two dispatchers racing for a row only
+    one gets it back. A dispatcher that dies mid-batch leaves its rows to be
+    picked up again once the lease runs out.
+    """
+    due = (await db.scalars(
+        select(NotificationOutbox.id).where(
+            NotificationOutbox.status == OutboxStatus.PENDING,
+            NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.next_attempt_at).limit(batch_size)
+    )).all()
+    if not due:
+        return []
+    claimed = (await db.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.id.in_(due),
+            NotificationOutbox.status == OutboxStatus.PENDING,
+            NotificationOutbox.next_attempt_at <= now
+        )
+        .values(next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS))
+        .returning(
+            NotificationOutbox.id, NotificationOutbox.idempotency_key, NotificationOutbox.kind,
+            NotificationOutbox.member_id, NotificationOutbox.payload, NotificationOutbox.attempts
+        )
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    return claimed
+
+
+async def render(db, rows):
+    """Build a :class:`Notification` per claimed row, or None when its member is gone."""
+    member_ids = {row.member_id for row in rows}
+    book_ids = {row.payload["book_id"] for row in rows if "book_id" in row.payload}
+    members = {
+        member_id: (email, name)
+        for member_id, email, name in await db.execute(
+            select(Member.id, Member.email, Member.name).where(Member.id.in_(member_ids))
+        )
+    }
+    titles = dict((await db.execute(select(Book.id, Book.title).where(Book.id.in_(book_ids)))).all()) if book_ids else {}
+    await db.rollback()
+
+    notifications = []
+    for row in rows:
+        if row.member_id not in members:
+            notifications.append(None)
+            continue
+        email, name = members[row.member_id]
+        subject, body = MESSAGES[row.kind]
+        fields = {**row.payload, "name": name, "title": titles.get(row.payload.get("book_id"), "a reserved book")}
+        notifications.append(Notification(row.idempotency_key, row.kind, email, subject, body.format(**fields)))
+    return notifications
+
+
+class OutboxDispatcher(PeriodicJob):
+    """Delivers due outbox rows in batches through ``transport`` on the event loop.
+
+    No transaction is open while a batch is with the transport, so a slow or
+    failing channel holds up only the dispatcher. Outcomes are written back
+    for the whole batch in one executemany.
+    """
+
+    name = "Notification dispatch"
+
+    def __init__(self, interval: float, transport=None):
+        super().__init__(interval)
+        self.transport = transport
+        self._pruned_at = None
+
+    async def send(self, notifications):
+        """Errors per notification from the transport; a transport exception fails them all."""
+        deliverable = [notification for notification in notifications if notification is not None]
+        try:
+            errors = iter(await self.transport.send_batch(deliverable) if deliverable else ())
+        except Exception as exc:
+            logger.warning("Notification transport failed for a batch of %d: %s", len(deliverable), exc)
+            error = f"{type(exc).__name__}: {exc}"
+            errors = iter([error] * len(deliverable))
+        return [next(errors) if notification is not None else "Member no longer exists" for notification in notifications]
+
+    async def dispatch_batch(self, db, batch_size: int):
+        """Claim, send and record one batch; returns the number of rows claimed."""
+        rows = await claim_batch(db, datetime.utcnow(), batch_size)
+        if not rows:
+            return 0
+        errors = await self.send(await render(db, rows))
+
+        now = datetime.utcnow()
+        outcomes = []
+        for row, error in zip(rows, errors):
+            attempts = row.attempts + 1
+            if error is None:
+                status, retry_at, outcome = OutboxStatus.SENT, now, "sent"
+            elif attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                status, retry_at, outcome = OutboxStatus.FAILED, now, "failed"
+                logger.error("Giving up on notification %s after %d attempts: %s", row.idempotency_key, attempts, error)
+            else:
+                status, retry_at, outcome = OutboxStatus.PENDING, now + timedelta(seconds=backoff(attempts)), "retry"
+            metrics.notifications.inc(row.kind, outcome)
+            outcomes.append({
+                "row_id": row.id,
+                "new_status": status.name,
+                "new_attempts": attempts,
+                "retry_at": retry_at,
+                "delivered_at": now if error is None else None,
+                "error": error,
+            })
+        await db.execute(_record_attempt, outcomes)
+        await db.commit()
+        return len(rows)
+
+    async def prune(self, db):
+        """Drop rows sent more than OUTBOX_RETENTION_DAYS ago; returns how many."""
+        cutoff = datetime.utcnow() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+        pruned = (await db.execute(
+            delete(NotificationOutbox)
+            .where(NotificationOutbox.status == OutboxStatus.SENT, NotificationOutbox.sent_at < cutoff)
+            .execution_options(synchronize_session=False)
+        )).rowcount
+        await db.commit()
+        return pruned
+
+    async def run_once(self):
+        if self.transport is None:
+            self.transport = build_transport()
+        batch_size = settings.OUTBOX_BATCH_SIZE
+        total = 0
+        async with session_scope() as db:
+            while True:
+                claimed = await self.dispatch_batch(db, batch_size)
+                total += claimed
+                if claimed < batch_size:
+                    break
+            # The sweep takes the write lock, so it runs hourly rather than every tick
+            if self._pruned_at is None or time.monotonic() - self._pruned_at >= 3600:
+                self._pruned_at = time.monotonic()
+                pruned = await self.prune(db)
+                if pruned:
+                    logger.info("Pruned %d sent notifications", pruned)
+        return total
+
+
+outbox_dispatcher = OutboxDispatcher(settings.OUTBOX_DISPATCH_INTERVAL_SECONDS)
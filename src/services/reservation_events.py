@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import secrets
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from config import settings
+from database.database import session_scope
+from models.models import NotificationOutbox, Reservation, ReservationStatus
+from services.outbox import HOLD_AVAILABLE, HOLD_EXPIRED
+from services.periodic import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+
+class Event:
+    __slots__ = ("sequence", "id", "member_id", "name", "data")
+
+    def __init__(self, sequence: int, event_id: str, member_id: int, name: str, data: dict):
+        self.sequence = sequence
+        self.id = event_id
+        self.member_id = member_id
+        self.name = name
+        self.data = data
+
+
+class Subscription:
+    """One open stream: a bounded queue the broker fills without ever waiting on it."""
+
+    __slots__ = ("member_id", "queue", "closed")
+
+    def __init__(self, member_id: int, queue_size: int):
+        self.member_id = member_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def _close(self):
+        self.closed = True
+        try:
+            # Wake a reader blocked on an empty queue; a full one is already awake
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class ReservationEvents:
+    """In-process pub/sub of reservation changes, fanned out per member.
+
+    ``publish`` is synchronous and never blocks: a subscriber whose queue is
+    full is dropped rather than slowing the publisher or buffering without
+    bound, and its client resumes from the replay buffer with Last-Event-ID.
+    Event ids carry a per-process epoch, so an id from before a restart (or
+    from another worker) is recognised as not resumable.
+    """
+
+    def __init__(self, queue_size: int, replay_size: int, dedupe_size: int):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._replay = deque(maxlen=replay_size)
+        self._published = OrderedDict()
+        self._dedupe_size = dedupe_size
+        self._sequence = 0
+        self._epoch = secrets.token_hex(4)
+
+    def subscribe(self, member_id: int) -> Subscription:
+        subscription = Subscription(member_id, self.queue_size)
+        self._subscribers[member_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.member_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.member_id]
+
+    def head_id(self) -> str:
+        """Id of the latest event; a stream resumed from it replays nothing."""
+        return f"{self._epoch}-{self._sequence}"
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, member_id: int, name: str, data: dict, key=None):
+        """Queue ``name`` for the member's open streams; ``key`` suppresses repeats of the same change."""
+        if key is not None:
+            if key in self._published:
+                return
+            self._published[key] = None
+            while len(self._published) > self._dedupe_size:
+                self._published.popitem(last=False)
+
+        self._sequence += 1
+        event = Event(self._sequence, f"{self._epoch}-{self._sequence}", member_id, name, data)
+        self._replay.append(event)
+        for subscription in list(self._subscribers.get(member_id, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.info("Dropping slow event stream for member %s", member_id)
+                self.unsubscribe(subscription)
+                subscription._close()
+
+    def replay(self, member_id: int, last_event_id: str):
+        """Events for the member after ``last_event_id``, or None if it can't be resumed from."""
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self._epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        oldest = self._replay[0].sequence if self._replay else self._sequence + 1
+        if sequence < oldest - 1 or sequence > self._sequence:
+            return None
+        return [event for event in self._replay if event.sequence > sequence and event.member_id == member_id]
+
+    def close(self):
+        """End every open stream, e.g. on shutdown."""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                self.unsubscribe(subscription)
+                subscription._close()
+
+
+reservation_events = ReservationEvents(
+    settings.EVENT_STREAM_QUEUE_SIZE, settings.EVENT_STREAM_REPLAY_SIZE, settings.EVENT_STREAM_DEDUPE_SIZE
+)
+
+
+def _hold_payload(reservation_id, book_id, status, notification_date):
+    payload = {"reservation_id": reservation_id, "book_id": book_id, "status": status.value}
+    if notification_date is not None:
+        payload["notification_date"] = notification_date
+        payload["hold_expires_at"] = notification_date + timedelta(hours=settings.HOLD_EXPIRY_HOURS)
+    return payload
+
+
+def announce_available(promoted, notification_date: datetime):
+    """Publish holds from :func:`promote_waiting`; call once their transaction has committed."""
+    for reservation_id, member_id, book_id in promoted:
+        reservation_events.publish(
+            member_id, "available",
+            _hold_payload(reservation_id, book_id, ReservationStatus.AVAILABLE, notification_date),
+            key=(reservation_id, ReservationStatus.AVAILABLE),
+        )
+
+
+def announce_expired(expired):
+    """Publish holds closed by the expiry sweep; call once the sweep has committed."""
+    for reservation_id, member_id, book_id in expired:
+        reservation_events.publish(
+            member_id, "expired",
+            _hold_payload(reservation_id, book_id, ReservationStatus.EXPIRED, None),
+            key=(reservation_id, ReservationStatus.EXPIRED),
+        )
+
+
+async def current_holds(db, member_id: int):
+    rows = await db.execute(
+        select(Reservation.id, Reservation.book_id, Reservation.notification_date).where(
+            Reservation.member_id == member_id,
+            Reservation.is_active == True,
+            Reservation.status == ReservationStatus.AVAILABLE,
+        )
+    )
+    return [
+        _hold_payload(reservation_id, book_id, ReservationStatus.AVAILABLE, notification_date)
+        for reservation_id, book_id, notification_date in rows
+    ]
+
+
+class HoldRelay(PeriodicJob):
+    """Relays hold changes made by other workers to this worker's streams.
+
+    Changes made here are published directly; one made by a request or sweep
+    on another uvicorn worker only shows up in the shared database. Every
+    hold that becomes available or expires queues an outbox notification in
+    the same transaction, stamped with the time of the change, so while any
+    stream is open one indexed query per interval over recent outbox rows
+    picks up both kinds, and the broker's dedupe drops the ones already
+    announced. The look-back covers transactions that commit after a
+    later-stamped one was seen.
+    """
+
+    name = "Hold relay"
+
+    def __init__(self, interval: float, lookback: float):
+        super().__init__(interval)
+        self.lookback = timedelta(seconds=lookback)
+
+    async def run_once(self, since: datetime = None):
+        if not reservation_events.has_subscribers():
+            return
+        since = since or datetime.utcnow() - self.lookback
+        async with session_scope(read_only=True) as db:
+            rows = (await db.execute(
+                select(
+                    NotificationOutbox.kind, NotificationOutbox.member_id,
+                    NotificationOutbox.payload, NotificationOutbox.created_at
+                ).where(
+                    NotificationOutbox.created_at >= since,
+                    NotificationOutbox.kind.in_([HOLD_AVAILABLE, HOLD_EXPIRED]),
+                ).order_by(NotificationOutbox.created_at, NotificationOutbox.id)
+            )).all()
+        for kind, member_id, payload, created_at in rows:
+            hold = [(payload["reservation_id"], member_id, payload["book_id"])]
+            if kind == HOLD_AVAILABLE:
+                announce_available(hold, created_at)
+            else:
+                announce_expired(hold)
+
+
+hold_relay = HoldRelay(settings.EVENT_STREAM_RELAY_INTERVAL_SECONDS, settings.EVENT_STREAM_RELAY_LOOKBACK_SECONDS)
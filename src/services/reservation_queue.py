@@ -0,0 +1,173 @@
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, select, tuple_, union_all, update
+
+from config import settings
+from database.database import session_scope
+from models.models import Book, Reservation, ReservationStatus
+from services.outbox import enqueue_holds_available, enqueue_holds_expired
+from services.periodic import PeriodicJob
+from services.reservation_events import announce_available, announce_expired
+
+logger = logging.getLogger(__name__)
+
+books_table = Book.__table__
+
+# Freed books per promotion query, one compound arm each; SQLite allows 500 arms
+_PROMOTE_BOOKS_PER_STATEMENT = 200
+
+_restock = (
+    update(books_table)
+    .where(books_table.c.id == bindparam("book_id"))
+    .values(available_quantity=books_table.c.available_quantity + bindparam("delta"))
+)
+
+
+async def promote_waiting(db, freed: Counter, now: datetime):
+    """Flip the oldest WAITING reservations to AVAILABLE, one per freed copy.
+
+    Each freed book is one arm of a UNION ALL: a seek on ``ix_reservations_queue``
+    limited to the copies freed, so the work follows the copies handed out
+    rather than the length of the queues. Each member's notification is queued
+    in the outbox in the same transaction. Returns ``(id, member_id, book_id)``
+    per promoted reservation, for :func:`announce_available` after the commit.
+    """
+    books = [(book_id, count) for book_id, count in freed.items() if book_id is not None and count > 0]
+    promoted = []
+    for start in range(0, len(books), _PROMOTE_BOOKS_PER_STATEMENT):
+        heads = [
+            select(Reservation.id, Reservation.member_id, Reservation.book_id).where(
+                Reservation.book_id == book_id,
+                Reservation.status == ReservationStatus.WAITING,
+                Reservation.is_active == True
+            ).order_by(Reservation.reservation_date, Reservation.id).limit(count).subquery()
+            for book_id, count in books[start:start + _PROMOTE_BOOKS_PER_STATEMENT]
+        ]
+        statement = union_all(*(select(head) for head in heads)) if len(heads) > 1 else select(heads[0])
+        promoted.extend(tuple(row) for row in (await db.execute(statement)).all())
+    if promoted:
+        await db.execute(
+            update(Reservation)
+            .where(Reservation.id.in_([reservation_id for reservation_id, _, _ in promoted]))
+            .values(status=ReservationStatus.AVAILABLE, notification_date=now)
+            .execution_options(synchronize_session=False)
+        )
+        await enqueue_holds_available(db, promoted, now)
+    return promoted
+
+
+async def release_copies(db, freed: Counter, now: datetime):
+    """Hand freed copies to the queue; only copies nobody is waiting for go back on the shelf.
+
+    A promoted hold keeps its copy out of ``available_quantity`` until the
+    member collects it, or until the hold is cancelled or expires and this
+    runs again for the copy. Returns the holds from :func:`promote_waiting`.
+    """
+    promoted = await promote_waiting(db, freed, now)
+    unclaimed = freed - Counter(book_id for _, _, book_id in promoted)
+    if unclaimed:
+        await db.execute(_restock, [{"book_id": book_id, "delta": count} for book_id, count in unclaimed.items()])
+    return promoted
+
+
+async def collect_holds(db, member_id: int, book_ids):
+    """Close the member's AVAILABLE holds on ``book_ids``; returns the books they held.
+
+    Each of those books has a copy set aside for the member, so checking it
+    out takes that copy rather than one from ``available_quantity``.
+    """
+    return (await db.scalars(
+        update(Reservation)
+        .where(
+            Reservation.member_id == member_id,
+            Reservation.book_id.in_(list(book_ids)),
+            Reservation.status == ReservationStatus.AVAILABLE,
+            Reservation.is_active == True
+        )
+        .values(status=ReservationStatus.COLLECTED, is_active=False)
+        .returning(Reservation.book_id)
+        .execution_options(synchronize_session=False)
+    )).all()
+
+
+async def queue_position(db, reservation: Reservation):
+    """1-based place in the book's WAITING queue, or None once the reservation has left it.
+
+    Counts the index entries ahead of the reservation in its book's queue,
+    found by a seek on ``ix_reservations_queue`` rather than a table scan. The
+    count still walks those entries, so the cost grows with the position
+    (O(position), not O(log n)). SQLite's b-trees keep no subtree counts, and a
+    stored rank column would need every later row rewritten on each cancel or
+    promotion, moving the cost onto writes; queues for one title stay short.
+    """
+    if reservation.status != ReservationStatus.WAITING or not reservation.is_active:
+        return None
+    ahead = await db.scalar(
+        select(func.count()).select_from(Reservation).where(
+            Reservation.book_id == reservation.book_id,
+            Reservation.status == ReservationStatus.WAITING,
+            Reservation.is_active == True,
+            tuple_(Reservation.reservation_date, Reservation.id)
+            < tuple_(reservation.reservation_date, reservation.id)
+        )
+    )
+    return ahead + 1
+
+
+async def expire_holds(db, now: datetime = None, batch_size: int = None):
+    """Expire one batch of uncollected holds and pass each held copy on with :func:`release_copies`.
+
+    The expiring UPDATE is conditional on the hold still being AVAILABLE, so
+    two workers sweeping at once never promote twice for the same copy.
+    Returns the number of holds expired.
+    """
+    now = now or datetime.utcnow()
+    batch_size = batch_size or settings.HOLD_EXPIRY_BATCH_SIZE
+    cutoff = now - timedelta(hours=settings.HOLD_EXPIRY_HOURS)
+    candidates = (await db.scalars(
+        select(Reservation.id).where(
+            Reservation.status == ReservationStatus.AVAILABLE,
+            Reservation.notification_date < cutoff
+        ).order_by(Reservation.notification_date).limit(batch_size)
+    )).all()
+    if not candidates:
+        return 0
+
+    expired = (await db.execute(
+        update(Reservation)
+        .where(Reservation.id.in_(candidates), Reservation.status == ReservationStatus.AVAILABLE)
+        .values(status=ReservationStatus.EXPIRED, is_active=False)
+        .returning(Reservation.id, Reservation.member_id, Reservation.book_id)
+        .execution_options(synchronize_session=False)
+    )).all()
+    promoted = []
+    if expired:
+        await enqueue_holds_expired(db, expired, now)
+        promoted = await release_copies(db, Counter(book_id for _, _, book_id in expired), now)
+    await db.commit()
+    announce_expired(expired)
+    announce_available(promoted, now)
+    return len(expired)
+
+
+class HoldExpiryScheduler(PeriodicJob):
+    """Periodically sweeps expired holds in batches on the event loop."""
+
+    name = "Hold expiry sweep"
+
+    async def run_once(self):
+        total = 0
+        async with session_scope() as db:
+            while True:
+                expired = await expire_holds(db)
+                total += expired
+                if expired < settings.HOLD_EXPIRY_BATCH_SIZE:
+                    break
+        if total:
+            logger.info("Expired %d uncollected reservation holds", total)
+        return total
+
+
+hold_expiry_scheduler = HoldExpiryScheduler(settings.HOLD_EXPIRY_INTERVAL_SECONDS)
@@ -0,0 +1,150 @@
+"""Shared fixtures. The whole session runs against a scratch database in a temporary directory.
+
+Settings are read from the environment when app modules are first imported,
+so the environment is set here, before any of them are. Run from ``src/``:
+
+    python -m pytest
+"""
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["LIBRARY_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="library-tests-"), "library.db")
+os.environ["LIBRARY_RATE_LIMIT_ENABLED"] = "0"
+os.environ["LIBRARY_BCRYPT_ROUNDS"] = "4"
+# Background jobs are driven by the tests that need them
+os.environ["LIBRARY_HOLD_EXPIRY_ENABLED"] = "0"
+os.environ["LIBRARY_LOAN_ARCHIVE_ENABLED"] = "0"
+os.environ["LIBRARY_OUTBOX_DISPATCH_ENABLED"] = "0"
+# Any request issuing more statements than this fails, which catches a lazy load in a
+# loop. Batch checkout spends two per distinct title, so test batches stay small.
+os.environ["LIBRARY_QUERY_BUDGET"] = "50"
+
+_emails = itertools.count()
+
+
+def _run_check(module: str, *args: str, mode: str = "async"):
+    env = {name: value for name, value in os.environ.items() if not name.startswith("LIBRARY_")}
+    env["LIBRARY_DB_MODE"] = mode
+    result = subprocess.run(
+        [sys.executable, "-m", f"benchmarks.{module}", *args],
+        cwd=SRC, env=env, capture_output=True, text=True, timeout=600,
+    )
+    assert result.returncode == 0, f"benchmarks.{module} failed:\n{result.stdout[-4000:]}\n{result.stderr[-4000:]}"
+    return result.stdout
+
+
+@pytest.fixture(scope="session")
+def run_check():
+    """Run ``python -m benchmarks.<module> *args`` in its own process and scratch database.
+
+    The benchmark scripts double as checks that exit non-zero on failure; a
+    failure fails the test with their report.
+    """
+    return _run_check
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def run(loop):
+    """Run a coroutine on the session's event loop, which the async engine's pooled connections belong to."""
+    return loop.run_until_complete
+
+
+@pytest.fixture(scope="session")
+def app(run):
+    from init_db import init_db
+
+    init_db()
+    import main
+
+    yield main.app
+    run(main.shutdown())
+
+
+@pytest.fixture(scope="session")
+def client(app, run):
+    from benchmarks.common import asgi_client
+
+    client = asgi_client(app)
+    run(client.__aenter__())
+    yield client
+    run(client.__aexit__(None, None, None))
+
+
+def auth(member_id: int):
+    from auth.auth_utils import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(member_id)})}"}
+
+
+@pytest.fixture(scope="session")
+def admin(app):
+    from sqlalchemy import select
+
+    from database.database import SessionLocal
+    from models.models import Member
+
+    with SessionLocal() as db:
+        return auth(db.scalar(select(Member.id).where(Member.is_admin == True).limit(1)))
+
+
+@pytest.fixture
+def new_member(app):
+    """Factory for members of this test only: returns ``(member_id, auth headers)``."""
+    from auth.passwords import pwd_context
+    from database.database import SessionLocal
+    from models.models import Member
+
+    def create():
+        with SessionLocal() as db:
+            member = Member(
+                name="Test Member", email=f"member{next(_emails)}@tests.example.com", phone="+1234567890",
+                hashed_password=pwd_context.hash("password"),
+            )
+            db.add(member)
+            db.commit()
+            return member.id, auth(member.id)
+
+    return create
+
+
+@pytest.fixture
+def new_book(client, admin, run):
+    """Factory for books of this test only: returns the created book as JSON."""
+
+    def create(quantity: int = 1, title: str = "Test Book"):
+        response = run(client.post("/books/", json={"title": title, "author": "Tests", "quantity": quantity},
+                                   headers=admin))
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return create
+
+
+@pytest.fixture
+def statements(app):
+    """Counts SQL statements on every engine while the test runs."""
+    from benchmarks.query_counts import StatementCounter
+    from database.database import async_engine, async_read_engine, engine, read_engine
+    from sqlalchemy import event
+
+    counter = StatementCounter()
+    engines = {engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine}
+    counter.attach(*engines)
+    yield counter
+    for sync_engine in engines:
+        event.remove(sync_engine, "before_cursor_execute", counter)
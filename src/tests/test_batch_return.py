@@ -0,0 +1,16 @@
+def test_members_can_only_batch_return_their_own_loans(client, run, admin, new_book, new_member):
+    (owner, owner_headers), (other, other_headers) = new_member(), new_member()
+    books = [new_book(title=f"Borrowed Elsewhere {i}")["id"] for i in range(3)]
+    checkout = run(client.post("/loans/batch", json={"member_id": owner, "book_ids": books[:2]}, headers=owner_headers))
+    theirs = [result["loan_id"] for result in checkout.json()["results"]]
+    mine = run(client.post("/loans/", json={"book_id": books[2], "member_id": other}, headers=other_headers)).json()["id"]
+
+    response = run(client.post("/loans/batch/return", json={"loan_ids": [theirs[0], mine]}, headers=other_headers))
+    assert response.status_code == 200, response.text
+    assert [(result["success"], result.get("error")) for result in response.json()["results"]] == [
+        (False, "Not authorized"), (True, None),
+    ]
+
+    # Untouched by the refused attempt, and still returnable by an admin
+    response = run(client.post("/loans/batch/return", json={"loan_ids": theirs}, headers=admin))
+    assert [result["success"] for result in response.json()["results"]] == [True, True]
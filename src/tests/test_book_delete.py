@@ -0,0 +1,25 @@
+def test_history_lists_loans_and_reservations_of_a_deleted_book(client, run, admin, new_book, new_member):
+    book = new_book(title="Ephemeral Atlas")["id"]
+    borrower, borrower_headers = new_member()
+    reserver, reserver_headers = new_member()
+
+    loan = run(client.post("/loans/", json={"book_id": book, "member_id": borrower}, headers=borrower_headers))
+    assert loan.status_code == 200, loan.text
+    reservation = run(client.post("/reservations/", json={"book_id": book, "member_id": reserver},
+                                  headers=reserver_headers))
+    assert reservation.status_code == 200, reservation.text
+    cancelled = run(client.put(f"/reservations/{reservation.json()['id']}/cancel", headers=reserver_headers))
+    assert cancelled.status_code == 200, cancelled.text
+    returned = run(client.put(f"/loans/{loan.json()['id']}/return", headers=borrower_headers))
+    assert returned.status_code == 200, returned.text
+
+    deleted = run(client.delete(f"/books/{book}", headers=admin))
+    assert deleted.status_code == 200, deleted.text
+
+    # The rows outlive the book with book_id unset
+    history = run(client.get("/loans/history", headers=borrower_headers))
+    assert history.status_code == 200, history.text
+    assert [item["book_id"] for item in history.json()["items"]] == [None]
+    reservations = run(client.get("/reservations/", headers=reserver_headers))
+    assert reservations.status_code == 200, reservations.text
+    assert [item["book_id"] for item in reservations.json()["items"]] == [None]
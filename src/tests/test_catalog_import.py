@@ -0,0 +1,61 @@
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+
+def _titles(*titles):
+    from database.database import SessionLocal
+    from models.models import Book
+
+    with SessionLocal() as db:
+        return dict(db.execute(select(Book.title, Book.quantity).where(Book.title.in_(titles))).all())
+
+
+def test_csv_fields_can_span_lines(client, run, admin):
+    body = (
+        'title,author,quantity\n'
+        '"Collected Letters,\nVolume One",Importer,2\n'
+        'Plain Import Title,Importer,1\n'
+        'Broken Import Row,Importer\n'
+        '"Quoted ""Import""",Importer,3\n'
+    )
+    response = run(client.post("/books/import", content=body, headers={**admin, "Content-Type": "text/csv"}))
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["inserted"], report["failed"]) == (3, 1)
+    # Errors name the physical line the record starts on
+    assert report["errors"] == [{"line": 5, "error": "Expected 3 columns, got 2"}]
+    assert _titles("Collected Letters,\nVolume One", "Plain Import Title", 'Quoted "Import"') == {
+        "Collected Letters,\nVolume One": 2, "Plain Import Title": 1, 'Quoted "Import"': 3,
+    }
+
+
+def test_a_failing_lookup_fails_only_its_chunk(app, run):
+    from database.database import session_scope
+    from services.catalog_import import import_books
+
+    class FirstLookupFails:
+        def __init__(self, db):
+            self.db = db
+            self.failed = False
+
+        def __getattr__(self, name):
+            return getattr(self.db, name)
+
+        async def execute(self, statement, *args, **kwargs):
+            if not self.failed:
+                self.failed = True
+                raise OperationalError(str(statement), {}, Exception("database is locked"))
+            return await self.db.execute(statement, *args, **kwargs)
+
+    async def lines():
+        for line in ("title,author,quantity", "Lost Chunk Title,Importer,1", "Kept Chunk Title,Importer,1"):
+            yield line
+
+    async def load():
+        async with session_scope() as db:
+            return await import_books(FirstLookupFails(db), lines(), "csv", chunk_size=1)
+
+    report = run(load())
+    assert (report["inserted"], report["failed"]) == (1, 1)
+    assert report["errors"] == [{"line": 2, "error": "Database error: OperationalError"}]
+    assert _titles("Lost Chunk Title", "Kept Chunk Title") == {"Kept Chunk Title": 1}
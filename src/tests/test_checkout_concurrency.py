@@ -0,0 +1,6 @@
+import pytest
+
+
+@pytest.mark.parametrize("mode", ["async", "sync"])
+def test_concurrent_checkouts_never_oversell(run_check, mode):
+    run_check("checkout_concurrency", "--copies", "20", "--clients", "150", "--concurrency", "50", mode=mode)
@@ -0,0 +1,32 @@
+def test_a_matching_if_none_match_returns_304(client, run, new_member):
+    _, headers = new_member()
+    first = run(client.get("/books/", params={"limit": 5}, headers=headers))
+    assert first.status_code == 200, first.text
+    tag = first.headers["ETag"]
+
+    response = run(client.get("/books/", params={"limit": 5}, headers={**headers, "If-None-Match": tag}))
+    assert response.status_code == 304
+    assert response.headers["ETag"] == tag
+    assert response.content == b""
+    # A different page is a different representation
+    response = run(client.get("/books/", params={"limit": 6}, headers={**headers, "If-None-Match": tag}))
+    assert response.status_code == 200
+
+
+def test_the_tag_changes_after_a_write(client, run, new_book, new_member):
+    _, headers = new_member()
+    before = run(client.get("/books/", params={"limit": 5}, headers=headers)).headers["ETag"]
+    new_book(title="Tag Breaker")
+
+    response = run(client.get("/books/", params={"limit": 5}, headers={**headers, "If-None-Match": before}))
+    assert response.status_code == 200
+    assert response.headers["ETag"] != before
+
+
+def test_callers_get_different_tags_for_the_same_url(client, run, new_member):
+    (_, first), (_, second) = new_member(), new_member()
+    tags = [run(client.get("/reservations/", headers=headers)).headers["ETag"] for headers in (first, second)]
+    assert tags[0] != tags[1]
+    # One member's tag never validates another member's copy
+    response = run(client.get("/reservations/", headers={**second, "If-None-Match": tags[0]}))
+    assert response.status_code == 200
@@ -0,0 +1,60 @@
+import subprocess
+import sys
+import textwrap
+from datetime import datetime, timedelta
+
+from tests.conftest import SRC
+
+# Another uvicorn worker: its own process and broker, sharing only the database
+_SWEEP_ON_ANOTHER_WORKER = textwrap.dedent("""
+    import asyncio
+    from datetime import datetime, timedelta
+
+    from config import settings
+    from database.database import dispose_engines, session_scope
+    from services.reservation_queue import expire_holds
+
+    async def sweep():
+        async with session_scope() as db:
+            await expire_holds(db, now=datetime.utcnow() + timedelta(hours=settings.HOLD_EXPIRY_HOURS + 1))
+        await dispose_engines()
+
+    asyncio.run(sweep())
+""")
+
+
+def _drain(subscription):
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+
+def test_a_hold_expired_by_another_worker_reaches_this_workers_streams(client, run, new_book, new_member):
+    from services.reservation_events import hold_relay, reservation_events
+
+    book = new_book(quantity=1, title="Relayed Hold")["id"]
+    (borrower, borrower_headers), (holder, holder_headers) = new_member(), new_member()
+    loan = run(client.post("/loans/", json={"book_id": book, "member_id": borrower}, headers=borrower_headers)).json()
+    hold = run(client.post("/reservations/", json={"book_id": book, "member_id": holder}, headers=holder_headers)).json()
+
+    subscription = reservation_events.subscribe(holder)
+    try:
+        assert run(client.put(f"/loans/{loan['id']}/return", headers=borrower_headers)).status_code == 200
+        assert [(event.name, event.data["reservation_id"]) for event in _drain(subscription)] == [
+            ("available", hold["id"])
+        ]
+
+        result = subprocess.run([sys.executable, "-c", _SWEEP_ON_ANOTHER_WORKER], cwd=SRC,
+                                capture_output=True, text=True, timeout=120)
+        assert result.returncode == 0, result.stderr
+        assert _drain(subscription) == []
+
+        # The relay picks the expiry up; the hold announced here earlier is not repeated
+        run(hold_relay.run_once(datetime.utcnow() - timedelta(minutes=1)))
+        events = _drain(subscription)
+        assert [(event.name, event.data["reservation_id"], event.data["status"]) for event in events] == [
+            ("expired", hold["id"], "EXPIRED")
+        ]
+    finally:
+        reservation_events.unsubscribe(subscription)
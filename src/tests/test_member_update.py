@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.mark.parametrize("field", ["name", "phone", "is_admin"])
+def test_fields_cannot_be_set_to_null(client, run, admin, new_member, field):
+    member, headers = new_member()
+    response = run(client.put(f"/members/{member}", json={field: None}, headers=admin))
+    assert response.status_code == 422, response.text
+
+    response = run(client.get(f"/members/{member}", headers=headers))
+    assert response.status_code == 200, response.text
+    assert response.json()[field] is not None
+
+
+def test_only_admins_can_send_the_admin_flag(client, run, admin, new_member):
+    member, headers = new_member()
+    # Any is_admin in the body is a change of role, even one that matches the current one
+    response = run(client.put(f"/members/{member}", json={"is_admin": False}, headers=headers))
+    assert response.status_code == 403, response.text
+    assert run(client.put(f"/members/{member}", json={"is_admin": None}, headers=headers)).status_code == 422
+
+    response = run(client.put(f"/members/{member}", json={"name": "Renamed Member"}, headers=headers))
+    assert response.status_code == 200, response.text
+    assert response.json()["name"] == "Renamed Member"
+
+    response = run(client.put(f"/members/{member}", json={"is_admin": True}, headers=admin))
+    assert response.status_code == 200, response.text
+    assert response.json()["is_admin"] is True
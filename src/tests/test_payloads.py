@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import pytest
+
+from config import settings
+
+
+@pytest.fixture
+def many_books(new_book):
+    for i in range(30):
+        new_book(title=f"Compressible Catalogue Entry {i}")
+
+
+def _fetch(client, run, path, headers, **params):
+    """Status, headers and body exactly as sent, without the client's decoding."""
+
+    async def fetch():
+        async with client.stream("GET", path, params=params, headers=headers) as response:
+            return response.status_code, response.headers, b"".join([chunk async for chunk in response.aiter_raw()])
+
+    return run(fetch())
+
+
+def test_gzip_is_negotiated_and_decodes_to_the_identity_body(client, run, admin, many_books):
+    _, _, identity = _fetch(client, run, "/books/", {**admin, "Accept-Encoding": "identity"}, limit=30)
+    assert len(identity) >= settings.COMPRESSION_MIN_SIZE
+
+    status, headers, body = _fetch(client, run, "/books/", {**admin, "Accept-Encoding": "gzip"}, limit=30)
+    assert status == 200
+    assert headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in headers["vary"].lower()
+    assert int(headers["content-length"]) == len(body) < len(identity)
+    assert gzip.decompress(body) == identity
+
+
+def test_brotli_is_preferred_unless_the_client_rates_it_lower(client, run, admin, many_books):
+    brotli = pytest.importorskip("brotli")
+    _, _, identity = _fetch(client, run, "/books/", {**admin, "Accept-Encoding": "identity"}, limit=30)
+
+    _, headers, body = _fetch(client, run, "/books/", {**admin, "Accept-Encoding": "gzip, br"}, limit=30)
+    assert headers["content-encoding"] == "br"
+    assert brotli.decompress(body) == identity
+
+    _, headers, _ = _fetch(client, run, "/books/", {**admin, "Accept-Encoding": "br;q=0.5, gzip"}, limit=30)
+    assert headers["content-encoding"] == "gzip"
+    _, headers, _ = _fetch(client, run, "/books/", {**admin, "Accept-Encoding": "br;q=0, gzip;q=0"}, limit=30)
+    assert "content-encoding" not in headers
+
+
+def test_small_bodies_are_sent_uncompressed(client, run, new_member):
+    member, headers = new_member()
+    status, response_headers, body = _fetch(client, run, f"/members/{member}", {**headers, "Accept-Encoding": "gzip, br"})
+    assert status == 200
+    assert len(body) < settings.COMPRESSION_MIN_SIZE
+    assert "content-encoding" not in response_headers
+    assert json.loads(body)["id"] == member
+
+
+def test_fields_selects_columns_and_keeps_the_cursor_key(client, run, admin, many_books):
+    response = run(client.get("/books/", params={"limit": 5, "fields": "title"}, headers=admin))
+    assert response.status_code == 200, response.text
+    page = response.json()
+    assert [set(item) for item in page["items"]] == [{"id", "title"}] * 5
+    assert page["next_cursor"] is not None
+
+    response = run(client.get("/books/", params={"limit": 5, "fields": "title,author"}, headers=admin))
+    assert set(response.json()["items"][0]) == {"id", "title", "author"}
+
+
+@pytest.mark.parametrize("fields", ["colour", "title,colour", "hashed_password"])
+def test_unknown_fields_are_rejected(client, run, admin, fields):
+    path = "/members/" if fields == "hashed_password" else "/books/"
+    response = run(client.get(path, params={"fields": fields}, headers=admin))
+    assert response.status_code == 400
+    assert "Unknown fields" in response.json()["detail"]
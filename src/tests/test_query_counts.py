@@ -0,0 +1,6 @@
+import pytest
+
+
+@pytest.mark.parametrize("mode", ["async", "sync"])
+def test_statements_per_request_stay_constant(run_check, mode):
+    run_check("query_counts", "--members", "300", "--books", "500", "--loans", "5000", mode=mode)
@@ -0,0 +1,6 @@
+import pytest
+
+
+@pytest.mark.parametrize("mode", ["async", "sync"])
+def test_no_full_scans(run_check, mode):
+    run_check("query_plans", "--members", "500", "--loans", "20000", mode=mode)
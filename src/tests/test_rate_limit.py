@@ -0,0 +1,41 @@
+import pytest
+
+from config import settings
+
+
+@pytest.fixture
+def rate_limits(monkeypatch, app):
+    """Turns the limiter on, with empty buckets, for one test."""
+    from auth.rate_limit import rate_limiter
+
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED", True)
+    rate_limiter.backend.clear()
+    yield
+    rate_limiter.backend.clear()
+
+
+def _login(client, run, email, ip="203.0.113.1"):
+    return run(client.post("/token", data={"username": email, "password": "wrong password"},
+                           headers={"X-Forwarded-For": ip}))
+
+
+def test_login_is_limited_per_account_with_retry_after(client, run, rate_limits):
+    count, seconds = settings.RATE_LIMIT_LOGIN_PER_EMAIL
+    for _ in range(count):
+        assert _login(client, run, "target@tests.example.com").status_code == 401
+
+    response = _login(client, run, "Target@Tests.example.com")
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= seconds
+    # Another account from the same client still gets through
+    assert _login(client, run, "bystander@tests.example.com").status_code == 401
+
+
+def test_one_clients_bucket_does_not_throttle_another(client, run, rate_limits):
+    count, _ = settings.RATE_LIMIT_LOGIN_PER_IP
+    for attempt in range(count):
+        assert _login(client, run, f"spray{attempt}@tests.example.com", ip="198.51.100.7").status_code == 401
+
+    assert _login(client, run, "one-more@tests.example.com", ip="198.51.100.7").status_code == 429
+    assert _login(client, run, "one-more@tests.example.com", ip="198.51.100.8").status_code == 401
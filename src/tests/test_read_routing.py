@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import event
+
+from tests.conftest import auth
+
+
+@pytest.fixture
+def primary_checkouts(app):
+    """Counts connections taken from the primary pools while the test runs."""
+    from database.database import async_engine, engine
+
+    checkouts = []
+
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.append(connection_record)
+
+    engines = (engine, async_engine.sync_engine)
+    for sync_engine in engines:
+        event.listen(sync_engine, "checkout", checkout)
+    yield checkouts
+    for sync_engine in engines:
+        event.remove(sync_engine, "checkout", checkout)
+
+
+def test_reads_authenticate_and_query_on_the_read_pool(client, run, new_member, primary_checkouts):
+    member, _ = new_member()
+    primary_checkouts.clear()
+    # A fresh token misses the principal cache, so the member is loaded too
+    response = run(client.get("/loans/borrowed", headers=auth(member)))
+    assert response.status_code == 200, response.text
+    assert primary_checkouts == []
+
+
+def test_reads_after_a_write_go_to_the_primary(client, run, new_book, new_member, primary_checkouts):
+    member, headers = new_member()
+    book = new_book()["id"]
+    assert run(client.post("/loans/", json={"book_id": book, "member_id": member}, headers=headers)).status_code == 200
+
+    primary_checkouts.clear()
+    response = run(client.get("/loans/borrowed", headers=headers))
+    assert response.status_code == 200, response.text
+    assert [loan["book_id"] for loan in response.json()["items"]] == [book]
+    assert primary_checkouts
@@ -0,0 +1,50 @@
+from sqlalchemy import select
+
+
+def _login(client, run, member_id):
+    from database.database import SessionLocal
+    from models.models import Member
+
+    with SessionLocal() as db:
+        email = db.scalar(select(Member.email).where(Member.id == member_id))
+    response = run(client.post("/token", data={"username": email, "password": "password"}))
+    assert response.status_code == 200, response.text
+    return response.json()["refresh_token"]
+
+
+def _refresh(client, run, token):
+    return run(client.post("/token/refresh", data={"refresh_token": token}))
+
+
+def test_a_refresh_rotates_the_token(client, run, new_member):
+    member, _ = new_member()
+    first = _login(client, run, member)
+
+    response = _refresh(client, run, first)
+    assert response.status_code == 200, response.text
+    second = response.json()["refresh_token"]
+    assert second != first
+    # Same login, same family
+    assert second.split(".")[0] == first.split(".")[0]
+    me = run(client.get(f"/members/{member}", headers={"Authorization": f"Bearer {response.json()['access_token']}"}))
+    assert me.status_code == 200, me.text
+
+    assert _refresh(client, run, second).status_code == 200
+
+
+def test_reusing_a_spent_token_revokes_its_family(client, run, new_member):
+    from auth.refresh_tokens import denylist
+
+    member, _ = new_member()
+    first = _login(client, run, member)
+    second = _refresh(client, run, first).json()["refresh_token"]
+
+    assert _refresh(client, run, first).status_code == 401
+    # The legitimate successor dies with the family
+    assert _refresh(client, run, second).status_code == 401
+    # Revocation is in the database, not only this worker's denylist
+    denylist._families.clear()
+    assert _refresh(client, run, second).status_code == 401
+
+    # A fresh login starts a new family that refreshes normally
+    assert _refresh(client, run, _login(client, run, member)).status_code == 200
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+
+def _available(book_id):
+    from database.database import SessionLocal
+    from models.models import Book
+
+    with SessionLocal() as db:
+        return db.scalar(select(Book.available_quantity).where(Book.id == book_id))
+
+
+def _statuses(*reservation_ids):
+    from database.database import SessionLocal
+    from models.models import Reservation
+
+    with SessionLocal() as db:
+        statuses = dict(db.execute(select(Reservation.id, Reservation.status).where(Reservation.id.in_(reservation_ids))).all())
+    return [statuses[reservation_id].value for reservation_id in reservation_ids]
+
+
+def _expire_holds(run):
+    from config import settings
+    from database.database import session_scope
+    from services.reservation_queue import expire_holds
+
+    async def sweep():
+        async with session_scope() as db:
+            return await expire_holds(db, now=datetime.utcnow() + timedelta(hours=settings.HOLD_EXPIRY_HOURS + 1))
+
+    return run(sweep())
+
+
+def test_a_hold_keeps_its_copy_until_collected_cancelled_or_expired(client, run, new_book, new_member):
+    book = new_book(quantity=1, title="Contested Copy")["id"]
+    (bob, bob_headers), (eve, eve_headers) = new_member(), new_member()
+    (cat, cat_headers), (dan, dan_headers) = new_member(), new_member()
+
+    def borrow(member, headers):
+        return run(client.post("/loans/", json={"book_id": book, "member_id": member}, headers=headers))
+
+    def reserve(member, headers):
+        response = run(client.post("/reservations/", json={"book_id": book, "member_id": member}, headers=headers))
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+
+    loan = borrow(bob, bob_headers).json()["id"]
+    cat_hold, dan_hold = reserve(cat, cat_headers), reserve(dan, dan_headers)
+
+    # Bob's copy goes straight to Cat's hold, not back on the shelf
+    assert run(client.put(f"/loans/{loan}/return", headers=bob_headers)).status_code == 200
+    assert _statuses(cat_hold, dan_hold) == ["AVAILABLE", "WAITING"]
+    assert _available(book) == 0
+    assert borrow(eve, eve_headers).status_code == 400
+
+    # Cat never collects: the copy passes to Dan
+    _expire_holds(run)
+    assert _statuses(cat_hold, dan_hold) == ["EXPIRED", "AVAILABLE"]
+    assert _available(book) == 0
+
+    # Dan collects the held copy without taking another
+    assert borrow(dan, dan_headers).status_code == 200
+    assert _statuses(dan_hold) == ["COLLECTED"]
+    assert _available(book) == 0
+
+
+def test_a_cancelled_hold_returns_its_copy_when_nobody_is_waiting(client, run, new_book, new_member):
+    book = new_book(quantity=1, title="Unwanted Copy")["id"]
+    (bob, bob_headers), (cat, cat_headers) = new_member(), new_member()
+
+    loan = run(client.post("/loans/", json={"book_id": book, "member_id": bob}, headers=bob_headers)).json()["id"]
+    hold = run(client.post("/reservations/", json={"book_id": book, "member_id": cat}, headers=cat_headers)).json()["id"]
+    assert run(client.put(f"/loans/{loan}/return", headers=bob_headers)).status_code == 200
+    assert _available(book) == 0
+
+    assert run(client.put(f"/reservations/{hold}/cancel", headers=cat_headers)).status_code == 200
+    assert _available(book) == 1
+
+
+def test_a_batch_return_promotes_one_hold_per_freed_copy_in_queue_order(client, run, admin, new_book, new_member):
+    books = [new_book(quantity=2, title="Queued Twice")["id"], new_book(quantity=1, title="Queued Once")["id"]]
+    borrower, borrower_headers = new_member()
+    checkout = run(client.post("/loans/batch", json={"member_id": borrower, "book_ids": [books[0], books[0], books[1]]},
+                               headers=borrower_headers))
+    loans = [result["loan_id"] for result in checkout.json()["results"]]
+    queues = {book: [] for book in books}
+    for book in books:
+        for _ in range(3):
+            member, headers = new_member()
+            response = run(client.post("/reservations/", json={"book_id": book, "member_id": member}, headers=headers))
+            queues[book].append(response.json()["id"])
+
+    response = run(client.post("/loans/batch/return", json={"loan_ids": loans}, headers=borrower_headers))
+    assert all(result["success"] for result in response.json()["results"])
+    assert _statuses(*queues[books[0]]) == ["AVAILABLE", "AVAILABLE", "WAITING"]
+    assert _statuses(*queues[books[1]]) == ["AVAILABLE", "WAITING", "WAITING"]
+    assert [_available(book) for book in books] == [0, 0]
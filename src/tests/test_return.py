@@ -0,0 +1,14 @@
+def test_members_can_only_return_their_own_loans(client, run, admin, new_book, new_member):
+    (owner, owner_headers), (_, other_headers) = new_member(), new_member()
+    book = new_book(title="Someone Else's Loan")["id"]
+    loan = run(client.post("/loans/", json={"book_id": book, "member_id": owner}, headers=owner_headers)).json()["id"]
+
+    response = run(client.put(f"/loans/{loan}/return", headers=other_headers))
+    assert response.status_code == 403, response.text
+    assert run(client.put(f"/loans/{loan + 10_000}/return", headers=other_headers)).status_code == 404
+
+    # The refused attempt left the loan out, for its owner or an admin to return
+    response = run(client.put(f"/loans/{loan}/return", headers=admin))
+    assert response.status_code == 200, response.text
+    assert response.json()["is_returned"] is True
+    assert run(client.put(f"/loans/{loan}/return", headers=owner_headers)).status_code == 400
@@ -0,0 +1,19 @@
+def test_search_statements_do_not_grow_with_results(client, run, new_book, new_member, statements):
+    borrower, headers = new_member()
+    books = [new_book(title=f"Zephyrine Volume {i}")["id"] for i in range(12)]
+    # Every match out on loan, so each one needs a next_available_date
+    response = run(client.post("/loans/batch", json={"member_id": borrower, "book_ids": books}, headers=headers))
+    assert all(result["success"] for result in response.json()["results"])
+
+    def search(limit):
+        before = statements.count
+        response = run(client.get("/books/search", params={"query": "zephyrine", "limit": limit}, headers=headers))
+        assert response.status_code == 200, response.text
+        return response.json(), statements.count - before
+
+    search(1)  # warms the principal cache
+    few, few_statements = search(4)
+    many, many_statements = search(12)
+    assert (len(few), len(many)) == (4, 12)
+    assert few_statements == many_statements
+    assert all(book["next_available_date"] not in (None, "Available now") for book in many)